@@ -0,0 +1,37 @@
+"""Compares two benchmark result files.
+
+    python benchmarks/compare.py benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path, "r") as js_file:
+        data = json.load(js_file)
+    return data["commit"], {(r["name"], r["symbols"], r["window_minutes"]): r for r in data["results"]}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_ms", help="Latency metric to compare (p50_ms, p90_ms, p99_ms, mean_ms)")
+    options = parser.parse_args(args)
+
+    old_commit, old = load(options.old)
+    new_commit, new = load(options.new)
+    print(f"{options.metric}: {old_commit} -> {new_commit}")
+    print(f"{'case':<24}{'symbols':>8}{'window':>8}{'old':>11}{'new':>11}{'ratio':>8}{'old KiB':>11}{'new KiB':>11}")
+    for key in sorted(old.keys() & new.keys(), key=lambda k: (k[0], k[1], k[2] or 0)):
+        name, symbols, window = key
+        before, after = old[key][options.metric], new[key][options.metric]
+        ratio = after / before if before else float("inf")
+        print(f"{name:<24}{symbols:>8}{window or '-':>8}{before:>11.3f}{after:>11.3f}{ratio:>7.2f}x"
+              f"{old[key]['peak_memory_kib']:>11.0f}{new[key]['peak_memory_kib']:>11.0f}")
+    for key in sorted(old.keys() ^ new.keys(), key=str):
+        print(f"only in {'old' if key in old else 'new'}: {key}")
+
+
+if __name__ == "__main__":
+    main()
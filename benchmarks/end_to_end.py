@@ -0,0 +1,226 @@
+"""End-to-end benchmark: seconds from a price shock at the data API until the alert reaches Slack.
+
+    python benchmarks/end_to_end.py
+    python benchmarks/end_to_end.py --modes request --symbols 100,1000,5000 --duration 60
+    python benchmarks/end_to_end.py --latency 0.2 --jitter 0.3 --error-rate 0.05 --throttle-rate 0.02
+    python benchmarks/compare.py benchmarks/results/e2e-<old>.json benchmarks/results/e2e-<new>.json
+
+The TradingView or CoinGecko stand-in and the Slack stand-in of
+monitor_app.standins run in this process; the monitor runs unchanged in a child
+process pointed at them. After a warm-up a fresh symbol is shocked every
+--shock-interval seconds. The latency of a shock is the time until a Slack
+message listing the symbol arrives, so it covers polling, parsing, evaluation
+and the Slack dispatcher. Throughput is the number of symbol rows the monitor
+pulled from the stand-in per second.
+
+Modes: "request" runs RequestMonitor on the scan stand-in, "coingecko" runs the
+sharded CryptoMonitor workers (the single CryptoMonitor does not post to Slack).
+Results use the format of run_benchmarks.py and can be compared with compare.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from run_benchmarks import ROOT, git_commit, prepare_environment
+
+
+# Child process of each mode, started in the scratch directory with the stand-in URLs in its environment
+CHILD_SCRIPTS = {
+    "request": """
+from monitor_app.request_monitor import RequestMonitor
+
+if __name__ == "__main__":
+    RequestMonitor.poll_interval = {interval}
+    RequestMonitor().run_request_monitoring()
+""",
+    "coingecko": """
+from monitor_app.settings import MonitorSettings
+from monitor_app.sharding import ShardCoordinator
+
+if __name__ == "__main__":
+    settings = MonitorSettings.from_env("sharded")
+    ShardCoordinator(settings.symbols, settings=settings, interval={interval}).run()
+""",
+}
+
+THRESHOLD = 5
+
+
+def peak_memory_kib(pid):
+    """Peak resident set size of a running process (Linux), 0 when it cannot be read."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as status_file:
+            for line in status_file:
+                if line.startswith("VmHWM:"):
+                    return float(line.split()[1])
+    except OSError:
+        pass
+    return 0.0
+
+
+def delivery_latencies(shocks, messages):
+    """Seconds from every shock to the first Slack message that lists its symbol (None when it never arrived)."""
+    listed = [
+        (message["received"], {line.split()[0].upper() for line in message["text"].split("\n") if line.split()})
+        for message in messages
+    ]
+    latencies = []
+    for symbol, _, shocked_at in shocks:
+        arrivals = [received for received, symbols in listed if received >= shocked_at and symbol.upper() in symbols]
+        latencies.append(min(arrivals) - shocked_at if arrivals else None)
+    return latencies
+
+
+def start_stand_in(mode, n_symbols, options):
+    from monitor_app.standins import CoinGeckoStandInServer, TradingViewStandInServer
+    failures = dict(latency=options.latency, jitter=options.jitter, error_rate=options.error_rate,
+                    throttle_rate=options.throttle_rate)
+    if mode == "request":
+        stand_in = TradingViewStandInServer(n_symbols=n_symbols, **failures).start()
+        return stand_in, stand_in.symbols, {"TRADINGVIEW_SCAN_URL": stand_in.scan_url}
+
+    from monitor_app.symbol_index import SymbolIndex
+    ids = list(SymbolIndex.load())[:n_symbols]
+    stand_in = CoinGeckoStandInServer(ids, **failures).start()
+    return stand_in, ids, {"COINGECKO_API_URL": stand_in.api_url, "SYMBOLS": ",".join(ids)}
+
+
+def run_case(mode, n_symbols, options, workdir):
+    from monitor_app.standins import SlackStandInServer
+
+    stand_in, symbols, stand_in_env = start_stand_in(mode, n_symbols, options)
+    slack = SlackStandInServer(latency=options.slack_latency, throttle_rate=options.slack_throttle_rate).start()
+    script = os.path.join(workdir, f"e2e_{mode}.py")
+    with open(script, "w") as script_file:
+        script_file.write(CHILD_SCRIPTS[mode].format(interval=options.interval))
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        SLACK_API_URL=slack.api_url,
+        THRESHOLD=str(THRESHOLD),
+        TICK_STORE_DIR=os.path.join(workdir, f"ticks-{mode}-{n_symbols}"),
+        **stand_in_env,
+    )
+    if mode == "request":
+        # The scan monitor only writes a tick store when asked to
+        env.pop("TICK_STORE_DIR")
+    log_path = os.path.join(workdir, f"e2e_{mode}_{n_symbols}.log")
+    with open(log_path, "w") as log_file:
+        process = subprocess.Popen([sys.executable, script], env=env, cwd=workdir, stdout=log_file, stderr=subprocess.STDOUT)
+    try:
+        # Warm-up: the monitor has pulled the whole universe a few times
+        deadline = time.monotonic() + options.warmup_timeout
+        while stand_in.rows_served < options.warmup_polls * len(symbols):
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"{mode} monitor did not start, see {log_path}")
+            time.sleep(0.1)
+
+        rng = np.random.default_rng(0)
+        candidates = list(rng.permutation(symbols))
+        rows_before, started = stand_in.rows_served, time.monotonic()
+        n_shocks = 0
+        while time.monotonic() - started < options.duration and candidates:
+            stand_in.book.shock(candidates.pop(), 3 * THRESHOLD * (1 if n_shocks % 2 else -1))
+            n_shocks += 1
+            time.sleep(options.shock_interval)
+        elapsed = time.monotonic() - started
+        rows = stand_in.rows_served - rows_before
+
+        # Drain: the last shocks get the same time to arrive as the first ones
+        drain_deadline = time.monotonic() + options.drain
+        while time.monotonic() < drain_deadline:
+            if all(latency is not None for latency in delivery_latencies(stand_in.book.shocks, slack.messages)):
+                break
+            time.sleep(0.2)
+        memory = peak_memory_kib(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stand_in.stop()
+        slack.stop()
+
+    latencies = delivery_latencies(stand_in.book.shocks, slack.messages)
+    delivered = np.array([latency for latency in latencies if latency is not None]) * 1000
+    percentile = (lambda q: float(np.percentile(delivered, q))) if len(delivered) else (lambda q: float("nan"))
+    return {
+        "name": f"e2e_{mode}",
+        "symbols": n_symbols,
+        "window_minutes": None,
+        "samples": len(delivered),
+        "mean_ms": float(delivered.mean()) if len(delivered) else float("nan"),
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": float(delivered.max()) if len(delivered) else float("nan"),
+        "peak_memory_kib": memory,
+        "shocks": len(latencies),
+        "delivered": len(delivered),
+        "rows_per_sec": rows / elapsed,
+        "polls_per_sec": rows / elapsed / len(symbols),
+        "api_requests": stand_in.requests,
+        "api_errors": stand_in.errors,
+        "api_throttled": stand_in.throttled,
+        "slack_messages": len(slack.messages),
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark shock-to-Slack latency and throughput against local stand-ins.")
+    parser.add_argument("--modes", default=",".join(CHILD_SCRIPTS), help="Comma separated monitors (request, coingecko)")
+    parser.add_argument("--symbols", default="100,1000", help="Comma separated universe sizes")
+    parser.add_argument("--interval", type=float, default=1.0, help="Poll interval of the monitor in seconds")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds during which shocks are applied")
+    parser.add_argument("--shock-interval", type=float, default=1.0, help="Seconds between two shocks")
+    parser.add_argument("--drain", type=float, default=20, help="Seconds the last shocks get to arrive")
+    parser.add_argument("--warmup-polls", type=int, default=3, help="Full universe polls before the first shock")
+    parser.add_argument("--warmup-timeout", type=float, default=180, help="Seconds the monitor gets to start")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every data API response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra seconds of every data API response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of data API requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of data API requests answered with 429")
+    parser.add_argument("--slack-latency", type=float, default=0.0, help="Seconds added to every Slack response")
+    parser.add_argument("--slack-throttle-rate", type=float, default=0.0, help="Share of Slack requests answered with 429")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/e2e-<commit>.json)")
+    options = parser.parse_args(args)
+
+    commit = git_commit()
+    output = os.path.abspath(options.output or os.path.join(ROOT, "benchmarks", "results", f"e2e-{commit}.json"))
+    workdir = tempfile.mkdtemp(prefix="monitor_e2e_")
+    prepare_environment(workdir)
+
+    results = []
+    print(f"{'case':<16}{'symbols':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'delivered':>11}{'rows/s':>10}{'polls/s':>9}")
+    for mode in options.modes.split(","):
+        for n_symbols in (int(value) for value in options.symbols.split(",")):
+            result = run_case(mode, n_symbols, options, workdir)
+            results.append(result)
+            print(f"{result['name']:<16}{n_symbols:>8}{result['p50_ms']:>10.0f}{result['p90_ms']:>10.0f}{result['p99_ms']:>10.0f}"
+                  f"{result['delivered']:>6}/{result['shocks']:<4}{result['rows_per_sec']:>10.0f}{result['polls_per_sec']:>9.2f}")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as js_file:
+        json.dump({
+            "commit": commit,
+            "created": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "results": results,
+        }, js_file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Synthetic, seeded fixtures for the benchmarks (no network access needed)."""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Columns of the request_parameters.json payload written by write_request_parameters
+SCAN_COLUMNS = ["logoid", "description", "name", "close", "change|60", "change|5"]
+
+
+def symbol_names(n_symbols):
+    return [f"SYM{idx}USDT" for idx in range(n_symbols)]
+
+
+def scan_response(n_symbols, seed=0, columns=SCAN_COLUMNS):
+    """TradingView scan response whose ``d`` arrays follow the requested ``columns``."""
+    rng = np.random.default_rng(seed)
+    names = symbol_names(n_symbols)
+    values = {
+        "logoid": [name.lower() for name in names],
+        "description": names,
+        "name": names,
+        "close": rng.lognormal(0, 3, n_symbols).tolist(),
+        "change|60": rng.normal(0, 3, n_symbols).tolist(),
+        "change|5": rng.normal(0, 1.5, n_symbols).tolist(),
+    }
+    data = [
+        {"s": f"KUCOIN:{name}", "d": [values[column][idx] for column in columns]}
+        for idx, name in enumerate(names)
+    ]
+    return {"totalCount": n_symbols, "data": data}
+
+
+def scan_frame(n_symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "price": rng.lognormal(0, 3, n_symbols),
+        "change_1h": rng.normal(0, 3, n_symbols),
+        "change_5min": rng.normal(0, 1.5, n_symbols),
+    }, index=symbol_names(n_symbols))
+
+
+def markets_response(n_symbols, seed=0):
+    """CoinGecko /coins/markets records for ``n_symbols`` ids."""
+    rng = np.random.default_rng(seed)
+    prices = rng.lognormal(0, 3, n_symbols)
+    return [
+        {
+            "id": f"coin-{idx}",
+            "symbol": f"c{idx}",
+            "current_price": float(prices[idx]),
+            "price_change_percentage_1h_in_currency": float(rng.normal(0, 2)),
+            "total_volume": float(rng.lognormal(10, 2)),
+            "last_updated": "2022-11-23T00:00:00.000Z",
+        }
+        for idx in range(n_symbols)
+    ]
+
+
+def screener_rows(n_symbols, seed=0):
+    """Rows as returned by SeleniumMonitor.bulk_table_script, in the screener text format."""
+    rng = np.random.default_rng(seed)
+    prices = rng.lognormal(0, 3, n_symbols)
+    changes = rng.normal(0, 3, (n_symbols, 2))
+
+    def _pct(value):
+        return f"{value:.2f}%".replace("-", "−")
+
+    return [
+        [name, f"{prices[idx]:.6g} {_pct(changes[idx, 0])} {_pct(changes[idx, 1])}"]
+        for idx, name in enumerate(symbol_names(n_symbols))
+    ]
+
+
+def write_request_parameters(directory):
+    """Writes the request_parameters.json that monitor_app.utils reads at import time."""
+    payload = {
+        "payload": {
+            "filter": [{"left": "exchange", "operation": "equal", "right": "KUCOIN"}],
+            "columns": SCAN_COLUMNS,
+            "sort": {"sortBy": "name", "sortOrder": "asc"},
+            "range": [0, 10000],
+        },
+        "headers": {"content-type": "application/json"},
+    }
+    with open(os.path.join(directory, "request_parameters.json"), "w") as js_file:
+        json.dump(payload, js_file)
@@ -0,0 +1,363 @@
+"""Benchmarks of the monitoring hot paths on synthetic symbol universes.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --symbols 10,1000 --windows 1,60 --repeat 20
+    python benchmarks/compare.py benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+Everything runs offline: fixtures are generated with a fixed seed and the
+monitors are fed through overridden fetch methods. Results (latency percentiles
+and peak traced memory per case) are written as JSON, by default to
+benchmarks/results/<commit>.json.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import fixtures
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SYMBOLS = [10, 100, 1000, 10000]
+DEFAULT_WINDOWS = [1, 15, 60, 120]
+
+
+def prepare_environment(workdir):
+    """Sets the variables and files the monitor modules expect and moves into a scratch directory."""
+    defaults = {
+        "SYMBOLS": "bitcoin", "THRESHOLD": "5", "LOOKBACK_MINUTES": "1", "ALERT_REPEAT_CYCLE_FREQ": "60",
+        "CHROME_EXE_PATH": "chromedriver", "BOT_TOKEN": "xoxb-benchmark", "USER_TOKEN": "xoxp-benchmark",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    os.chdir(workdir)
+    os.makedirs("logs", exist_ok=True)
+    fixtures.write_request_parameters(workdir)
+    sys.path.insert(0, ROOT)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(func, repeat, budget):
+    """Runs ``func`` up to ``repeat`` times (or until ``budget`` seconds are spent) and returns the latencies."""
+    func()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat and (len(samples) < 3 or time.perf_counter() - started < budget):
+        tick = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - tick)
+    return np.array(samples)
+
+
+def peak_memory(func, iterations=3):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for _ in range(iterations):
+        func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+# Benchmark cases: each returns the callable that is timed for one symbol count (and window)
+
+def case_request_process_pairs(n_symbols, window):
+    from monitor_app.request_monitor import RequestMonitor
+    from monitor_app.scan_decoder import ScanDecoder, build_scan_payload, scan_fields
+
+    # The response holds the trimmed column set that RequestMonitor requests
+    fields = scan_fields(fixtures.SCAN_COLUMNS)
+    columns = build_scan_payload({"columns": fixtures.SCAN_COLUMNS}, fields)["columns"]
+
+    class FixtureRequestMonitor(RequestMonitor):
+        def __init__(self, response) -> None:
+            self.response = response
+            self.decoder = ScanDecoder(columns, fields)
+
+        def get_pairs_json(self):
+            return self.response
+
+    monitor = FixtureRequestMonitor(fixtures.scan_response(n_symbols, columns=columns))
+    return monitor.process_pairs_data
+
+
+def case_utils_calculate_stats(n_symbols, window):
+    from monitor_app.alert_evaluator import AlertEvaluator
+    from monitor_app.utils import UtilsManager
+
+    frames = [fixtures.scan_frame(n_symbols, seed=seed) for seed in range(8)]
+    evaluator = AlertEvaluator()
+    state = {"tick": 0}
+
+    def run():
+        state["tick"] += 1
+        UtilsManager.calculate_stats(frames[state["tick"] % len(frames)], evaluator, threshold=5.0)
+    return run
+
+
+def _crypto_monitor(n_symbols, window):
+    from monitor_app.coingecko_monitor import CryptoMonitor
+
+    class FixtureCryptoMonitor(CryptoMonitor):
+        # Fixture ids (coin-<n>) are not in the token list
+        def validate_symbols(self):
+            pass
+
+    responses = [fixtures.markets_response(n_symbols, seed=seed) for seed in range(4)]
+    monitor = FixtureCryptoMonitor([record["id"] for record in responses[0]])
+    monitor.rolling_window = int(window * (60 / monitor.loop_time_sleep))
+    state = {"tick": 0}
+
+    def get_data(symbol_ids=None):
+        state["tick"] += 1
+        return responses[state["tick"] % len(responses)]
+    monitor.get_data = get_data
+    monitor.concatenate_response()
+    # Fill the whole lookback window so the stats run on a warm buffer
+    buffer = monitor.buffer
+    buffer.values[:] = buffer.latest() * (1 + np.random.default_rng(0).normal(0, 0.001, buffer.values.shape))
+    buffer._resync()
+    buffer.n_ticks = buffer.window
+    return monitor
+
+
+def case_coingecko_ingest(n_symbols, window):
+    monitor = _crypto_monitor(n_symbols, window)
+    return monitor.concatenate_response
+
+
+def case_coingecko_stats(n_symbols, window):
+    monitor = _crypto_monitor(n_symbols, window)
+
+    def run():
+        monitor.filter_anomalies(monitor.tick_frame())
+    return run
+
+
+def case_selenium_parse(n_symbols, window):
+    from monitor_app.selenium_monitor import SeleniumMonitor
+
+    rows = fixtures.screener_rows(n_symbols)
+    return lambda: SeleniumMonitor.parse_rows(rows)
+
+
+def case_tick_log_enqueue(n_symbols, window):
+    from monitor_app.tick_log import TickLogWriter
+
+    writer = TickLogWriter(tempfile.mktemp(suffix=".jsonl", dir="."), sample_unchanged=True)
+    frame = fixtures.scan_frame(n_symbols)
+    return lambda: writer.log_tick(frame, threshold=5.0)
+
+
+def case_text_log_baseline(n_symbols, window):
+    """The former ``df.to_string()`` dump of every scan into logs/main.log, kept as a baseline for the tick log."""
+    import logging
+
+    log = logging.getLogger("benchmark_text_log")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.FileHandler(tempfile.mktemp(suffix=".log", dir=".")))
+    frame = fixtures.scan_frame(n_symbols)
+    return lambda: log.info("Current threshold: " + str(5.0) + "\n" + frame.to_string())
+
+
+def case_symbol_index_validate(n_symbols, window):
+    from monitor_app.symbol_index import SymbolIndex
+
+    index = SymbolIndex.load()
+    coin_ids = list(itertools.islice(index, n_symbols))
+    return lambda: (SymbolIndex.load(), index.validate(coin_ids))
+
+
+def case_tick_store_append(n_symbols, window):
+    from monitor_app.tick_store import TickStore
+
+    store = TickStore(tempfile.mkdtemp(prefix="tick_store_", dir="."))
+    frame = fixtures.scan_frame(n_symbols)
+    state = {"timestamp": 1669150000}
+
+    def run():
+        state["timestamp"] += 3
+        store.append(frame, timestamp=state["timestamp"])
+    return run
+
+
+def case_live_snapshot_publish(n_symbols, window):
+    """Copy of one tick into the shared memory snapshot, the cost the detection loop pays for the live readers."""
+    from monitor_app.live_snapshot import LiveSnapshotWriter
+
+    writer = LiveSnapshotWriter(f"benchmark-live-{os.getpid()}-{n_symbols}")
+    frame = fixtures.scan_frame(n_symbols)
+    last_alert = np.full(n_symbols, np.nan)
+    return lambda: writer.publish(frame, last_alert=last_alert)
+
+
+def case_change_detector_update(n_symbols, window):
+    from monitor_app.change_detector import ChangeDetector
+
+    detector = ChangeDetector()
+    frames = [fixtures.scan_frame(n_symbols, seed=seed) for seed in range(8)]
+    state = {"tick": 0}
+
+    def run():
+        state["tick"] += 1
+        detector.update(frames[state["tick"] % len(frames)], 1669150000 + 15 * state["tick"])
+    # Ten minutes of 15 second ticks, so the short windows hold a history
+    for _ in range(40):
+        run()
+    return run
+
+
+def case_ewma_update(n_symbols, window):
+    """Return and volume EWMA z-scores of one tick; the state does not depend on the lookback window."""
+    from monitor_app.ewma_detector import EWMADetector
+
+    detector = EWMADetector("15m", "1h")
+    frames = [fixtures.scan_frame(n_symbols, seed=seed) for seed in range(8)]
+    volumes = np.random.default_rng(0).lognormal(10, 2, n_symbols)
+    state = {"tick": 0}
+
+    def run():
+        state["tick"] += 1
+        frame = frames[state["tick"] % len(frames)]
+        detector.update(frame.index, frame["price"].to_numpy(), 1669150000 + 3 * state["tick"], volumes)
+    return run
+
+
+def case_rule_engine_evaluate(n_symbols, window):
+    """500 rule sets (half of them on 50 symbols, the rest on every symbol) evaluated on one scan."""
+    from monitor_app.rule_engine import RuleEngine, RuleSet, Schedule
+
+    frames = [fixtures.scan_frame(n_symbols, seed=seed) for seed in range(8)]
+    rng = np.random.default_rng(0)
+    names = frames[0].index.tolist()
+    rule_sets = [
+        RuleSet(
+            f"team-{idx}", f"channel-{idx % 20}", threshold=float(rng.uniform(3, 10)),
+            symbols=rng.choice(names, min(50, len(names)), replace=False).tolist() if idx % 2 else [],
+            schedules=[Schedule(80, 360, bump=5)] if idx % 3 else [],
+        )
+        for idx in range(500)
+    ]
+    engine = RuleEngine(rule_sets)
+    state = {"tick": 0}
+
+    def run():
+        state["tick"] += 1
+        engine.evaluate(frames[state["tick"] % len(frames)], now=1669150000 + 15 * state["tick"])
+    return run
+
+
+def case_csv_append_baseline(n_symbols, window):
+    """The former temporal_file.csv append of one wide stats row, kept as a baseline for the tick store."""
+    frame = fixtures.scan_frame(n_symbols)
+    row = pd.DataFrame([frame.to_numpy().ravel()], columns=pd.MultiIndex.from_product([frame.index, frame.columns]))
+    path = tempfile.mktemp(suffix=".csv", dir=".")
+
+    def run():
+        df = row.copy()
+        df.columns.name = None
+        df.reset_index(inplace=True)
+        df.to_csv(path, mode="a", header=False, index=False)
+    return run
+
+
+CASES = {
+    "request_process_pairs": (case_request_process_pairs, False),
+    "utils_calculate_stats": (case_utils_calculate_stats, False),
+    "coingecko_ingest": (case_coingecko_ingest, True),
+    "coingecko_stats": (case_coingecko_stats, True),
+    "selenium_parse": (case_selenium_parse, False),
+    "tick_log_enqueue": (case_tick_log_enqueue, False),
+    "text_log_baseline": (case_text_log_baseline, False),
+    "symbol_index_validate": (case_symbol_index_validate, False),
+    "tick_store_append": (case_tick_store_append, False),
+    "live_snapshot_publish": (case_live_snapshot_publish, False),
+    "change_detector_update": (case_change_detector_update, False),
+    "ewma_update": (case_ewma_update, False),
+    "rule_engine_evaluate": (case_rule_engine_evaluate, False),
+    "csv_append_baseline": (case_csv_append_baseline, False),
+}
+
+
+def run_case(name, n_symbols, window, repeat, budget):
+    factory, _ = CASES[name]
+    with contextlib.redirect_stdout(io.StringIO()):
+        func = factory(n_symbols, window)
+        samples = measure(func, repeat, budget)
+        peak = peak_memory(func)
+    milliseconds = samples * 1000
+    return {
+        "name": name,
+        "symbols": n_symbols,
+        "window_minutes": window,
+        "samples": int(samples.shape[0]),
+        "mean_ms": float(milliseconds.mean()),
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p90_ms": float(np.percentile(milliseconds, 90)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "max_ms": float(milliseconds.max()),
+        "peak_memory_kib": peak / 1024,
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark the monitoring hot paths.")
+    parser.add_argument("--symbols", default=",".join(map(str, DEFAULT_SYMBOLS)), help="Comma separated symbol counts")
+    parser.add_argument("--windows", default=",".join(map(str, DEFAULT_WINDOWS)), help="Comma separated lookback minutes")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma separated benchmark cases")
+    parser.add_argument("--repeat", type=int, default=50, help="Maximum timed iterations per case")
+    parser.add_argument("--budget", type=float, default=5.0, help="Seconds spent timing each case at most")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/<commit>.json)")
+    options = parser.parse_args(args)
+
+    commit = git_commit()
+    output = os.path.abspath(options.output or os.path.join(ROOT, "benchmarks", "results", f"{commit}.json"))
+    symbol_counts = [int(value) for value in options.symbols.split(",")]
+    windows = [int(value) for value in options.windows.split(",")]
+
+    workdir = tempfile.mkdtemp(prefix="monitor_bench_")
+    prepare_environment(workdir)
+
+    results = []
+    print(f"{'case':<24}{'symbols':>8}{'window':>8}{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}{'peak KiB':>12}")
+    for name in options.cases.split(","):
+        for n_symbols in symbol_counts:
+            for window in (windows if CASES[name][1] else [None]):
+                result = run_case(name, n_symbols, window, options.repeat, options.budget)
+                results.append(result)
+                print(f"{name:<24}{n_symbols:>8}{window or '-':>8}{result['p50_ms']:>11.3f}"
+                      f"{result['p90_ms']:>11.3f}{result['p99_ms']:>11.3f}{result['peak_memory_kib']:>12.0f}")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as js_file:
+        json.dump({
+            "commit": commit,
+            "created": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "results": results,
+        }, js_file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Cold start benchmark: seconds from interpreter launch until a monitor is ready to poll.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --cases package,request --repeat 20
+    python benchmarks/compare.py benchmarks/results/startup-<old>.json benchmarks/results/startup-<new>.json
+
+Every sample is a fresh interpreter (as on a dyno restart), so the timings
+include the interpreter start and every import of the mode. The peak memory
+column is the resident set size of the child process. Results use the format
+of run_benchmarks.py and can be compared with compare.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from run_benchmarks import ROOT, git_commit, prepare_environment
+
+
+# Heavy backends reported as loaded (or not) by every case
+BACKENDS = ("pandas", "aiohttp", "slack", "selenium", "webdriver_manager")
+
+# Code run by the child interpreter for each case, up to the point where polling would start
+CASES = {
+    "package": "import monitor_app",
+    "request": "from monitor_app.request_monitor import RequestMonitor\nmonitor = RequestMonitor()",
+    "coingecko": (
+        "from monitor_app.coingecko_monitor import CryptoMonitor\n"
+        "monitor = CryptoMonitor(['bitcoin'])"
+    ),
+    "selenium_import": "from monitor_app.selenium_monitor import SeleniumMonitor",
+}
+
+CHILD_REPORT = """
+import json, resource, sys
+print(json.dumps({
+    "maxrss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "backends": [name for name in %r if name in sys.modules],
+}))
+sys.stdout.flush()
+import os
+os._exit(0)
+"""
+
+
+def run_child(code, env):
+    """Runs one fresh interpreter and returns its wall time (seconds) and report."""
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", code + "\n" + CHILD_REPORT % (BACKENDS,)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    elapsed = time.perf_counter() - started
+    return elapsed, json.loads(output.strip().splitlines()[-1])
+
+
+def run_case(name, repeat, env):
+    samples, reports = [], []
+    for _ in range(repeat):
+        elapsed, report = run_child(CASES[name], env)
+        samples.append(elapsed)
+        reports.append(report)
+    milliseconds = np.array(samples) * 1000
+    return {
+        "name": f"startup_{name}",
+        "symbols": 0,
+        "window_minutes": None,
+        "samples": len(samples),
+        "mean_ms": float(milliseconds.mean()),
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p90_ms": float(np.percentile(milliseconds, 90)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "max_ms": float(milliseconds.max()),
+        "peak_memory_kib": float(max(report["maxrss_kib"] for report in reports)),
+        "backends": reports[-1]["backends"],
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the monitor modes.")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma separated startup cases")
+    parser.add_argument("--repeat", type=int, default=10, help="Fresh interpreters started per case")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/startup-<commit>.json)")
+    options = parser.parse_args(args)
+
+    commit = git_commit()
+    output = os.path.abspath(options.output or os.path.join(ROOT, "benchmarks", "results", f"startup-{commit}.json"))
+    workdir = tempfile.mkdtemp(prefix="monitor_startup_")
+    prepare_environment(workdir)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+
+    results = []
+    print(f"{'case':<24}{'p50 ms':>11}{'p90 ms':>11}{'max ms':>11}{'RSS KiB':>12}  backends")
+    for name in options.cases.split(","):
+        result = run_case(name, options.repeat, env)
+        results.append(result)
+        print(f"{result['name']:<24}{result['p50_ms']:>11.1f}{result['p90_ms']:>11.1f}{result['max_ms']:>11.1f}"
+              f"{result['peak_memory_kib']:>12.0f}  {', '.join(result['backends']) or '-'}")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as js_file:
+        json.dump({
+            "commit": commit,
+            "created": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "results": results,
+        }, js_file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Reconnect check of the KuCoin WebSocket source against the local stand-in server.
+
+    python diagnostics/kucoin_reconnect.py
+    python diagnostics/kucoin_reconnect.py --connections 5 --drop-after 20 --timeout 60
+    python diagnostics/kucoin_reconnect.py --token-failures 3
+
+KucoinStandInServer closes every connection after --drop-after pushed tickers.
+KucoinTickerSource has to reconnect, subscribe again to all of its markets and
+keep delivering ticks; the check passes once --connections connections were
+made, each one subscribed with the full topic and followed by ticks.
+
+The source first connects directly, then through KucoinTokenStandInServer
+whose first --token-failures bullet-token requests fail, so the token
+failures have to go through the reconnect backoff as well. The exit code is 1
+when either case fails.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitor_app.async_fetcher import get_fetcher
+from monitor_app.standins import KucoinStandInServer, KucoinTokenStandInServer
+from monitor_app.websocket_source import KucoinTickerSource
+
+
+MARKETS = ["BTC-USDT", "ETH-USDT", "KCS-USDT"]
+
+
+def run_check(connections=3, drop_after=10, timeout=30, token_failures=None):
+    """Streams from a dropping stand-in until ``connections`` connections were made.
+
+    Args:
+        token_failures (int, optional): Connect through the token stand-in with this many failing
+            token requests, directly to the WebSocket stand-in when omitted
+
+    Returns:
+        list: Failure messages, empty when the check passed
+    """
+    server = KucoinStandInServer(prices={market: 100.0 for market in MARKETS}, drop_after=drop_after).start()
+    token_server = None
+    if token_failures is None:
+        source = KucoinTickerSource(MARKETS, endpoint=server.url)
+    else:
+        token_server = KucoinTokenStandInServer(server.url, fail_first=token_failures).start()
+        source = KucoinTickerSource(MARKETS, token_url=token_server.token_url)
+    ticks = []
+    # Connection count when each tick arrived, to tell that every connection delivered ticks
+    tick_connections = []
+    stop_event = threading.Event()
+
+    def on_tick(df):
+        ticks.append(df)
+        tick_connections.append(source.connections)
+        if source.connections >= connections and len(set(tick_connections)) >= connections:
+            stop_event.set()
+
+    thread = threading.Thread(target=source.stream, args=(on_tick,), kwargs={"stop_event": stop_event}, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    stop_event.set()
+    server.stop()
+    if token_server is not None:
+        token_server.stop()
+
+    failures = []
+    if not thread.is_alive() and source.connections < connections:
+        failures.append("The stream ended instead of reconnecting")
+    if token_server is not None and token_server.requests < token_failures + source.connections:
+        failures.append(f"{token_server.requests} token requests for {token_failures} failures and {source.connections} connections")
+    topic = "/market/ticker:" + ",".join(MARKETS)
+    if source.connections < connections:
+        failures.append(f"{source.connections} connections in {timeout} seconds, expected {connections}")
+    if len(server.subscriptions) < source.connections:
+        failures.append(f"{len(server.subscriptions)} subscriptions for {source.connections} connections")
+    if any(subscription != topic for subscription in server.subscriptions):
+        failures.append(f"Subscriptions {server.subscriptions} differ from {topic}")
+    silent = sorted(set(range(1, source.connections + 1)) - set(tick_connections))
+    if silent:
+        failures.append(f"No ticks after connections {silent}")
+    symbols = {symbol for df in ticks for symbol in df.index}
+    if symbols != {KucoinTickerSource.normalize_symbol(market) for market in MARKETS}:
+        failures.append(f"Ticks of {sorted(symbols)}, expected every market")
+    print(f"{source.connections} connections, {len(server.subscriptions)} subscriptions, {len(ticks)} ticks"
+          + ("." if token_server is None else f", {token_server.requests} token requests."))
+    return failures
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--connections", type=int, default=3, help="Connections (first one included) to wait for")
+    parser.add_argument("--drop-after", type=int, default=10, help="Tickers the stand-in pushes before closing a connection")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds each case may take")
+    parser.add_argument("--token-failures", type=int, default=2, help="Failing bullet-token requests of the token case")
+    options = parser.parse_args(args)
+    failed = False
+    for case, token_failures in (("direct", None), ("token", options.token_failures)):
+        failures = run_check(options.connections, options.drop_after, options.timeout, token_failures)
+        for failure in failures:
+            print(f"FAILED ({case}): {failure}")
+        if not failures:
+            print(f"Reconnect check passed ({case}).")
+        failed = failed or bool(failures)
+    # The token requests of the second case went through the shared fetcher
+    get_fetcher().close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,82 @@
-import pandas as pd
-import os
-from monitor_app import SeleniumMonitor
-from monitor_app import *
-import jmespath
+import signal
+import sys
+
+from dotenv import load_dotenv
+
+from monitor_app.settings import MonitorSettings
 # os.environ["no_proxy"]="*"
 
 
-pd.options.display.max_columns = None
+# The monitor mode is the first argument or MONITOR_MODE ("request" by default), e.g. python monitor.py sharded.
+# Every runner imports its own backend, so a mode never loads the libraries of the others.
+
+
+def run_request_monitor(settings):
+    from monitor_app.request_monitor import RequestMonitor
+    monitor = RequestMonitor(settings)
+    monitor.run_request_monitoring()
+
+
+def run_stream_monitor(settings):
+    from monitor_app.request_monitor import RequestMonitor
+    from monitor_app.websocket_source import KucoinTickerSource
+    monitor = RequestMonitor(settings)
+    monitor.run_source_monitoring(KucoinTickerSource(settings.kucoin_markets, endpoint=settings.kucoin_ws_endpoint))
+
 
-# Temporal CSV file
-TEMPORAL_FILE_NAME = "temporal_file.csv"
+def run_coingecko_monitor(settings):
+    from monitor_app.coingecko_monitor import CryptoMonitor
+    monitor = CryptoMonitor(settings.symbols, settings=settings)
+    monitor.start_monitor()
 
-# CoinGecko asset ids that will be monitored by the script ("id" field must be provided)
-SYMBOLS = os.environ["SYMBOLS"].split(",")
 
-# Threshold value after which an alert message will be sent
-THRESHOLD = float(os.environ["THRESHOLD"])
+def run_sharded_monitor(settings):
+    from monitor_app.sharding import ShardCoordinator
+    coordinator = ShardCoordinator(settings.symbols, settings=settings)
+    coordinator.run()
 
-# Number of minutes that the script will take into account for Moving Averaging process
-LOOKBACK_MINUTES = int(os.environ["LOOKBACK_MINUTES"])
 
-# Time interval between each consequent alerts (e.g., %5 change continues for 60 secs but the alert should be sent once instead of 30 repetitions.)
-# Send the alert every <ALERT_REPEAT_CYCLE_FREQ> sencods.
-ALERT_REPEAT_CYCLE_FREQ = int(os.environ["ALERT_REPEAT_CYCLE_FREQ"])
+def run_multi_source_monitor(settings):
+    from monitor_app.multi_source import MultiSourceRunner
+    runner = MultiSourceRunner.from_settings(settings)
+    runner.run()
 
-# chromedriver.exe path
-CHROME_EXE_PATH = os.environ["CHROME_EXE_PATH"]
 
-def run_monitor():
+def run_monitor(settings):
+    from monitor_app.selenium_monitor import SeleniumMonitor
+    monitor_obj = None
     try:
-        monitor_obj = SeleniumMonitor(threshold=THRESHOLD, executable_path=CHROME_EXE_PATH)
-        monitor_obj.start_monitoring()
+        monitor_obj = SeleniumMonitor(threshold=settings.threshold, executable_path=settings.chrome_exe_path, settings=settings)
+        monitor_obj.start_monitoring(streaming=settings.selenium_streaming)
     except Exception as exc:
-        monitor_obj.terminate_session()
+        if monitor_obj is not None:
+            monitor_obj.terminate_session()
         raise exc
 
 
+RUNNERS = {
+    "request": run_request_monitor,
+    "stream": run_stream_monitor,
+    "coingecko": run_coingecko_monitor,
+    "sharded": run_sharded_monitor,
+    "selenium": run_monitor,
+    "multi": run_multi_source_monitor,
+}
+
+
+def _exit_on_sigterm(signum, frame):
+    # Dynos are stopped with SIGTERM, leaving through SystemExit lets the monitors write their restart snapshot
+    sys.exit(0)
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    # .env values are loaded into the environment once, MonitorSettings reads them from there
+    load_dotenv()
+    settings = MonitorSettings.from_env(mode=args[0] if args else None)
+    RUNNERS[settings.mode](settings)
+
+
 if __name__ == "__main__":
-    monitor = RequestMonitor()
-    monitor.run_request_monitoring()
+    main()
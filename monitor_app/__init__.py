@@ -1,5 +1,62 @@
-from .exceptions import *
-from .slack_api import *
-from .request_monitor import *
-from .selenium_monitor import *
-from .utils import *
\ No newline at end of file
+"""Crypto price monitors.
+
+Submodules are imported on first attribute access (PEP 562), so
+``from monitor_app import RequestMonitor`` only loads the request monitor and
+what it uses; Selenium and Slack are not imported until a monitor needs them.
+"""
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    "InputError": "exceptions",
+    "LoopError": "exceptions",
+    "PostRequestFail": "exceptions",
+    "FetchError": "exceptions",
+    "TOKEN_LIST_PATH": "symbol_index",
+    "PairResolution": "symbol_index",
+    "SymbolIndex": "symbol_index",
+    "BotAgent": "slack_api",
+    "UserAgent": "slack_api",
+    "AlertDispatcher": "slack_api",
+    "SlackAgent": "slack_api",
+    "PurgeJob": "slack_api",
+    "AlertWindow": "alert_evaluator",
+    "Alert": "alert_evaluator",
+    "DEFAULT_WINDOWS": "alert_evaluator",
+    "AlertEvaluator": "alert_evaluator",
+    "RuleSet": "rule_engine",
+    "RuleEngine": "rule_engine",
+    "load_rule_sets": "rule_engine",
+    "AsyncFetcher": "async_fetcher",
+    "get_fetcher": "async_fetcher",
+    "TickSource": "sources",
+    "PollingSource": "sources",
+    "TickStore": "tick_store",
+    "LiveSnapshotWriter": "live_snapshot",
+    "LiveSnapshotReader": "live_snapshot",
+    "RequestMonitor": "request_monitor",
+    "SeleniumMonitor": "selenium_monitor",
+    "Logger": "utils",
+    "Configs": "utils",
+    "UtilsManager": "utils",
+    "SymbolTable": "multi_source",
+    "MultiSourceRunner": "multi_source",
+    "MODES": "settings",
+    "MonitorSettings": "settings",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # Cached, later lookups do not go through __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
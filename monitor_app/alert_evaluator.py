@@ -0,0 +1,167 @@
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Cooldown placeholder that lets the first alert of every symbol through
+NEVER = np.iinfo(np.int64).min // 2
+
+
+@dataclass
+class AlertWindow:
+    """ Dataclass that describes one alert window
+    """
+    column: str
+    cooldown: int
+    title: str
+    # Prefix of the alert values, "%" for changes and "z=" for z-scores
+    unit: str = "%"
+
+
+@dataclass
+class Alert:
+    """ Dataclass that holds the symbols that fired in one window
+    """
+    window: AlertWindow
+    symbols: list
+    values: np.ndarray
+    text: str
+
+
+DEFAULT_WINDOWS = (
+    AlertWindow("change_5min", (60 * 5) + 15, ":right_anger_bubble:*SON 5 DAKİKADA*"),
+    AlertWindow("change_1h", (60 * 60) + 15, ":right_anger_bubble:*SON 1 SAATTE*"),
+)
+
+
+class AlertEvaluator:
+    """Threshold and cooldown evaluation shared by the monitors.
+
+    Cooldowns are kept as integer epoch seconds in a ``windows x symbols`` array,
+    indexed by the position of each symbol, so all windows are checked in one
+    vectorized pass and only the rows that fire are formatted. Symbols are
+    registered the first time they appear in a tick.
+
+    When a symbol fires in a window it is skipped by the following windows in the
+    same tick and the cooldowns of all windows are restarted for it, as the
+    monitors used to do.
+
+    Args:
+        windows (tuple): AlertWindow objects in priority order
+        capacity (int): Initial number of symbol slots, grown on demand
+    """
+
+    def __init__(self, windows=DEFAULT_WINDOWS, capacity=256) -> None:
+        self.windows = list(windows)
+        self.columns = [window.column for window in self.windows]
+        self.cooldowns = np.array([window.cooldown for window in self.windows], dtype=np.int64)[:, None]
+        self.symbols = pd.Index([], dtype=object)
+        self.last_alert = np.full((len(self.windows), capacity), NEVER, dtype=np.int64)
+        self._last_index = None
+        self._last_positions = None
+
+    def positions(self, index):
+        """Returns the slot of every symbol in ``index``, registering unknown symbols."""
+        if self._last_index is not None and (index is self._last_index or index.equals(self._last_index)):
+            return self._last_positions
+        positions = self.symbols.get_indexer(index)
+        missing = positions < 0
+        if missing.any():
+            new_symbols = pd.Index(index[missing]).unique()
+            self.symbols = self.symbols.append(new_symbols)
+            if len(self.symbols) > self.last_alert.shape[1]:
+                grown = np.full((len(self.windows), max(len(self.symbols), 2 * self.last_alert.shape[1])), NEVER, dtype=np.int64)
+                grown[:, :self.last_alert.shape[1]] = self.last_alert
+                self.last_alert = grown
+            positions = self.symbols.get_indexer(index)
+        self._last_index, self._last_positions = index, positions
+        return positions
+
+    def state(self):
+        """Registered symbols and their latest alert times (epoch seconds) per window column, e.g. for a restart snapshot."""
+        return {
+            "symbols": np.array(self.symbols.tolist(), dtype=str),
+            "columns": np.array(self.columns, dtype=str),
+            "last_alert": self.last_alert[:, :len(self.symbols)].copy(),
+        }
+
+    def restore(self, symbols, columns, last_alert):
+        """Restores the alert times saved by ``state``; windows that are not in it keep their cooldowns."""
+        symbols = pd.Index(list(symbols), dtype=object)
+        if not len(symbols):
+            return
+        positions = self.positions(symbols)
+        rows = {column: idx for idx, column in enumerate(list(columns))}
+        for window_idx, column in enumerate(self.columns):
+            if column in rows:
+                self.last_alert[window_idx, positions] = last_alert[rows[column]]
+
+    def last_alert_times(self, positions):
+        """Epoch seconds of the latest alert of every slot in any window, NaN for symbols that never alerted."""
+        latest = self.last_alert[:, positions].max(axis=0)
+        return np.where(latest <= NEVER // 2, np.nan, latest.astype(np.float64))
+
+    @staticmethod
+    def format_value(x, unit="%"):
+        return f"{unit}{round(abs(x), 1)} düştü:arrow_down:" if max(0, x) == 0 else f"{unit}{round(abs(x), 1)} arttı:arrow_up:"
+
+    @staticmethod
+    def format_table(symbols, texts):
+        """Symbols left aligned and texts right aligned, the layout ``pd.Series.to_string`` used to produce."""
+        symbols = [str(symbol) for symbol in symbols]
+        symbol_width = max(map(len, symbols))
+        text_width = max(map(len, texts))
+        return "\n".join(f"{symbol:<{symbol_width}}    {text:>{text_width}}" for symbol, text in zip(symbols, texts))
+
+    @staticmethod
+    def format_values(symbols, values, unit="%"):
+        return AlertEvaluator.format_table(symbols, [AlertEvaluator.format_value(x, unit) for x in values])
+
+    def evaluate(self, df, threshold, now=None, positions=None):
+        """Checks every window of a tick against the threshold and the cooldowns.
+
+        Args:
+            df (pd.DataFrame): Tick indexed by symbol that contains the window columns
+            threshold (float | np.ndarray): Scalar, per window (W,) or per window and row (W, N) threshold
+            now (datetime.datetime | float, optional): Evaluation time, the wall clock when omitted
+            positions (np.ndarray, optional): Cooldown slots of the rows when they are not the slots of
+                ``df.index`` (e.g. several names of one asset sharing a cooldown)
+
+        Returns:
+            list: Alert objects of the windows that fired, in window order
+        """
+        if now is None:
+            now = datetime.datetime.now(tz=datetime.timezone.utc)
+        now_sec = int(now.timestamp()) if isinstance(now, datetime.datetime) else int(now)
+        return self.evaluate_arrays(df.index, df[self.columns].to_numpy(dtype=float).T, threshold, now_sec, positions)
+
+    def evaluate_arrays(self, index, values, threshold, now_sec, positions=None):
+        """Array form of ``evaluate``: ``values`` is a (windows x symbols) float array.
+
+        ``positions`` can be passed when the caller already resolved the symbol slots (e.g. a replay).
+        """
+        if positions is None:
+            positions = self.positions(index)
+        threshold = np.asarray(threshold, dtype=float)
+        if threshold.ndim == 1:
+            threshold = threshold[:, None]
+        with np.errstate(invalid="ignore"):
+            fires = (np.abs(values) > threshold) & (now_sec - self.last_alert[:, positions] >= self.cooldowns)
+        if not fires.any():
+            return []
+
+        alerts = []
+        fired = np.zeros(len(positions), dtype=bool)
+        for window_idx, window in enumerate(self.windows):
+            window_fires = fires[window_idx] & ~fired
+            if not window_fires.any():
+                continue
+            fired |= window_fires
+            symbols = list(index[window_fires])
+            window_values = values[window_idx, window_fires]
+            text = window.title + "\n" + self.format_values(symbols, window_values, window.unit) + "\n" + " - " * 15
+            alerts.append(Alert(window, symbols, window_values, text))
+        self.last_alert[:, positions[fired]] = now_sec
+        return alerts
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+import threading
+
+import aiohttp
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .exceptions import FetchError
+from .metrics import DOWNLOADED_BYTES
+
+
+logger = logging.getLogger(__name__)
+
+# orjson decodes large responses several times faster when it is installed
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+class AsyncFetcher:
+    """asyncio HTTP layer with a persistent, keep-alive connection pool.
+
+    The event loop runs on a daemon thread so the synchronous monitoring loops can
+    share one pool: ``get_json``/``post_json``/``get_chunked`` block only for their
+    own request(s), while ``submit`` returns a future and lets the caller keep going.
+
+    Args:
+        limit (int): Maximum number of simultaneous connections in the pool
+        keepalive_timeout (int): Seconds an idle connection is kept open for reuse
+        timeout (int): Default total timeout of a single request in seconds
+    """
+
+    def __init__(self, limit=20, keepalive_timeout=75, timeout=10) -> None:
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session = None
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-fetcher", daemon=True)
+        self._thread.start()
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            # Responses are requested compressed and decompressed transparently
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Accept-Encoding": "gzip, deflate"},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def request_json(self, method, url, timeout=None, **kwargs):
+        session = await self._get_session()
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                body = await response.read()
+                # Transferred (compressed) size when the server sends it
+                DOWNLOADED_BYTES.labels(response.url.host).inc(response.content_length or len(body))
+                if response.status != 200:
+                    raise FetchError(url, response.status, body.decode(errors="replace"), response.headers)
+                return json_loads(body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            # DNS failures, resets and timeouts are raised as FetchError (status 0), so the monitors back off instead of exiting
+            raise FetchError(url, 0, f"{type(exc).__name__}: {exc}") from exc
+
+    async def request_chunked(self, url, ids, params=None, id_param="ids", chunk_size=250, timeout=None):
+        """Requests ``ids`` in parallel chunks and merges the resulting record lists.
+
+        A chunk that fails or times out is logged and left out, so one slow chunk
+        cannot hold back the rest of the detection cycle. When every chunk fails
+        the first error is raised, so the caller can back off.
+        """
+        params = dict(params or {})
+        chunks = [ids[idx: idx + chunk_size] for idx in range(0, len(ids), chunk_size)]
+        tasks = [
+            self.request_json("GET", url, params={**params, id_param: ",".join(chunk)}, timeout=timeout)
+            for chunk in chunks
+        ]
+        responses = await asyncio.gather(*tasks, return_exceptions=True)
+        failures = [response for response in responses if isinstance(response, BaseException)]
+        if failures and len(failures) == len(chunks):
+            raise failures[0]
+        records = []
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, BaseException):
+                logger.error("Chunk starting with %s failed: %r", chunk[0], response)
+                continue
+            records.extend(response)
+        return records
+
+    async def request_many(self, urls, params=None, concurrency=8, timeout=None):
+        """Requests every url with at most ``concurrency`` requests in flight.
+
+        Returns:
+            list: Decoded response, or the raised exception, of every url in order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                return await self.request_json("GET", url, params=params, timeout=timeout)
+        return await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
+
+    def submit(self, coro):
+        """Schedules a coroutine on the fetcher loop and returns a concurrent future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def get_json(self, url, **kwargs):
+        return self.submit(self.request_json("GET", url, **kwargs)).result()
+
+    def post_json(self, url, **kwargs):
+        return self.submit(self.request_json("POST", url, **kwargs)).result()
+
+    def get_chunked(self, url, ids, **kwargs):
+        return self.submit(self.request_chunked(url, ids, **kwargs)).result()
+
+    def get_many(self, urls, **kwargs):
+        return self.submit(self.request_many(urls, **kwargs)).result()
+
+    def close(self):
+        if self._session is not None:
+            self.submit(self._session.close()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_shared_fetcher = None
+
+
+def get_fetcher():
+    """Returns the process-wide fetcher so every monitor reuses the same connection pool."""
+    global _shared_fetcher
+    if _shared_fetcher is None:
+        _shared_fetcher = AsyncFetcher()
+    return _shared_fetcher
@@ -0,0 +1,169 @@
+import re
+from array import array
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .alert_evaluator import AlertWindow
+
+
+DURATION_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$")
+DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# Values derived for every window: change since the window start, distance from the window high and from the window low
+KINDS = ("change", "drawdown", "runup")
+
+DEFAULT_DETECTOR_WINDOWS = ("1m", "3m", "15m", "4h")
+
+
+def parse_duration(value):
+    """Seconds of a duration such as "90s", "15m", "4h" or a plain number of seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = DURATION_PATTERN.match(value)
+    if match is None:
+        raise ValueError(f"Invalid duration {value!r}, expected e.g. 30s, 15m or 4h")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def format_duration(seconds):
+    """Shortest label of a duration in seconds: 60 -> "1m", 14400 -> "4h"."""
+    for unit in ("d", "h", "m"):
+        if seconds >= DURATION_UNITS[unit] and seconds % DURATION_UNITS[unit] == 0:
+            return f"{int(seconds // DURATION_UNITS[unit])}{unit}"
+    return f"{seconds:g}s"
+
+
+def _turkish_duration(seconds):
+    for unit, name in (("d", "GÜNDE"), ("h", "SAATTE"), ("m", "DAKİKADA")):
+        if seconds >= DURATION_UNITS[unit] and seconds % DURATION_UNITS[unit] == 0:
+            return f"{int(seconds // DURATION_UNITS[unit])} {name}"
+    return f"{seconds:g} SANİYEDE"
+
+
+class _SymbolHistory:
+    """Price history of one symbol with a monotonic max and min deque per window.
+
+    Samples live in two flat arrays addressed by an absolute sample number
+    (``base`` is the number of the first kept sample). The deques hold sample
+    numbers whose prices are decreasing (max) or increasing (min), so the front
+    is the window extreme; every sample enters and leaves each deque once.
+    """
+    __slots__ = ("times", "prices", "base", "starts", "highs", "lows")
+
+    def __init__(self, n_windows) -> None:
+        self.times = array("d")
+        self.prices = array("d")
+        self.base = 0
+        self.starts = [0] * n_windows
+        self.highs = [deque() for _ in range(n_windows)]
+        self.lows = [deque() for _ in range(n_windows)]
+
+    def push(self, timestamp, price, windows, out):
+        times, prices = self.times, self.prices
+        number = self.base + len(prices)
+        times.append(timestamp)
+        prices.append(price)
+        base = self.base
+        for idx, seconds in enumerate(windows):
+            highs, lows = self.highs[idx], self.lows[idx]
+            while highs and prices[highs[-1] - base] <= price:
+                highs.pop()
+            highs.append(number)
+            while lows and prices[lows[-1] - base] >= price:
+                lows.pop()
+            lows.append(number)
+
+            # The reference is the latest sample at or before the window start
+            cutoff = timestamp - seconds
+            start = self.starts[idx]
+            while start < number and times[start + 1 - base] <= cutoff:
+                start += 1
+            self.starts[idx] = start
+            while highs[0] < start:
+                highs.popleft()
+            while lows[0] < start:
+                lows.popleft()
+
+            # Left NaN while the history does not cover the window yet
+            if times[start - base] > cutoff:
+                continue
+            column = 3 * idx
+            out[column] = (price / prices[start - base] - 1) * 100
+            out[column + 1] = (price / prices[highs[0] - base] - 1) * 100
+            out[column + 2] = (price / prices[lows[0] - base] - 1) * 100
+
+        # Drops the samples that are older than the start of every window
+        stale = min(self.starts) - base
+        if stale > 64 and stale * 2 > len(prices):
+            del times[:stale]
+            del prices[:stale]
+            self.base += stale
+
+
+class ChangeDetector:
+    """Price change, drawdown and run-up of every symbol over configurable windows, derived from the tick stream.
+
+    For each window the detector reports, in percent:
+
+    - ``change_<window>``: change since the last tick at or before the window start
+    - ``drawdown_<window>``: distance of the price below the window high (<= 0)
+    - ``runup_<window>``: distance of the price above the window low (>= 0)
+
+    Window highs and lows come from monotonic deques, so a tick costs O(1)
+    amortized work per symbol and window however long the window is. A value
+    is NaN until the symbol's history covers its window. Symbols may appear in
+    any subset of the ticks (e.g. one per WebSocket message).
+
+    Args:
+        windows (tuple): Window lengths as seconds or durations ("1m", "15m", "4h")
+        price_column (str): Tick column holding the price
+    """
+
+    def __init__(self, windows=DEFAULT_DETECTOR_WINDOWS, price_column="price") -> None:
+        self.windows = sorted(parse_duration(window) for window in windows)
+        if not self.windows or self.windows[0] <= 0:
+            raise ValueError("Detector windows must be positive durations.")
+        self.labels = [format_duration(seconds) for seconds in self.windows]
+        self.columns = [f"{kind}_{label}" for label in self.labels for kind in KINDS]
+        self.price_column = price_column
+        self.histories = {}
+
+    def update(self, df, timestamp):
+        """Adds the prices of a tick and returns the window values of its symbols.
+
+        Args:
+            df (pd.DataFrame): Tick indexed by symbol with the price column
+            timestamp (float): Epoch seconds of the tick, must not go backwards
+
+        Returns:
+            pd.DataFrame: One row per symbol of the tick, one column per window and kind
+        """
+        prices = df[self.price_column].to_numpy(dtype=np.float64).tolist()
+        empty = [np.nan] * len(self.columns)
+        rows = []
+        histories = self.histories
+        n_windows = len(self.windows)
+        for symbol, price in zip(df.index, prices):
+            row = list(empty)
+            rows.append(row)
+            if not price > 0:
+                continue
+            history = histories.get(symbol)
+            if history is None:
+                history = histories[symbol] = _SymbolHistory(n_windows)
+            history.push(timestamp, price, self.windows, row)
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(self.columns))
+        return pd.DataFrame(values, index=df.index, columns=self.columns)
+
+    def alert_windows(self):
+        """AlertWindow objects of the detector columns, each with the cooldown of its window."""
+        windows = []
+        for seconds, label in zip(self.windows, self.labels):
+            period = _turkish_duration(seconds)
+            cooldown = int(seconds) + 15
+            windows.append(AlertWindow(f"change_{label}", cooldown, f":right_anger_bubble:*SON {period}*"))
+            windows.append(AlertWindow(f"drawdown_{label}", cooldown, f":chart_with_downwards_trend:*SON {period} ZİRVEDEN DÜŞÜŞ*"))
+            windows.append(AlertWindow(f"runup_{label}", cooldown, f":chart_with_upwards_trend:*SON {period} DİPTEN YÜKSELİŞ*"))
+        return windows
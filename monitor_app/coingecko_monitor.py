@@ -1,202 +1,422 @@
-import requests
+import numpy as np
 import pandas as pd
 import datetime
-from time import sleep
+import time
+from monitor_app.alert_evaluator import AlertEvaluator, AlertWindow
+from monitor_app.async_fetcher import get_fetcher
+from monitor_app.ewma_detector import EWMADetector
+from monitor_app.exceptions import FetchError
+from monitor_app.live_snapshot import start_live_snapshot
 from monitor_app.slack_api import SlackAgent
+from monitor_app.sources import PollingSource
+from monitor_app.tick_store import TickStore
 from monitor_app.exceptions import InputError
+from monitor_app.metrics import TickClock, count_error, stage_timer, start_metrics_server
+from monitor_app.rolling_buffer import RollingBuffer
+from monitor_app.scheduler import HotSymbolPlanner, PollScheduler
+from monitor_app.settings import MonitorSettings
+from monitor_app.snapshot import load_snapshot, save_snapshot
+from monitor_app.symbol_index import SymbolIndex, TOKEN_LIST_PATH
 import os
 
 
 pd.options.display.max_columns = None
 
-# Temporal CSV file
-TEMPORAL_FILE_NAME = "temporal_file.csv"
+# Directory of the columnar tick store when TICK_STORE_DIR is not set
+DEFAULT_TICK_STORE_DIR = "tick_store"
 
-# CoinGecko asset ids that will be monitored by the script ("id" field must be provided)
-SYMBOLS = os.environ["SYMBOLS"].split(",")
 
-# Threshold value after which an alert message will be sent
-THRESHOLD = float(os.environ["THRESHOLD"])
+def coingecko_windows(alert_repeat_cycle_freq, settings=None):
+    """CryptoMonitor alert windows: distance from the rolling mean, the 1 hour change and the EWMA z-scores when enabled."""
+    windows = (
+        AlertWindow("pct_change", alert_repeat_cycle_freq, "*SON 5 DAKİKADA*"),
+        AlertWindow("price_change_percentage_1h_in_currency", 60 * 60, ":right_anger_bubble:*In the last hour:*"),
+    )
+    if settings is not None and settings.ewma_half_life:
+        detector = EWMADetector(settings.ewma_half_life, settings.volume_half_life)
+        windows += tuple(detector.alert_windows(alert_repeat_cycle_freq))
+    return windows
 
-# Number of minutes that the script will take into account for Moving Averaging process
-LOOKBACK_MINUTES = int(os.environ["LOOKBACK_MINUTES"])
 
-# Time interval between each consequent alerts (e.g., %5 change continues for 60 secs but the alert should be sent once instead of 30 repetitions.)
-# Send the alert every <ALERT_REPEAT_CYCLE_FREQ> sencods.
-ALERT_REPEAT_CYCLE_FREQ = int(os.environ["ALERT_REPEAT_CYCLE_FREQ"])
+def window_thresholds(windows, threshold, zscore_threshold):
+    """Threshold of every window: ``zscore_threshold`` for the z-score windows, ``threshold`` (percent) for the others."""
+    return np.array([zscore_threshold if window.unit == "z=" else threshold for window in windows], dtype=float)
 
-# chromedriver.exe path
-CHROME_EXE_PATH = os.environ["CHROME_EXE_PATH"]
 
-class CryptoMonitor:
-    def __init__(self, symbols):
-        self.SlackAgentInstance = SlackAgent()
+class CryptoMonitor(PollingSource):
+    source_name = "coingecko"
+
+    def __init__(self, symbols, tick_store_dir=None, settings=None):
+        settings = settings or MonitorSettings.from_env("coingecko")
+        self.settings = settings
+        self.SlackAgentInstance = SlackAgent(self.settings)
         self.slack_channel = "coingecko"
         self.is_deleted = False
-        self.symbol_ids = ",".join(symbols)
-        self.THRESHOLD = THRESHOLD
-        self.alert_repeat_cycle_sec = round(ALERT_REPEAT_CYCLE_FREQ / 3)
+        self.symbol_ids = list(symbols)
+        self.validate_symbols()
+        self.THRESHOLD = settings.threshold
 
         self.loop_time_sleep = 3
-        self.rolling_window = int(LOOKBACK_MINUTES * (60 / self.loop_time_sleep))
-        self.total_row_limit = 1500 # self.rolling_window * 2
+        self.poll_interval = self.loop_time_sleep
+        self.rolling_window = int(settings.lookback_minutes * (60 / self.loop_time_sleep))
         self.used_columns = [
             "symbol",
             "current_price",
-            "date",
             "price_change_percentage_1h_in_currency",
             "total_volume",
-            "is_checked_last_min",
-            "is_checked_last_hour",
             "last_updated"
         ]
-        self.url = f"https://api.coingecko.com/api/v3/coins/markets?vs_currency=usd&ids={self.symbol_ids}&order=gecko_asc&sparkline=false&price_change_percentage=1h"
+        self.api_url = settings.coingecko_api_url
+        self.url = f"{self.api_url}/coins/markets"
+        # Markets endpoint returns at most 250 records per page, larger id lists are fetched in parallel chunks
+        self.chunk_size = 250
+        self.url_params = {
+            "vs_currency": "usd",
+            "order": "gecko_asc",
+            "per_page": self.chunk_size,
+            "sparkline": "false",
+            "price_change_percentage": "1h",
+        }
+        self.fetcher = get_fetcher()
+        self.scheduler = PollScheduler(self.loop_time_sleep)
+        self.planner = HotSymbolPlanner(
+            self.symbol_ids, chunk_size=self.chunk_size, interval=self.loop_time_sleep, request_budget=settings.request_budget
+        )
+        self.id_by_symbol = {}
+        self.stored_columns = [
+            "current_price",
+            "price_change_percentage_1h_in_currency",
+            "total_volume",
+            "mean",
+            "pct_change",
+        ]
+        tick_store_dir = tick_store_dir or settings.tick_store_dir or DEFAULT_TICK_STORE_DIR
+        self.tick_store_dir = tick_store_dir
+        self.tick_store = TickStore(tick_store_dir, columns=self.stored_columns)
+        # Rolling buffer and cooldowns are saved here for warm restarts
+        self.snapshot_path = os.path.join(tick_store_dir, "snapshot.npz")
+        self.snapshot_interval = settings.snapshot_interval
+        self.last_snapshot = time.monotonic()
+        # Latest tick (one row per symbol), its time and the rolling price store built on the first response
         self.df_main = pd.DataFrame()
+        self.tick_time = None
+        self.buffer = None
+        self.last_mean = None
+        # Return (and volume) z-scores of the latest tick, their state does not grow with the lookback
+        self.ewma = None
+        if settings.ewma_half_life:
+            self.ewma = EWMADetector(settings.ewma_half_life, settings.volume_half_life)
+        self.zscores = None
+        # Thresholds and cooldowns of the rolling mean, 1 hour and z-score windows, keyed by the upper case symbols
+        windows = coingecko_windows(settings.alert_repeat_cycle_freq, settings)
+        self.evaluator = AlertEvaluator(windows)
+        self.thresholds = window_thresholds(windows, self.THRESHOLD, settings.zscore_threshold)
+        self.alert_symbols = None
 
+    def validate_symbols(self):
+        """Checks the configured ids against docs/coingecko_token_list.json before anything is fetched.
 
-    def _check_data_size(self):
-        size = self.df_main.shape[0]
-        return size >= self.total_row_limit
+        Raises:
+            InputError: If an id is not in the token list
+        """
+        if not os.path.exists(TOKEN_LIST_PATH):
+            print(f"{TOKEN_LIST_PATH} not found, symbols will not be validated before the first request.")
+            return
+        index = SymbolIndex.load(TOKEN_LIST_PATH)
+        missing = index.validate(self.symbol_ids)
+        if missing:
+            hints = [f"{coin_id} (did you mean: {', '.join(index.suggest(coin_id)) or '-'})" for coin_id in missing]
+            raise InputError(
+                "Following symbols are not CoinGecko ids (the token list may also be outdated): " + "; ".join(hints)
+            )
 
-    def _create_temporal_csv_file(self, df):
-        df.columns.name = None
-        df.reset_index(inplace=True)
-        df.to_csv(TEMPORAL_FILE_NAME, index=False)
-        print("CSV Created.")
+    def _init_buffer(self, symbols):
+        self.buffer = RollingBuffer(symbols, window=self.rolling_window)
+        self.alert_symbols = pd.Index(self.buffer.symbols).str.upper()
 
-    def _append_csv(self, df):
-        df.columns.name = None
-        df.reset_index(inplace=True)
-        df.to_csv(TEMPORAL_FILE_NAME, mode="a", header=False, index=False)
+    def _append_ticks(self, frame):
+        self.tick_store.append(frame[self.stored_columns], timestamp=self.tick_time.astimezone())
 
-    def _remove_first_row(self,):
-        self.df_main.drop(index=self.df_main.iloc[0].name, inplace=True)
+    def get_data(self, symbol_ids=None):
+        """Fetches the markets of ``symbol_ids`` (every configured id when omitted).
 
-    def get_data(self):
-        response = requests.request("GET", self.url)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(response.json())
-            quit()
+        Raises:
+            FetchError: If the request (or every chunk of it) failed
+        """
+        return self.fetcher.get_chunked(
+            self.url, self.symbol_ids if symbol_ids is None else symbol_ids, params=self.url_params, chunk_size=self.chunk_size
+        )
 
     def process_data(self, response):
-        df = pd.DataFrame(response)
-        df["date"] = datetime.datetime.now()
-        df["is_checked_last_min"] = False
-        df["is_checked_last_hour"] = False
-        price = df[self.used_columns].pivot(index="date", columns="symbol")
-        price.columns.name = None
+        """Latest tick of a markets response, one row per symbol."""
+        self.tick_time = datetime.datetime.now()
+        price = pd.DataFrame(response, columns=self.used_columns).set_index("symbol")
+        price.index.name = None
         return price
 
     def concatenate_response(self):
-        response = self.get_data()
-        price = self.process_data(response)
-        self.df_main = pd.concat([self.df_main, price], axis=0)
+        """Fetches one tick into the buffer.
 
-    def calculate_stats(self):
-        mean = (
-            self.df_main[["current_price"]].rolling(self.rolling_window).mean().shift()
-        )
-        mean.columns = pd.MultiIndex.from_product(
-            [["mean"], self.df_main["current_price"]]
-        )
-        df_stats = pd.concat([self.df_main, mean], axis=1)
-        pct_change = df_stats.apply(
-            lambda x: (x["current_price"] - x["mean"]) / x["mean"] * 100, axis=1
-        )
-        pct_change.columns = pd.MultiIndex.from_product(
-            [["pct_change"], self.df_main["current_price"]]
-        )
-        df_stats = pd.concat([df_stats, pct_change], axis=1)
-        df_stats["pct_change"] = df_stats["pct_change"].round(decimals=5)
-        return df_stats
-
-    def filter_anomalies(self, df_stats):
-        last_min = df_stats.iloc[-1, :]["pct_change"]
-        now_date = self.df_main.iloc[-1].name
-        last_min_stats = last_min.loc[
-            (last_min.abs() > self.THRESHOLD)
-            & (
-                df_stats.rolling(self.alert_repeat_cycle_sec)
-                .is_checked_last_min.max()
-                .iloc[-1, :]
-                == 0
+        Returns:
+            bool: False when the request budget left nothing to fetch in this tick
+        """
+        # The first tick fetches every id so that the buffer knows the whole universe
+        symbol_ids = self.symbol_ids if self.buffer is None else self.planner.plan()
+        if not symbol_ids:
+            return False
+        with stage_timer("fetch"):
+            response = self.get_data(symbol_ids)
+        with stage_timer("parse"):
+            price = self.process_data(response)
+        if self.buffer is None:
+            self._init_buffer(price.index.tolist())
+        self.id_by_symbol.update((record["symbol"], record["id"]) for record in response)
+        self.df_main = price
+        # Mean of the previous <rolling_window> ticks, taken before the current tick enters the buffer
+        self.last_mean = self.buffer.mean()
+        values = self.buffer.align(price["current_price"])
+        # Ids left out of a budgeted tick keep their last price
+        stale = ~pd.Index(self.buffer.symbols).isin(price.index)
+        if stale.any():
+            values[stale] = self.buffer.latest()[stale]
+        self.buffer.push(values)
+        if self.ewma is not None:
+            # Ids that were not fetched are skipped (NaN) instead of repeating their last price as a zero return
+            self.zscores = self.ewma.update(
+                pd.Index(self.buffer.symbols), self.buffer.align(price["current_price"]),
+                self.tick_time.timestamp(), self.buffer.align(price["total_volume"]),
             )
-        ]
+        return True
 
-        last_hour = df_stats.iloc[-1, :]["price_change_percentage_1h_in_currency"]
-        last_hour_stats = last_hour.loc[
-            (last_hour.abs() > self.THRESHOLD)
-            & (
-                df_stats.rolling(10 * 2 * 60)
-                .is_checked_last_hour.max()
-                .iloc[-1, :]
-                == 0
+    def save_snapshot(self, now=None):
+        """Writes the rolling buffer and the cooldowns to ``snapshot_path`` (atomically)."""
+        if self.buffer is None:
+            return
+        now = time.time() if now is None else now
+        with stage_timer("snapshot"):
+            save_snapshot(
+                self.snapshot_path,
+                saved_at=np.float64(now),
+                interval=np.float64(self.loop_time_sleep),
+                symbol_ids=np.array(sorted(set(self.symbol_ids))),
+                symbols=np.array(self.buffer.symbols),
+                rows=self.buffer.rows(),
+                id_symbols=np.array(list(self.id_by_symbol)),
+                id_values=np.array(list(self.id_by_symbol.values())),
+                **{f"alert_{name}": value for name, value in self.evaluator.state().items()},
+                **({} if self.ewma is None else {f"ewma_{name}": value for name, value in self.ewma.state().items()}),
             )
-        ]
+        self.last_snapshot = time.monotonic()
 
-        if last_min_stats.shape[0] > 0:
-            print(last_min_stats.tail())
-            last_min_stats = last_min_stats.map(lambda x: f"%{round(abs(x), 1)} düştü:arrow_down:" if max(0, x) == 0 else f"%{round(abs(x), 1)} arttı:arrow_up:")
-            self.df_main.loc[now_date, ("is_checked_last_min", last_min_stats.index)] = True
-            print(" - " * 10)
-            last_min_stats.index.name = None
-            last_min_stats.index = last_min_stats.index.str.upper()
-            entry_edit = "*SON 5 DAKİKADA*\n" + last_min_stats.to_string() + "\n" + " - " * 15
-            # self.SlackAgentInstance.send_alert(
-            #     text=entry_edit, channel=self.slack_channel
-            # )
+    def maybe_save_snapshot(self):
+        if self.snapshot_interval and time.monotonic() - self.last_snapshot >= self.snapshot_interval:
+            self.save_snapshot()
+
+    def restore_snapshot(self, snapshot, now=None):
+        """Rebuilds the rolling buffer from a snapshot of the same universe that is younger than the lookback window.
+
+        The ticks missed while the monitor was down are left out of the window.
+
+        Returns:
+            bool: False when the snapshot does not fit (other ids or lookback, too old)
+        """
+        now = time.time() if now is None else now
+        age = now - float(snapshot["saved_at"])
+        if (
+            set(snapshot["symbol_ids"].tolist()) != set(self.symbol_ids)
+            or float(snapshot["interval"]) != self.loop_time_sleep
+            or not 0 <= age <= self.rolling_window * self.loop_time_sleep
+        ):
+            return False
+        self._init_buffer(snapshot["symbols"].tolist())
+        self.buffer.fill(snapshot["rows"])
+        self.id_by_symbol.update(zip(snapshot["id_symbols"].tolist(), snapshot["id_values"].tolist()))
+        self.restore_cooldowns(snapshot)
+        if self.ewma is not None and "ewma_state" in snapshot:
+            self.ewma.restore(snapshot["ewma_symbols"].tolist(), snapshot["ewma_state"])
+        return True
 
-        elif last_hour_stats.shape[0] > 0:
-            print(last_hour_stats.tail())
-            last_hour_stats = last_hour_stats.map(lambda x: f"%{round(abs(x), 1)} düştü :arrow_down:" if max(0, x) == 0 else f"%{round(abs(x), 1)} arttı :arrow_up:")
-            self.df_main.loc[now_date, ("is_checked_last_hour", last_hour_stats.index)] = True
-            print(" - " * 10)
-            last_hour_stats.index.name = None
-            last_hour_stats.index = last_hour_stats.index.str.upper()
-            entry_edit = ":right_anger_bubble:*In the last hour:*\n" + last_hour_stats.to_string() + "\n" + " - " * 15
+    def restore_cooldowns(self, snapshot):
+        """Restores the alert times (epoch seconds) saved with the snapshot."""
+        if "alert_last_alert" in snapshot:
+            self.evaluator.restore(snapshot["alert_symbols"].tolist(), snapshot["alert_columns"].tolist(), snapshot["alert_last_alert"])
+
+    def fetch_history(self, coin_ids, days=1, concurrency=8):
+        """Price history of ``coin_ids`` from /coins/{id}/market_chart, requested concurrently.
+
+        Returns:
+            dict: id -> (epoch seconds, prices) arrays; ids whose request failed are left out
+        """
+        urls = [f"{self.api_url}/coins/{coin_id}/market_chart" for coin_id in coin_ids]
+        responses = self.fetcher.get_many(urls, params={"vs_currency": "usd", "days": days}, concurrency=concurrency)
+        history = {}
+        for coin_id, response in zip(coin_ids, responses):
+            if isinstance(response, BaseException):
+                count_error(response)
+                continue
+            if not response.get("prices"):
+                continue
+            points = np.array(response["prices"], dtype=np.float64)
+            history[coin_id] = (points[:, 0] / 1000, points[:, 1])
+        return history
+
+    def backfill(self, now=None):
+        """Fills the lookback window from the historical prices of every symbol in the buffer.
+
+        The window ticks are interpolated from the market chart points; ticks before
+        the first point stay empty. The latest fetched tick is kept as the newest row.
+
+        Returns:
+            int: Number of symbols that were backfilled
+        """
+        now = time.time() if now is None else now
+        symbols = self.buffer.symbols
+        coin_ids = [self.id_by_symbol.get(symbol, symbol) for symbol in symbols]
+        days = max(1, -(-self.rolling_window * self.loop_time_sleep // (24 * 60 * 60)))
+        with stage_timer("backfill"):
+            history = self.fetch_history(sorted(set(coin_ids)), days=days)
+        tick_times = now - self.loop_time_sleep * np.arange(self.rolling_window, 0, -1)
+        rows = np.full((len(tick_times), len(symbols)), np.nan)
+        for column, coin_id in enumerate(coin_ids):
+            if coin_id in history:
+                times, prices = history[coin_id]
+                rows[:, column] = np.interp(tick_times, times, prices, left=np.nan)
+        latest = self.buffer.latest().copy()
+        self.buffer.fill(rows)
+        self.last_mean = self.buffer.mean()
+        self.buffer.push(latest)
+        return sum(coin_id in history for coin_id in coin_ids)
+
+    def warm_start(self, now=None):
+        """Arms the detection at start: restores the latest snapshot, or backfills the window when there is none.
+
+        Returns:
+            str: "snapshot", "backfill" or "cold" (the first tick could not be fetched)
+        """
+        snapshot = load_snapshot(self.snapshot_path)
+        if snapshot is not None and self.restore_snapshot(snapshot, now):
+            print(f"Rolling state restored from {self.snapshot_path}.")
+            return "snapshot"
+        try:
+            self.concatenate_response()
+            self.scheduler.success()
+            n_backfilled = self.backfill(now)
+        except FetchError as exc:
+            count_error(exc)
+            print(f"Warm start failed ({exc.status}), the window fills from live ticks.")
+            return "cold"
+        if snapshot is not None:
+            self.restore_cooldowns(snapshot)
+        print(f"Lookback window backfilled for {n_backfilled}/{len(self.buffer.symbols)} symbols.")
+        return "backfill"
+
+    def update_planner(self):
+        """Marks the ids whose 1 hour change or distance from the rolling mean came near the threshold as hot."""
+        if self.planner.request_budget is None:
+            return
+        scores = np.fmax(
+            np.abs(self.buffer.pct_change(self.buffer.latest(), mean=self.last_mean)),
+            np.abs(self.buffer.align(self.df_main["price_change_percentage_1h_in_currency"])),
+        )
+        ids = [self.id_by_symbol.get(symbol, symbol) for symbol in self.buffer.symbols]
+        self.planner.update(pd.Series(scores, index=ids), self.THRESHOLD)
+
+    def tick_frame(self):
+        """Latest tick as one row per symbol with the stored columns, the rolling mean and the distance from it."""
+        current_price = self.buffer.latest()
+        return pd.DataFrame({
+            "current_price": current_price,
+            "price_change_percentage_1h_in_currency": self.buffer.align(self.df_main["price_change_percentage_1h_in_currency"]),
+            "total_volume": self.buffer.align(self.df_main["total_volume"]),
+            "mean": self.last_mean,
+            "pct_change": np.round(self.buffer.pct_change(current_price, mean=self.last_mean), decimals=5),
+            **({} if self.zscores is None else {column: self.zscores[column].to_numpy() for column in self.zscores}),
+        }, index=pd.Index(self.buffer.symbols))
+
+    def read_ticks(self):
+        """Fetches one tick and maps it to the common tick columns (distance from the rolling mean as ``change_5min``)."""
+        self.concatenate_response()
+        frame = self.tick_frame()
+        df = pd.DataFrame({
+            "price": frame["current_price"].to_numpy(),
+            "change_1h": frame["price_change_percentage_1h_in_currency"].to_numpy(),
+            "change_5min": frame["pct_change"].to_numpy(),
+        }, index=frame.index.str.upper())
+        return df
+
+    def filter_anomalies(self, frame):
+        """Prints the alerts of the rolling mean, 1 hour and z-score windows of a tick (one window per symbol)."""
+        values = frame.reindex(columns=self.evaluator.columns).to_numpy(dtype=float).T
+        positions = self.evaluator.positions(self.alert_symbols)
+        alerts = self.evaluator.evaluate_arrays(self.alert_symbols, values, self.thresholds, int(self.tick_time.timestamp()), positions)
+        for alert in alerts:
+            print(alert.text)
             # self.SlackAgentInstance.send_alert(
-            #     text=entry_edit, channel=self.slack_channel
+            #     text=alert.text, channel=self.slack_channel
             # )
+        return alerts
 
-            
+    def publish_live(self, live, frame=None):
+        """Copies the latest tick, its rolling stats and the latest alert of every symbol into the live snapshot."""
+        if live is None:
+            return
+        frame = self.tick_frame() if frame is None else frame
+        last_alert = self.evaluator.last_alert_times(self.evaluator.positions(self.alert_symbols))
+        live.publish(
+            frame, timestamp=time.time(), price=frame["current_price"].to_numpy(),
+            change_1h=frame["price_change_percentage_1h_in_currency"].to_numpy(), last_alert=last_alert,
+        )
 
     def start_monitor(self):
         print("start df: ", self.df_main)
+        start_metrics_server(self.settings.metrics_port)
+        clock = TickClock(self.source_name, self.loop_time_sleep)
+        self.warm_start()
+        # Only the single process monitor publishes, the shard workers would share one block
+        live = start_live_snapshot(self.settings, tick_store_dir=self.tick_store_dir)
         is_start = True
-        while True:
-            if self._check_data_size():
-                self._remove_first_row()
-            self.concatenate_response()
-            if is_start:
-                found_columns = self.df_main["current_price"].columns.str.upper().tolist()
-                print(f"Following symbols were succesfully found in the API:\n{' - ' * 20}\n",
-                    ", ".join(found_columns),
-                    f"with length of {len(found_columns)} symbols in total.\n{' - ' * 20}\n")
-            assert len(SYMBOLS) == len(self.df_main["current_price"].columns.tolist()), InputError("One of the symbols could not be found")
-            df_stats = self.calculate_stats()
-            if df_stats.shape[0] > 0:
-                self.filter_anomalies(df_stats)
-            #print(self.df_main.iloc[-1].name.strftime("%m-%d %H:%M:%S"))
-
-            if is_start:
-                self._create_temporal_csv_file(df_stats)
+        try:
+            while True:
+                self.scheduler.wait()
+                clock.tick()
+                try:
+                    is_fetched = self.concatenate_response()
+                except FetchError as exc:
+                    count_error(exc)
+                    delay = self.scheduler.failure(exc)
+                    print(f"CoinGecko request failed ({exc.status}), retrying in {delay:.1f} seconds.")
+                    continue
+                self.scheduler.success()
+                if not is_fetched:
+                    continue
+                if is_start:
+                    found_columns = [symbol.upper() for symbol in self.buffer.symbols]
+                    print(f"Following symbols were succesfully found in the API:\n{' - ' * 20}\n",
+                        ", ".join(found_columns),
+                        f"with length of {len(found_columns)} symbols in total.\n{' - ' * 20}\n")
+                    assert len(self.symbol_ids) == len(found_columns), InputError("One of the symbols could not be found")
+                with stage_timer("stats"):
+                    frame = self.tick_frame()
+                    self.filter_anomalies(frame)
+                    self.update_planner()
+                #print(self.tick_time.strftime("%m-%d %H:%M:%S"))
+
+                with stage_timer("store_append"):
+                    self._append_ticks(frame)
+                with stage_timer("publish"):
+                    self.publish_live(live, frame)
+                self.maybe_save_snapshot()
                 is_start = False
-            elif not is_start:
-                self._append_csv(df_stats.iloc[-1:, :])
-                
-            if (
-                datetime.datetime.now().strftime("%H:%M") == "00:00"
-                and not self.is_deleted
-            ):
-                self.SlackAgentInstance.delete_messages(channel=self.slack_channel)
-                self.is_deleted = True
-                is_start = True
-
-            elif datetime.datetime.now().strftime("%H:%M") == "00:01":
-                self.is_deleted = False
-                sleep(self.loop_time_sleep)
-
-            else:
-                sleep(self.loop_time_sleep)
\ No newline at end of file
+
+                if (
+                    datetime.datetime.now().strftime("%H:%M") == "00:00"
+                    and not self.is_deleted
+                ):
+                    self.SlackAgentInstance.delete_messages(channel=self.slack_channel)
+                    self.is_deleted = True
+                    is_start = True
+
+                elif datetime.datetime.now().strftime("%H:%M") == "00:01":
+                    self.is_deleted = False
+        finally:
+            self.save_snapshot()
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+from .alert_evaluator import AlertWindow
+from .change_detector import format_duration, parse_duration
+
+
+# Ticks a symbol needs before its z-scores are reported, the variance of the first ticks is not meaningful
+DEFAULT_WARMUP = 20
+
+
+class EWMADetector:
+    """Exponentially weighted mean and variance of the price returns and volumes of every symbol.
+
+    Each tick updates, for all symbols at once, the weighted mean and variance
+    of the log return since the previous tick and of the log volume, and reports
+    how many standard deviations the new values are away from the weights
+    before the update (z-scores). The weights decay by half every half-life
+    (in seconds, so irregular ticks are weighted by the time between them)
+    instead of covering a fixed number of rows, and the state is seven floats
+    per symbol whatever the horizon is.
+
+    Providers refresh a price less often than it is polled, so a tick that
+    repeats the last price is not counted and returns are divided by the square
+    root of the seconds they span; otherwise the zero returns of the repeated
+    prices would shrink the variance and every refresh would look like a jump.
+
+    Args:
+        price_half_life (float | str): Half-life of the return weights, seconds or a duration ("15m")
+        volume_half_life (float | str, optional): Half-life of the volume weights, volumes are ignored when omitted
+        warmup (int): Ticks of a symbol before its z-scores are reported (NaN until then)
+        capacity (int): Initial number of symbol slots, grown on demand
+    """
+    state_columns = ("last_price", "last_time", "return_mean", "return_var", "volume_mean", "volume_var", "count")
+
+    def __init__(self, price_half_life, volume_half_life=None, warmup=DEFAULT_WARMUP, capacity=256) -> None:
+        self.price_half_life = parse_duration(price_half_life)
+        self.volume_half_life = None if volume_half_life is None else parse_duration(volume_half_life)
+        if self.price_half_life <= 0 or (self.volume_half_life is not None and self.volume_half_life <= 0):
+            raise ValueError("EWMA half-lives must be positive durations.")
+        self.warmup = warmup
+        self.symbols = pd.Index([], dtype=object)
+        self.values = np.full((len(self.state_columns), capacity), np.nan)
+        self.values[self.state_columns.index("count")] = 0
+        self._last_index = None
+        self._last_positions = None
+
+    def positions(self, index):
+        """Returns the slot of every symbol in ``index``, registering unknown symbols."""
+        if self._last_index is not None and (index is self._last_index or index.equals(self._last_index)):
+            return self._last_positions
+        positions = self.symbols.get_indexer(index)
+        missing = positions < 0
+        if missing.any():
+            self.symbols = self.symbols.append(pd.Index(index[missing]).unique())
+            if len(self.symbols) > self.values.shape[1]:
+                grown = np.full((len(self.state_columns), max(len(self.symbols), 2 * self.values.shape[1])), np.nan)
+                grown[self.state_columns.index("count")] = 0
+                grown[:, :self.values.shape[1]] = self.values
+                self.values = grown
+            positions = self.symbols.get_indexer(index)
+        self._last_index, self._last_positions = index, positions
+        return positions
+
+    def state(self):
+        """Registered symbols and their state columns, e.g. for a restart snapshot."""
+        return {
+            "symbols": np.array(self.symbols.tolist(), dtype=str),
+            "state": self.values[:, :len(self.symbols)].copy(),
+        }
+
+    def restore(self, symbols, state):
+        """Restores the state saved by ``state``."""
+        symbols = pd.Index(list(symbols), dtype=object)
+        if len(symbols):
+            positions = self.positions(symbols)
+            self.values[:, positions] = state
+
+    @staticmethod
+    def _decay(elapsed, half_life):
+        """Weight of the new value after ``elapsed`` seconds."""
+        return -np.expm1(-np.log(2) * elapsed / half_life)
+
+    @staticmethod
+    def _update(values, mean, var, alpha):
+        """One weighted mean/variance step; returns the z-scores against the previous weights and the new state."""
+        deviation = values - mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            zscores = deviation / np.sqrt(var)
+        step = alpha * deviation
+        return zscores, mean + step, (1 - alpha) * (var + deviation * step)
+
+    def update(self, index, prices, timestamp, volumes=None):
+        """Adds one tick and returns the z-scores of its symbols.
+
+        Symbols without a new price in the tick (NaN, e.g. not fetched this tick,
+        or unchanged) keep their state and get NaN z-scores.
+
+        Args:
+            index (pd.Index): Symbols of the tick
+            prices (np.ndarray): Price of every symbol
+            timestamp (float): Epoch seconds of the tick
+            volumes (np.ndarray, optional): Traded volume of every symbol
+
+        Returns:
+            pd.DataFrame: zscore_return and zscore_volume of every symbol of the tick
+        """
+        positions = self.positions(index)
+        prices = np.asarray(prices, dtype=np.float64)
+        last_price, last_time, return_mean, return_var, volume_mean, volume_var, count = self.values[:, positions]
+        valid = (prices > 0) & (prices != last_price)
+        first = valid & np.isnan(last_price)
+
+        # Until a half-life holds enough returns the weights are the plain running mean and variance (1/n)
+        alpha = np.fmax(self._decay(timestamp - last_time, self.price_half_life), 1 / np.fmax(count, 1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.log(prices / last_price) / np.sqrt(timestamp - last_time)
+        return_mean = np.where(np.isnan(return_mean) & valid, returns, return_mean)
+        return_var = np.where(np.isnan(return_var) & valid, 0.0, return_var)
+        return_z, new_return_mean, new_return_var = self._update(returns, return_mean, return_var, alpha)
+
+        volume_z = np.full(len(positions), np.nan)
+        if self.volume_half_life is not None and volumes is not None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                log_volumes = np.log(np.asarray(volumes, dtype=np.float64))
+            has_volume = valid & np.isfinite(log_volumes)
+            volume_mean = np.where(np.isnan(volume_mean) & has_volume, log_volumes, volume_mean)
+            volume_var = np.where(np.isnan(volume_var) & has_volume, 0.0, volume_var)
+            volume_alpha = np.fmax(self._decay(timestamp - last_time, self.volume_half_life), 1 / np.fmax(count, 1))
+            volume_z, new_volume_mean, new_volume_var = self._update(log_volumes, volume_mean, volume_var, volume_alpha)
+            updated = has_volume & ~first
+            volume_mean = np.where(updated, new_volume_mean, volume_mean)
+            volume_var = np.where(updated, new_volume_var, volume_var)
+
+        updated = valid & ~first
+        self.values[:, positions] = np.vstack([
+            np.where(valid, prices, last_price),
+            np.where(valid, timestamp, last_time),
+            np.where(updated, new_return_mean, np.where(first, np.nan, return_mean)),
+            np.where(updated, new_return_var, np.where(first, np.nan, return_var)),
+            volume_mean,
+            volume_var,
+            count + valid,
+        ])
+        ready = updated & (count + 1 > self.warmup)
+        return pd.DataFrame({
+            "zscore_return": np.where(ready, return_z, np.nan),
+            "zscore_volume": np.where(ready, volume_z, np.nan),
+        }, index=index)
+
+    def alert_windows(self, cooldown):
+        """AlertWindow objects of the z-score columns (their threshold is in standard deviations)."""
+        windows = [AlertWindow("zscore_return", cooldown, f":zap:*FİYAT ANOMALİSİ (z, {format_duration(self.price_half_life)})*", unit="z=")]
+        if self.volume_half_life is not None:
+            windows.append(AlertWindow("zscore_volume", cooldown, f":bar_chart:*HACİM ANOMALİSİ (z, {format_duration(self.volume_half_life)})*", unit="z="))
+        return windows
@@ -5,4 +5,12 @@ class LoopError(Exception):
     pass
 
 class PostRequestFail(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class FetchError(Exception):
+    def __init__(self, url, status, text="", headers=None):
+        super().__init__(f"{url} returned {status}: {text[:200]}")
+        self.url = url
+        self.status = status
+        self.text = text
+        self.headers = dict(headers or {})
@@ -0,0 +1,272 @@
+"""In-process counters and histograms served in the Prometheus text format.
+
+    METRICS_PORT=9108 python monitor.py
+    curl http://127.0.0.1:9108/metrics
+
+Observing a value is a bisect plus a few additions under a lock, timers use
+``time.perf_counter`` (monotonic), so the instrumentation stays enabled in
+production. The HTTP endpoint only starts when a port is configured.
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self, metric) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name):
+        yield name, (), self.value
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child) -> None:
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, metric) -> None:
+        self.bounds = metric.buckets
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager that observes the seconds spent in its block."""
+        return _Timer(self)
+
+    def samples(self, name):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            yield f"{name}_bucket", (("le", _format_value(bound)),), cumulative
+        yield f"{name}_sum", (), total
+        yield f"{name}_count", (), cumulative
+
+
+class Metric:
+    """Named metric family with optional labels.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Label names, values are given to ``labels`` in the same order
+    """
+    kind = None
+    child_class = None
+
+    def __init__(self, name, documentation, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Returns the series of the given label values (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self.child_class(self))
+        return child
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            base = tuple(zip(self.labelnames, values))
+            for name, extra, value in child.samples(self.name):
+                labels = ",".join(f'{key}="{_escape(label)}"' for key, label in base + extra)
+                lines.append(f"{name}{{{labels}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+    child_class = _CounterChild
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+    child_class = _HistogramChild
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class MetricsRegistry:
+    """Holds the metric families and renders them in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        return "\n".join(line for metric in self.metrics for line in metric.collect()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "monitor_stage_seconds", "Seconds spent in a stage of the monitoring loop", ["stage"]
+)
+TICKS = REGISTRY.counter("monitor_ticks_total", "Ticks processed", ["source"])
+TICK_LAG = REGISTRY.histogram(
+    "monitor_tick_lag_seconds", "Delay of a tick behind its target interval", ["source"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0),
+)
+LAST_TICK = REGISTRY.gauge("monitor_last_tick_timestamp_seconds", "Unix time of the latest tick", ["source"])
+ERRORS = REGISTRY.counter("monitor_errors_total", "Exceptions caught by the monitoring loops", ["type"])
+ALERTS = REGISTRY.counter("monitor_alerts_total", "Symbols alerted", ["window"])
+SLACK_MESSAGES = REGISTRY.counter("monitor_slack_messages_total", "Slack posts by result", ["result"])
+DOWNLOADED_BYTES = REGISTRY.counter("monitor_downloaded_bytes_total", "HTTP response bytes downloaded", ["host"])
+WORKER_RESTARTS = REGISTRY.counter("monitor_worker_restarts_total", "Shard worker processes restarted", ["shard"])
+SOURCE_DIVERGENCES = REGISTRY.counter(
+    "monitor_source_divergences_total", "Symbols held back because their price disagrees with the other sources", ["source"]
+)
+
+
+def stage_timer(stage):
+    """``with stage_timer("fetch"):`` observes the duration of the block in monitor_stage_seconds."""
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def count_error(exc):
+    ERRORS.labels(type(exc).__name__).inc()
+
+
+class TickClock:
+    """Counts the ticks of a loop and how late each one starts compared to ``interval``.
+
+    Args:
+        source (str): Source label of the tick metrics
+        interval (float): Target seconds between two ticks
+    """
+
+    def __init__(self, source, interval) -> None:
+        self.interval = interval
+        self.previous = None
+        self.ticks = TICKS.labels(source)
+        self.lag = TICK_LAG.labels(source)
+        self.last_tick = LAST_TICK.labels(source)
+
+    def tick(self):
+        now = time.perf_counter()
+        if self.previous is not None:
+            self.lag.observe(max(0.0, now - self.previous - self.interval))
+        self.previous = now
+        self.ticks.inc()
+        self.last_tick.set(time.time())
+
+
+_servers = {}
+
+
+def start_metrics_server(port=None, host="127.0.0.1", registry=REGISTRY):
+    """Serves ``registry`` on http://host:port/metrics from a daemon thread.
+
+    Args:
+        port (int, optional): Listening port (MonitorSettings.metrics_port), the endpoint is disabled when omitted
+        host (str): Listening address, local only by default
+
+    Returns:
+        ThreadingHTTPServer: The running server (the same one on repeated calls), None when no port is configured
+    """
+    if port is None:
+        return None
+    port = int(port)
+    if port in _servers:
+        return _servers[port]
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    _servers[port] = server
+    return server
@@ -0,0 +1,270 @@
+import threading
+import time
+import warnings
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from .alert_evaluator import AlertEvaluator
+from .async_fetcher import get_fetcher
+from .metrics import SOURCE_DIVERGENCES, TickClock, count_error, stage_timer, start_metrics_server
+from .settings import MonitorSettings
+from .symbol_index import SymbolIndex
+from .utils import Configs, UtilsManager
+
+
+# Quote currencies whose prices are cross-checked with the (USD) prices of the other sources
+USD_QUOTES = ("", "USD", "USDT", "USDC", "BUSD", "TUSD")
+
+
+def build_source(name, settings):
+    """TickSource of a SOURCE_MODES entry; every source imports its own backend."""
+    if name == "tradingview":
+        from .request_monitor import RequestMonitor
+        return RequestMonitor(settings)
+    if name == "coingecko":
+        from .coingecko_monitor import CryptoMonitor
+        return CryptoMonitor(settings.symbols, settings=settings)
+    if name == "kucoin":
+        from .websocket_source import KucoinTickerSource
+        return KucoinTickerSource(settings.kucoin_markets, endpoint=settings.kucoin_ws_endpoint)
+    if name == "selenium":
+        from .selenium_monitor import SeleniumMonitor
+        return SeleniumMonitor(threshold=settings.threshold, executable_path=settings.chrome_exe_path, settings=settings)
+    raise ValueError(f"Unknown source {name!r}")
+
+
+class SymbolTable:
+    """Latest price of every asset per source, with the source symbols mapped to one key per asset.
+
+    Pair names (BTCUSDT, KUCOIN:BTCUSDT) and CoinGecko tickers (BTC) resolve to
+    the CoinGecko id of the asset (bitcoin) through the SymbolIndex; this asset
+    key is shared by the cooldowns of every pair of the asset. Prices are kept
+    per price key, which also holds the quote of the pairs that are not quoted in
+    USD (bitcoin/TRY, binancecoin/BTC), so only prices in the same currency are
+    cross-checked. Leveraged tokens and names that do not resolve to a single id
+    keep their own name as key, so they never share a cooldown or a cross-check
+    with another asset. Resolutions are cached per source.
+
+    A price that differs from the median of the other sources by more than
+    ``max_divergence`` percent is held back for up to ``max_hold`` seconds: a bad
+    print reverts (or is never confirmed) within that time, a real move is
+    confirmed by the other sources or outlasts the hold.
+
+    Args:
+        index (SymbolIndex): Token list the names are resolved with
+        sources (list): Source names, one row of the price table each
+        max_divergence (float): Percent a price may differ from the other sources
+        max_hold (float): Seconds a diverging price is held back at most
+        max_age (float): Seconds after which a price no longer takes part in cross-checks
+        capacity (int): Initial number of asset slots, grown on demand
+    """
+
+    def __init__(self, index, sources, max_divergence=2.0, max_hold=30, max_age=60, capacity=1024) -> None:
+        self.index = index
+        self.source_rows = {name: row for row, name in enumerate(sources)}
+        self.max_divergence = max_divergence
+        self.max_hold = max_hold
+        self.max_age = max_age
+        self.keys = pd.Index([], dtype=object)
+        self.prices = np.full((len(self.source_rows), capacity), np.nan)
+        self.updated = np.full((len(self.source_rows), capacity), -np.inf)
+        # Time since which a price of a source differs from the others, NaN while they agree
+        self.diverging_since = np.full((len(self.source_rows), capacity), np.nan)
+        self._resolved = {name: {} for name in self.source_rows}
+
+    def canonical(self, symbol, ids=None):
+        """Asset key and price key of one source symbol; ``ids`` maps the lower case tickers of an id based (USD) source to their ids."""
+        if ids is not None and symbol.lower() in ids:
+            return ids[symbol.lower()], ids[symbol.lower()]
+        resolution = self.index.resolve_pair(symbol)
+        if resolution.leverage or resolution.coin_id is None:
+            return symbol.upper(), symbol.upper()
+        if resolution.quote in USD_QUOTES:
+            return resolution.coin_id, resolution.coin_id
+        return resolution.coin_id, f"{resolution.coin_id}/{resolution.quote}"
+
+    def resolve(self, source, symbols, ids=None):
+        """Asset keys and price keys of the symbols of a tick."""
+        resolved = self._resolved[source]
+        keys, price_keys = [], []
+        for symbol in symbols:
+            resolution = resolved.get(symbol)
+            if resolution is None:
+                resolution = resolved[symbol] = self.canonical(symbol, ids)
+            keys.append(resolution[0])
+            price_keys.append(resolution[1])
+        return pd.Index(keys, dtype=object), pd.Index(price_keys, dtype=object)
+
+    def slots(self, keys):
+        """Column of every price key in the price table, registering unknown keys."""
+        positions = self.keys.get_indexer(keys)
+        missing = positions < 0
+        if missing.any():
+            self.keys = self.keys.append(pd.Index(keys[missing]).unique())
+            if len(self.keys) > self.prices.shape[1]:
+                capacity = max(len(self.keys), 2 * self.prices.shape[1])
+                grown = []
+                for array, fill in ((self.prices, np.nan), (self.updated, -np.inf), (self.diverging_since, np.nan)):
+                    larger = np.full((len(self.source_rows), capacity), fill)
+                    larger[:, :array.shape[1]] = array
+                    grown.append(larger)
+                self.prices, self.updated, self.diverging_since = grown
+            positions = self.keys.get_indexer(keys)
+        return positions
+
+    def reference(self, source, slots, now):
+        """Median price of the assets at the other sources that reported within ``max_age`` (NaN when none did)."""
+        others = [row for name, row in self.source_rows.items() if name != source]
+        if not others:
+            return np.full(len(slots), np.nan)
+        prices = self.prices[np.ix_(others, slots)]
+        prices[now - self.updated[np.ix_(others, slots)] > self.max_age] = np.nan
+        with warnings.catch_warnings():
+            # Assets that no other source reports are expected
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.nanmedian(prices, axis=0)
+
+    def update(self, source, slots, prices, now):
+        """Stores the prices of a tick and cross-checks them.
+
+        Returns:
+            tuple: Mask of the prices that differ from the other sources and mask of the ones still held back
+        """
+        row = self.source_rows[source]
+        reference = self.reference(source, slots, now)
+        self.prices[row, slots] = prices
+        self.updated[row, slots] = now
+        with np.errstate(invalid="ignore", divide="ignore"):
+            diverging = np.abs(prices / reference - 1) * 100 > self.max_divergence
+        since = self.diverging_since[row, slots]
+        since = np.where(diverging, np.where(np.isnan(since), now, since), np.nan)
+        self.diverging_since[row, slots] = since
+        return diverging, diverging & (now - since < self.max_hold)
+
+    def snapshot(self):
+        """Latest price of every price key per source as a frame (price keys x sources)."""
+        n_keys = len(self.keys)
+        return pd.DataFrame(self.prices[:, :n_keys].T, index=self.keys, columns=list(self.source_rows))
+
+
+class MultiSourceRunner:
+    """Runs several tick sources in one process with one symbol table, one evaluator and one Slack client.
+
+    Every source streams from its own thread (the HTTP sources share the
+    fetcher's event loop and session); ticks are handled one at a time. A tick
+    is mapped to asset keys through the SymbolTable, which cross-checks its
+    prices with the other sources; rows held back by the cross-check are not
+    evaluated. The cooldowns are kept per asset key, so the same move reported
+    by a second source (or by a second pair of the same asset) is not sent again;
+    one pair per asset is evaluated in a tick.
+
+    Args:
+        sources (dict): Source name -> TickSource
+        settings (MonitorSettings, optional): Settings of the run, read from the environment when omitted
+        max_divergence (float): Percent a price may differ from the other sources before its alerts are held
+        max_hold (float): Seconds the alerts of a diverging price are held at most
+        max_age (float): Seconds a price of another source is used for the cross-check
+        enable_notification (bool): Post the alerts to Slack
+    """
+
+    def __init__(self, sources, settings=None, max_divergence=2.0, max_hold=30, max_age=60, enable_notification=True) -> None:
+        self.settings = settings or MonitorSettings.from_env("multi")
+        self.sources = dict(sources)
+        self.table = SymbolTable(SymbolIndex.load(), list(self.sources), max_divergence=max_divergence,
+                                 max_hold=max_hold, max_age=max_age)
+        self.evaluator = AlertEvaluator()
+        self.enable_notification = enable_notification
+        self.clocks = {name: TickClock(name, getattr(source, "poll_interval", 0)) for name, source in self.sources.items()}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads = {}
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        Configs.load(settings)
+        return cls({name: build_source(name, settings) for name in settings.sources}, settings=settings, **kwargs)
+
+    def representatives(self, df, keys, price_keys, held, threshold):
+        """Mask of the row evaluated for every asset key of a tick.
+
+        Of the pairs of one asset the row above the threshold in a window is
+        preferred, then a USD-quoted one; rows held back by the cross-check are
+        never evaluated.
+        """
+        columns = [column for column in self.evaluator.columns if column in df.columns]
+        above = (np.abs(df[columns].to_numpy(dtype=float)) > threshold).any(axis=1)
+        usd_quoted = np.asarray(keys == price_keys)
+        # Primary order: not held, above the threshold, USD-quoted (lexsort sorts by the last key first)
+        order = np.lexsort((~usd_quoted, ~above, held))
+        first = np.zeros(len(df), dtype=bool)
+        first[order] = ~keys[order].duplicated()
+        return first & ~held
+
+    def on_tick(self, source, df):
+        """Cross-checks a tick of ``source`` and sends its alerts."""
+        with self.lock:
+            self.clocks[source].tick()
+            try:
+                with stage_timer("normalize"):
+                    keys, price_keys = self.table.resolve(source, df.index, getattr(self.sources[source], "id_by_symbol", None))
+                    slots = self.table.slots(price_keys)
+                    _, held = self.table.update(source, slots, df["price"].to_numpy(dtype=float), time.time())
+                if held.any():
+                    SOURCE_DIVERGENCES.labels(source).inc(int(held.sum()))
+                    print(f"{source} prices differ from the other sources, held back: {', '.join(df.index[held])}")
+                threshold = UtilsManager.current_threshold()
+                keep = self.representatives(df, keys, price_keys, held, threshold)
+                with stage_timer("stats"):
+                    UtilsManager.calculate_stats(
+                        df[keep], self.evaluator, threshold=threshold,
+                        enable_notification=self.enable_notification, positions=self.evaluator.positions(keys[keep]),
+                    )
+                # The CoinGecko monitors keep their rolling window across restarts
+                if hasattr(self.sources[source], "maybe_save_snapshot"):
+                    self.sources[source].maybe_save_snapshot()
+            except Exception as exc:
+                count_error(exc)
+                print(f"{source} tick failed: {type(exc).__name__}: {exc}")
+
+    def _run_source(self, name, source, max_backoff=60):
+        if hasattr(source, "warm_start"):
+            source.warm_start()
+        delay = 1
+        while not self.stop_event.is_set():
+            try:
+                source.stream(partial(self.on_tick, name), self.stop_event)
+                delay = 1
+            except Exception as exc:
+                count_error(exc)
+                print(f"{name} stream stopped ({type(exc).__name__}: {exc}), restarting in {delay} seconds.")
+                self.stop_event.wait(delay)
+                delay = min(2 * delay, max_backoff)
+
+    def start(self):
+        for name, source in self.sources.items():
+            thread = threading.Thread(target=self._run_source, args=(name, source), name=f"source-{name}", daemon=True)
+            thread.start()
+            self.threads[name] = thread
+        print(f"{len(self.sources)} sources started: {', '.join(self.sources)}.")
+
+    def stop(self, timeout=10):
+        self.stop_event.set()
+        for thread in self.threads.values():
+            thread.join(timeout)
+        for source in self.sources.values():
+            if hasattr(source, "save_snapshot"):
+                source.save_snapshot()
+            source.close()
+        # The HTTP sources share one fetcher
+        get_fetcher().close()
+
+    def run(self):
+        start_metrics_server(self.settings.metrics_port)
+        self.start()
+        try:
+            while not self.stop_event.wait(1):
+                pass
+        finally:
+            self.stop()
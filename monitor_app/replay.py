@@ -0,0 +1,243 @@
+"""Replays recorded ticks through the alert evaluation with a simulated clock.
+
+    python -m monitor_app.replay logs/main.log --threshold 8 --cooldown change_5min=600
+    python -m monitor_app.replay logs/ticks.jsonl
+    python -m monitor_app.replay --tick-store tick_store --start 2022-11-23 --end 2022-11-24
+"""
+import argparse
+import datetime
+import re
+import time
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from .alert_evaluator import DEFAULT_WINDOWS, AlertEvaluator
+from .tick_log import read_ticks
+from .tick_store import TickStore
+from .utils import Configs, UtilsManager
+
+
+TICK_COLUMNS = ["price", "change_1h", "change_5min"]
+
+# Tick store columns that hold the same values under the CoinGecko monitor names
+STORE_COLUMN_ALIASES = {
+    "price": ["price", "current_price"],
+    "change_1h": ["change_1h", "price_change_percentage_1h_in_currency"],
+    "change_5min": ["change_5min", "pct_change"],
+}
+
+LOG_HEADER = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) : INFO : [\w.]+ : Current threshold: ([-\d.]+)")
+
+
+@dataclass
+class TickHistory:
+    """ Dataclass that holds recorded ticks as columnar arrays
+
+    The rows of tick ``i`` are ``offsets[i]:offsets[i + 1]``.
+    """
+    timestamps: np.ndarray
+    offsets: np.ndarray
+    symbol_ids: np.ndarray
+    symbols: np.ndarray
+    values: np.ndarray
+    thresholds: np.ndarray
+    columns: list = field(default_factory=lambda: list(TICK_COLUMNS))
+
+    def __len__(self):
+        return self.timestamps.shape[0]
+
+
+@dataclass
+class ReplayResult:
+    """ Dataclass that holds the alerts a replay would have sent
+    """
+    alerts: pd.DataFrame
+    n_ticks: int
+    n_rows: int
+    elapsed: float
+
+    @property
+    def ticks_per_second(self):
+        return self.n_ticks / self.elapsed if self.elapsed else float("inf")
+
+
+def _build_history(timestamps, counts, symbols, values, thresholds):
+    symbol_ids, unique_symbols = pd.factorize(pd.Index(symbols, dtype=object))
+    return TickHistory(
+        timestamps=np.asarray(timestamps, dtype=np.int64),
+        offsets=np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]),
+        symbol_ids=symbol_ids.astype(np.int32),
+        symbols=np.asarray(unique_symbols, dtype=object),
+        values=np.asarray(values, dtype=np.float64).reshape(-1, len(TICK_COLUMNS)),
+        thresholds=np.asarray(thresholds, dtype=np.float64),
+    )
+
+
+def parse_log(path, timezone=None):
+    """Parses the ``df.to_string()`` tick dumps that RequestMonitor writes to logs/main.log.
+
+    Args:
+        path (str): Log file path
+        timezone (pytz.timezone, optional): Timezone of the log timestamps, Configs.timezone when omitted
+
+    Returns:
+        TickHistory: The parsed ticks
+    """
+    timezone = timezone or Configs.timezone
+    timestamps, counts, thresholds, symbols, values = [], [], [], [], []
+    count = None
+    with open(path, "r", encoding="utf-8", errors="replace") as log_file:
+        for line in log_file:
+            if " : " in line:
+                if count is not None:
+                    counts.append(count)
+                    count = None
+                header = LOG_HEADER.match(line)
+                if header:
+                    local_time = datetime.datetime.strptime(header.group(1), "%Y-%m-%d %H:%M:%S")
+                    timestamps.append(int(timezone.localize(local_time).timestamp()))
+                    thresholds.append(float(header.group(3)))
+                    count = 0
+                continue
+            if count is None:
+                continue
+            parts = line.split()
+            if len(parts) != 4:
+                continue
+            try:
+                row = [float(parts[1]), float(parts[2]), float(parts[3])]
+            except ValueError:
+                continue
+            symbols.append(parts[0])
+            values.extend(row)
+            count += 1
+    if count is not None:
+        counts.append(count)
+    return _build_history(timestamps, counts, symbols, values, thresholds)
+
+
+def load_tick_log(path):
+    """Loads a structured tick log written by TickLogWriter into a TickHistory."""
+    timestamps, counts, thresholds, symbols, values = [], [], [], [], []
+    for millis, threshold, df in read_ticks(path):
+        timestamps.append(millis // 1000)
+        counts.append(len(df))
+        thresholds.append(np.nan if threshold is None else threshold)
+        symbols.extend(df.index)
+        values.append(df.reindex(columns=TICK_COLUMNS).to_numpy(dtype=np.float64))
+    values = np.concatenate(values) if values else np.empty((0, len(TICK_COLUMNS)))
+    return _build_history(timestamps, counts, symbols, values, thresholds)
+
+
+def load_tick_store(root, start=None, end=None, symbols=None):
+    """Loads ticks persisted by TickStore into a TickHistory."""
+    df = TickStore(root).read(start=start, end=end, symbols=symbols)
+    columns = {}
+    for column, aliases in STORE_COLUMN_ALIASES.items():
+        found = [alias for alias in aliases if alias in df.columns]
+        columns[column] = df[found[0]].to_numpy(dtype=np.float64) if found else np.full(len(df), np.nan)
+    millis = df["timestamp"].to_numpy(dtype="datetime64[ms]").astype(np.int64) if len(df) else np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.diff(millis, prepend=-1)) if len(df) else np.empty(0, dtype=np.int64)
+    counts = np.diff(np.append(starts, len(df)))
+    values = np.column_stack([columns[column] for column in TICK_COLUMNS]) if len(df) else np.empty((0, 3))
+    return _build_history(millis[starts] // 1000, counts, df["symbol"].to_numpy(), values, np.full(len(starts), np.nan))
+
+
+def replay(history, threshold=None, bump=None, cooldowns=None, windows=DEFAULT_WINDOWS, timezone=None):
+    """Runs recorded ticks through the same AlertEvaluator and threshold schedule as the live monitor.
+
+    The clock is the recorded tick time; nothing sleeps, posts to Slack or reads the wall clock.
+
+    Args:
+        history (TickHistory): Ticks to replay
+        threshold (float, optional): Base threshold, the logged threshold of every tick (or Configs.THRESHOLD) when omitted
+        bump (float, optional): Quiet hours threshold increase, Configs.quiet_hours_bump when omitted
+        cooldowns (dict, optional): Cooldown seconds by window column, e.g. {"change_5min": 600}
+        windows (tuple): Alert windows to evaluate
+        timezone (pytz.timezone, optional): Timezone of the threshold schedule, Configs.timezone when omitted
+
+    Returns:
+        ReplayResult: Alerts that would have been sent and the replay speed
+    """
+    timezone = timezone or Configs.timezone
+    cooldowns = cooldowns or {}
+    windows = [replace(window, cooldown=cooldowns.get(window.column, window.cooldown)) for window in windows]
+    evaluator = AlertEvaluator(windows, capacity=max(len(history.symbols), 1))
+    slots = evaluator.positions(pd.Index(history.symbols))
+    value_columns = [history.columns.index(window.column) for window in windows]
+
+    alert_times, alert_windows, alert_symbols, alert_values = [], [], [], []
+    started = time.perf_counter()
+    for tick in range(len(history)):
+        now_sec = int(history.timestamps[tick])
+        now = datetime.datetime.fromtimestamp(now_sec, tz=pytz.UTC).astimezone(timezone)
+        if UtilsManager.is_purge_time(now):
+            continue
+        if threshold is None and not np.isnan(history.thresholds[tick]):
+            latest_threshold = history.thresholds[tick]
+        else:
+            latest_threshold = UtilsManager.current_threshold(now, threshold=threshold, bump=bump)
+        rows = slice(history.offsets[tick], history.offsets[tick + 1])
+        symbol_ids = history.symbol_ids[rows]
+        alerts = evaluator.evaluate_arrays(
+            history.symbols[symbol_ids],
+            history.values[rows][:, value_columns].T,
+            latest_threshold,
+            now_sec,
+            positions=slots[symbol_ids],
+        )
+        for alert in alerts:
+            alert_times.extend([now] * len(alert.symbols))
+            alert_windows.extend([alert.window.column] * len(alert.symbols))
+            alert_symbols.extend(alert.symbols)
+            alert_values.extend(alert.values)
+    elapsed = time.perf_counter() - started
+
+    df_alerts = pd.DataFrame({"time": alert_times, "window": alert_windows, "symbol": alert_symbols, "value": alert_values})
+    return ReplayResult(df_alerts, len(history), int(history.offsets[-1]), elapsed)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Replay recorded ticks through the alert logic.")
+    parser.add_argument("log", nargs="?", help="RequestMonitor log file (logs/main.log or a logs/ticks.jsonl tick log)")
+    parser.add_argument("--tick-store", help="TickStore directory to replay instead of a log")
+    parser.add_argument("--start", help="Start time of the tick store range")
+    parser.add_argument("--end", help="End time of the tick store range")
+    parser.add_argument("--threshold", type=float, help="Base threshold (default: the logged one)")
+    parser.add_argument("--bump", type=float, help="Threshold increase between 01:20 and 06:00")
+    parser.add_argument("--cooldown", action="append", default=[], metavar="COLUMN=SECONDS",
+                        help="Cooldown override of a window, e.g. change_5min=600")
+    parser.add_argument("--timezone", default=None, help="Timezone of the log timestamps and schedule")
+    options = parser.parse_args(args)
+
+    timezone = pytz.timezone(options.timezone) if options.timezone else None
+    cooldowns = {column: int(seconds) for column, seconds in (item.split("=", 1) for item in options.cooldown)}
+
+    started = time.perf_counter()
+    if options.tick_store:
+        history = load_tick_store(options.tick_store, start=options.start, end=options.end)
+    elif options.log and options.log.endswith(".jsonl"):
+        history = load_tick_log(options.log)
+    elif options.log:
+        history = parse_log(options.log, timezone=timezone)
+    else:
+        parser.error("Either a log file or --tick-store must be given.")
+    load_time = time.perf_counter() - started
+
+    result = replay(history, threshold=options.threshold, bump=options.bump, cooldowns=cooldowns, timezone=timezone)
+    if not result.alerts.empty:
+        print(result.alerts.to_string(index=False))
+    print(" - " * 15)
+    print(f"Loaded {result.n_ticks} ticks ({result.n_rows} rows) in {load_time:.2f} s")
+    print(f"Replayed in {result.elapsed:.3f} s ({result.ticks_per_second:,.0f} ticks/s), "
+          f"{len(result.alerts)} alerts would have been sent")
+    for window, count in result.alerts.groupby("window").size().items():
+        print(f"    {window}: {count}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,164 @@
 import json
 import time
 
-import jmespath
 import pandas as pd
-import requests
 
-from .exceptions import PostRequestFail
+from .alert_evaluator import DEFAULT_WINDOWS, AlertEvaluator
+from .async_fetcher import get_fetcher
+from .change_detector import ChangeDetector
+from .exceptions import FetchError, PostRequestFail
+from .live_snapshot import start_live_snapshot
+from .metrics import TickClock, count_error, stage_timer, start_metrics_server
+from .rule_engine import RuleEngine, load_rule_sets
+from .scan_decoder import ScanDecoder, build_scan_payload, scan_fields
+from .scheduler import PollScheduler
+from .settings import MonitorSettings
+from .sources import PollingSource
+from .tick_log import TickLogWriter
+from .tick_store import TickStore
 from .utils import *
 
 
-class RequestMonitor():
-    def __init__(self) -> None:
+class RequestMonitor(PollingSource):
+    source_name = "tradingview"
+    poll_interval = 15
+
+    def __init__(self, settings=None) -> None:
+        settings = settings or MonitorSettings.from_env("request")
+        self.settings = settings
+        Configs.load(settings)
         Logger.configure()
         Logger.logger.info("INITIAL RUN.")
+        self.fetcher = get_fetcher()
+        # Only the decoded columns are requested; the payload is serialized once
+        fields = scan_fields(Configs.request_parameters["payload"].get("columns", []))
+        self.scan_payload = build_scan_payload(Configs.request_parameters["payload"], fields)
+        self.scan_body = json.dumps(self.scan_payload)
+        self.decoder = ScanDecoder(self.scan_payload["columns"], fields)
+        start_metrics_server(self.settings.metrics_port)
+        self.tick_store = TickStore(Configs.tick_store_dir) if Configs.tick_store_dir else None
+        self.tick_log = None
+        if Configs.tick_log_mode == "structured":
+            self.tick_log = TickLogWriter(Configs.tick_log_path, sample_unchanged=Configs.tick_log_sample_unchanged)
+        # Changes over our own windows, derived from the ticks on top of the provider's change columns
+        self.detector = ChangeDetector(settings.detector_windows) if settings.detector_windows else None
+        # Rule sets of several teams evaluated on the same scan, instead of one threshold and channel
+        self.rule_sets = load_rule_sets(settings.rules_path) if settings.rules_path else None
+
+    def build_evaluator(self):
+        """AlertEvaluator (RuleEngine when rule sets are configured) of the provider windows followed by the detector windows."""
+        windows = DEFAULT_WINDOWS if self.detector is None else DEFAULT_WINDOWS + tuple(self.detector.alert_windows())
+        if self.rule_sets is not None:
+            return RuleEngine(self.rule_sets, windows)
+        return AlertEvaluator(windows)
+
+    def send_alerts(self, df, evaluator, threshold):
+        """Evaluates a tick with the evaluator built by ``build_evaluator`` and posts its alerts."""
+        if isinstance(evaluator, RuleEngine):
+            return UtilsManager.dispatch_rules(df, evaluator, enable_notification=True)
+        return UtilsManager.calculate_stats(df, evaluator, threshold=threshold, enable_notification=True)
 
-    def process_pairs_data(self):
-        pairs_data = self.get_pairs_json()
-        data = jmespath.search("[*].{name: d[2], price: d[3], change_1h: d[4], change_5min: d[5]}", pairs_data["data"])
-        df = pd.DataFrame(data).set_index("name")
-        df.index.name = None
-        return df
+    def publish_live(self, live, df, evaluator):
+        """Copies the tick and the latest alert of every symbol into the live snapshot (when one is configured)."""
+        if live is not None:
+            live.publish(df, last_alert=evaluator.last_alert_times(evaluator.positions(df.index)))
+
+    def detect(self, df, timestamp=None):
+        """Returns the tick with the detector columns added (the tick itself without a detector)."""
+        if self.detector is None:
+            return df
+        detected = self.detector.update(df, time.time() if timestamp is None else timestamp)
+        return pd.concat([df, detected], axis=1)
+
+    def log_tick(self, df, threshold):
+        if self.tick_log is not None:
+            self.tick_log.log_tick(df, threshold=threshold)
+        else:
+            Logger.logger.info("Current threshold: " + str(threshold) + "\n" + df.to_string())
+
+    def process_pairs_data(self, pairs_data=None):
+        """Decodes a scan response (fetched when not given) into the tick frame."""
+        if pairs_data is None:
+            pairs_data = self.get_pairs_json()
+        return self.decoder.decode(pairs_data)
+
+    def read_ticks(self):
+        return self.process_pairs_data()
+
+    def close(self):
+        if self.tick_log is not None:
+            self.tick_log.close()
 
 
     def get_pairs_json(self):
         url = Configs.scan_url
-        payload = json.dumps(Configs.request_parameters["payload"])
         headers = Configs.request_parameters["headers"]
-        response = requests.request("POST", url, headers=headers, data=payload, timeout=30)
-        if response.status_code == 200:
-            return response.json()
-
-        else:
-            raise PostRequestFail
+        try:
+            return self.fetcher.post_json(url, headers=headers, data=self.scan_body, timeout=30)
+        except FetchError as exc:
+            raise PostRequestFail(exc) from exc
 
 
     def run_request_monitoring(self):
-        is_instance_started = True
+        evaluator = self.build_evaluator()
+        live = start_live_snapshot(self.settings, tick_store_dir=Configs.tick_store_dir)
+        clock = TickClock(self.source_name, self.poll_interval)
+        scheduler = PollScheduler(self.poll_interval)
         while True:
+            scheduler.wait()
+            clock.tick()
             try:
-                pairs_data = self.get_pairs_json()
-                data = jmespath.search("[*].{name: d[2], price: d[3], change_1h: d[4], change_5min: d[5]}", pairs_data["data"])
-                df = pd.DataFrame(data).set_index("name")
-                if is_instance_started:
-                    df_timing = df.copy()
-                    df_timing["5min_cooldown"] = Configs.minute_cooldown
-                    df_timing["1h_cooldown"] = Configs.hourly_cooldown
-                    df_timing = df_timing[["5min_cooldown", "1h_cooldown"]]
-                    is_instance_started = False
-
-                df.index.name = None
-                now = datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
-                if not (now > now.replace(second=0, hour=1, minute=20) and now < now.replace(second=0, hour=6, minute=0)):
-                    latest_threshold = Configs.THRESHOLD
-
-                else:
-                    latest_threshold = Configs.THRESHOLD + 5
-                Logger.logger.info("Current threshold: " + str(latest_threshold) + "\n" + df.to_string())
-                df_timing = UtilsManager.calculate_stats(df, df_timing, threshold=latest_threshold, enable_notification=True)
+                with stage_timer("fetch"):
+                    pairs_data = self.get_pairs_json()
             except Exception as exc:
+                count_error(exc)
                 Logger.logger.error(exc)
-            time.sleep(15)
+                scheduler.failure(exc)
+                continue
+            scheduler.success()
+            try:
+                with stage_timer("parse"):
+                    df = self.process_pairs_data(pairs_data)
+                latest_threshold = UtilsManager.current_threshold()
+                with stage_timer("log"):
+                    self.log_tick(df, latest_threshold)
+                if self.tick_store is not None:
+                    with stage_timer("store_append"):
+                        self.tick_store.append(df)
+                with stage_timer("detect"):
+                    df = self.detect(df)
+                with stage_timer("stats"):
+                    evaluator = self.send_alerts(df, evaluator, latest_threshold)
+                with stage_timer("publish"):
+                    self.publish_live(live, df, evaluator)
+            except Exception as exc:
+                count_error(exc)
+                Logger.logger.error(exc)
+
+    def run_source_monitoring(self, source):
+        """Evaluates every tick of a TickSource as soon as it arrives.
+
+        Args:
+            source (TickSource): Polling or push-based (e.g. WebSocket) source
+        """
+        evaluator = self.build_evaluator()
+        live = start_live_snapshot(self.settings, tick_store_dir=Configs.tick_store_dir)
+        clock = TickClock(source.source_name, 0)
+
+        def on_tick(df):
+            clock.tick()
+            try:
+                latest_threshold = UtilsManager.current_threshold()
+                if self.tick_log is not None:
+                    self.tick_log.log_tick(df, threshold=latest_threshold)
+                with stage_timer("detect"):
+                    df = self.detect(df)
+                with stage_timer("stats"):
+                    self.send_alerts(df, evaluator, latest_threshold)
+                with stage_timer("publish"):
+                    self.publish_live(live, df, evaluator)
+            except Exception as exc:
+                count_error(exc)
+                Logger.logger.error(exc)
+
+        source.stream(on_tick)
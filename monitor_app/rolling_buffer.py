@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+
+class RollingBuffer:
+    """Preallocated per-symbol circular buffer with incremental running sums.
+
+    Every push overwrites the oldest row in place and updates the running sums,
+    so a tick costs O(symbols) work and the memory footprint is fixed at
+    ``window x symbols`` values regardless of how long the monitor runs.
+
+    Args:
+        symbols (list): Symbols (column order) that the buffer tracks
+        window (int): Number of ticks kept for the rolling mean
+        dtype (type): Value type of the buffer
+    """
+
+    # Running sums are recomputed from scratch once every this many full cycles
+    # to stop floating point drift from accumulating.
+    resync_cycles = 4
+
+    def __init__(self, symbols, window, dtype=np.float64) -> None:
+        if window < 1:
+            raise ValueError("Rolling window must be at least one tick.")
+        self.symbols = list(symbols)
+        self.positions = {symbol: idx for idx, symbol in enumerate(self.symbols)}
+        self.window = int(window)
+        self.values = np.full((self.window, len(self.symbols)), np.nan, dtype=dtype)
+        self.sums = np.zeros(len(self.symbols), dtype=dtype)
+        self.counts = np.zeros(len(self.symbols), dtype=np.int64)
+        self.head = 0
+        self.n_ticks = 0
+
+    def __len__(self):
+        return min(self.n_ticks, self.window)
+
+    def align(self, series):
+        """Returns the values of a symbol-indexed Series ordered as the buffer columns."""
+        return series.reindex(self.symbols).to_numpy(dtype=self.values.dtype, na_value=np.nan)
+
+    def push(self, values):
+        """Writes one tick into the buffer, dropping the oldest one.
+
+        Args:
+            values (np.ndarray): Values aligned with ``self.symbols``; NaN marks a missing value
+        """
+        values = np.asarray(values, dtype=self.values.dtype)
+        oldest = self.values[self.head]
+        old_valid = ~np.isnan(oldest)
+        new_valid = ~np.isnan(values)
+        np.subtract(self.sums, oldest, out=self.sums, where=old_valid)
+        np.add(self.sums, values, out=self.sums, where=new_valid)
+        self.counts += new_valid.astype(np.int64) - old_valid.astype(np.int64)
+        self.values[self.head] = values
+
+        self.head = (self.head + 1) % self.window
+        self.n_ticks += 1
+        if self.head == 0 and self.n_ticks % (self.window * self.resync_cycles) == 0:
+            self._resync()
+
+    def _resync(self):
+        self.sums = np.nansum(self.values, axis=0)
+        self.counts = (~np.isnan(self.values)).sum(axis=0)
+
+    def rows(self):
+        """Copy of the buffered ticks in push order, oldest first."""
+        if self.n_ticks < self.window:
+            return self.values[:self.n_ticks].copy()
+        return np.roll(self.values, -self.head, axis=0)
+
+    def fill(self, rows):
+        """Replaces the content of the buffer with ``rows`` (oldest first), e.g. a restored or backfilled history.
+
+        Args:
+            rows (np.ndarray): (ticks x symbols) values aligned with ``self.symbols``, only the last ``window`` are kept
+        """
+        rows = np.asarray(rows, dtype=self.values.dtype)[-self.window:]
+        self.values[:] = np.nan
+        self.values[:len(rows)] = rows
+        self.head = len(rows) % self.window
+        self.n_ticks = len(rows)
+        self._resync()
+
+    def latest(self):
+        """Returns the most recently pushed row."""
+        return self.values[(self.head - 1) % self.window]
+
+    def mean(self):
+        """Rolling mean of the buffered ticks, NaN until the window is completely filled."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sums / self.counts
+        mean[self.counts < self.window] = np.nan
+        return mean
+
+    def pct_change(self, values, mean=None):
+        """Percentage distance of ``values`` from the rolling mean."""
+        mean = self.mean() if mean is None else mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (np.asarray(values, dtype=self.values.dtype) - mean) / mean * 100
+
+    def to_series(self, values, name=None):
+        return pd.Series(values, index=pd.Index(self.symbols), name=name)
@@ -0,0 +1,300 @@
+"""Alert rules of several tenants evaluated on one shared tick.
+
+Rule sets are read from a YAML file (RULES_PATH)::
+
+    rule_sets:
+      - name: desk
+        channel: coingecko
+        threshold: 5
+        schedules:
+          - {start: "01:20", end: "06:00", bump: 5}
+      - name: majors
+        channel: majors-alerts
+        symbols: [BTCUSDT, ETHUSDT]
+        thresholds: {change_5min: 2, change_1h: 4}
+        cooldowns: {change_5min: 120}
+        timezone: UTC
+        schedules:
+          - {start: "22:00", end: "07:00", mute: true}
+
+``threshold`` applies to every window of the monitor, ``thresholds`` and
+``cooldowns`` override single windows (a window without a threshold is not
+checked). A rule set without ``symbols`` follows every symbol of the tick.
+Schedules are daily ranges in the rule set's timezone that raise the
+thresholds by ``bump`` or ``mute`` the rule set.
+"""
+import datetime
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from .alert_evaluator import DEFAULT_WINDOWS, NEVER, Alert, AlertEvaluator
+from .exceptions import InputError
+
+
+def _minute_of_day(value):
+    try:
+        hour, minute = (int(part) for part in str(value).split(":"))
+    except ValueError:
+        raise InputError(f"Invalid schedule time {value!r}, expected HH:MM") from None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise InputError(f"Invalid schedule time {value!r}, expected HH:MM")
+    return hour * 60 + minute
+
+
+@dataclass
+class Schedule:
+    """ Dataclass that describes a daily time range of a rule set, ``end`` may be past midnight
+    """
+    start: int
+    end: int
+    bump: float = 0.0
+    mute: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(_minute_of_day(data["start"]), _minute_of_day(data["end"]),
+                   float(data.get("bump", 0)), bool(data.get("mute", False)))
+
+
+@dataclass
+class RuleSet:
+    """ Dataclass that holds the alert configuration of one tenant
+    """
+    name: str
+    # Slack channel the alerts of the rule set are posted to
+    channel: str
+    # Threshold of every window in percent, overridden per window by ``thresholds``
+    threshold: float = None
+    thresholds: dict = field(default_factory=dict)
+    # Cooldown seconds per window, the window's own cooldown when missing
+    cooldowns: dict = field(default_factory=dict)
+    # Symbols the rule set follows, every symbol of the tick when empty
+    symbols: list = field(default_factory=list)
+    schedules: list = field(default_factory=list)
+    timezone: str = "Europe/Istanbul"
+
+    @classmethod
+    def from_dict(cls, data):
+        missing = [key for key in ("name", "channel") if not data.get(key)]
+        if missing:
+            raise InputError(f"Rule set {data} needs the keys: {', '.join(missing)}")
+        if data.get("threshold") is None and not data.get("thresholds"):
+            raise InputError(f"Rule set {data['name']!r} needs a threshold or per window thresholds")
+        try:
+            pytz.timezone(data.get("timezone", cls.timezone))
+        except pytz.UnknownTimeZoneError:
+            raise InputError(f"Rule set {data['name']!r} has an unknown timezone {data['timezone']!r}") from None
+        return cls(
+            name=str(data["name"]),
+            channel=str(data["channel"]),
+            threshold=None if data.get("threshold") is None else float(data["threshold"]),
+            thresholds={column: float(value) for column, value in (data.get("thresholds") or {}).items()},
+            cooldowns={column: int(value) for column, value in (data.get("cooldowns") or {}).items()},
+            symbols=[str(symbol) for symbol in data.get("symbols") or []],
+            schedules=[Schedule.from_dict(schedule) for schedule in data.get("schedules") or []],
+            timezone=data.get("timezone", cls.timezone),
+        )
+
+
+@dataclass
+class RuleAlert(Alert):
+    """ Dataclass that holds the symbols that fired in one window of a rule set
+    """
+    rule_set: RuleSet = None
+
+
+def load_rule_sets(path):
+    """Reads the rule sets of a YAML file (a ``rule_sets`` list or a bare list).
+
+    Raises:
+        InputError: If the file is malformed, a rule set is incomplete or two rule sets share a name
+    """
+    import yaml
+
+    with open(path, "r") as yaml_file:
+        document = yaml.safe_load(yaml_file)
+    entries = document.get("rule_sets") if isinstance(document, dict) else document
+    if not isinstance(entries, list) or not entries:
+        raise InputError(f"{path} does not define any rule set")
+    rule_sets = [RuleSet.from_dict(entry) for entry in entries]
+    names = [rule_set.name for rule_set in rule_sets]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise InputError(f"Rule set names must be unique, repeated: {', '.join(duplicated)}")
+    return rule_sets
+
+
+def default_rule_set(threshold, channel, quiet_hours_bump=5):
+    """The single tenant configuration of the monitors: one threshold, one channel, higher threshold 01:20-06:00."""
+    return RuleSet("default", channel, threshold=threshold, schedules=[Schedule(80, 360, bump=quiet_hours_bump)])
+
+
+class RuleEngine:
+    """Evaluates many rule sets against one tick in a single vectorized pass.
+
+    Thresholds and cooldowns are ``rule sets x windows`` arrays, subscriptions and
+    cooldown state are ``rule sets x symbols`` arrays indexed by the slot of each
+    symbol (registered the first time it appears, as in AlertEvaluator). A tick
+    is first reduced to the symbols above the lowest active threshold of a
+    window, and only those columns are checked against every rule set, so the
+    cost grows with the number of candidates rather than the number of rules.
+
+    Within a rule set the AlertEvaluator semantics hold: a symbol fires in its
+    first window (in priority order) and the cooldowns of all windows restart.
+    Rule sets do not share cooldowns.
+
+    Args:
+        rule_sets (list): RuleSet objects
+        windows (tuple): AlertWindow objects of the tick columns, in priority order
+        capacity (int): Initial number of symbol slots, grown on demand
+    """
+
+    def __init__(self, rule_sets, windows=DEFAULT_WINDOWS, capacity=256) -> None:
+        self.rule_sets = list(rule_sets)
+        self.windows = list(windows)
+        self.columns = [window.column for window in self.windows]
+        self.channels = list(dict.fromkeys(rule_set.channel for rule_set in self.rule_sets))
+        column_idx = {column: idx for idx, column in enumerate(self.columns)}
+
+        self.thresholds = np.full((len(self.rule_sets), len(self.windows)), np.inf)
+        self.cooldowns = np.tile(np.array([window.cooldown for window in self.windows], dtype=np.int64), (len(self.rule_sets), 1))
+        for rule_idx, rule_set in enumerate(self.rule_sets):
+            unknown = sorted((set(rule_set.thresholds) | set(rule_set.cooldowns)) - set(column_idx))
+            if unknown:
+                raise InputError(f"Rule set {rule_set.name!r} refers to unknown windows {unknown}, expected {self.columns}")
+            if rule_set.threshold is not None:
+                self.thresholds[rule_idx] = rule_set.threshold
+            for column, value in rule_set.thresholds.items():
+                self.thresholds[rule_idx, column_idx[column]] = value
+            for column, value in rule_set.cooldowns.items():
+                self.cooldowns[rule_idx, column_idx[column]] = value
+
+        # Schedules of every rule set flattened into arrays
+        schedules = [(rule_idx, schedule) for rule_idx, rule_set in enumerate(self.rule_sets) for schedule in rule_set.schedules]
+        self.schedule_rules = np.array([rule_idx for rule_idx, _ in schedules], dtype=np.intp)
+        self.schedule_starts = np.array([schedule.start for _, schedule in schedules], dtype=np.int64)
+        self.schedule_ends = np.array([schedule.end for _, schedule in schedules], dtype=np.int64)
+        self.schedule_bumps = np.array([schedule.bump for _, schedule in schedules], dtype=np.float64)
+        self.schedule_mutes = np.array([schedule.mute for _, schedule in schedules], dtype=bool)
+        self.timezones = [pytz.timezone(name) for name in dict.fromkeys(rule_set.timezone for rule_set in self.rule_sets)]
+        timezone_idx = {timezone.zone: idx for idx, timezone in enumerate(self.timezones)}
+        self.rule_timezones = np.array([timezone_idx[rule_set.timezone] for rule_set in self.rule_sets], dtype=np.intp)
+
+        # Rule sets subscribed to each symbol; the ones without symbols follow every symbol
+        self.follows_all = np.array([not rule_set.symbols for rule_set in self.rule_sets], dtype=bool)
+        self.symbol_rules = {}
+        for rule_idx, rule_set in enumerate(self.rule_sets):
+            for symbol in rule_set.symbols:
+                self.symbol_rules.setdefault(symbol, []).append(rule_idx)
+
+        self.symbols = pd.Index([], dtype=object)
+        self.members = np.zeros((len(self.rule_sets), capacity), dtype=bool)
+        self.last_alert = np.full((len(self.rule_sets), capacity), NEVER, dtype=np.int64)
+        self._last_index = None
+        self._last_positions = None
+
+    def positions(self, index):
+        """Returns the slot of every symbol in ``index``, registering unknown symbols with their subscriptions."""
+        if self._last_index is not None and (index is self._last_index or index.equals(self._last_index)):
+            return self._last_positions
+        positions = self.symbols.get_indexer(index)
+        missing = positions < 0
+        if missing.any():
+            new_symbols = pd.Index(index[missing]).unique()
+            first_slot = len(self.symbols)
+            self.symbols = self.symbols.append(new_symbols)
+            if len(self.symbols) > self.members.shape[1]:
+                capacity = max(len(self.symbols), 2 * self.members.shape[1])
+                members = np.zeros((len(self.rule_sets), capacity), dtype=bool)
+                members[:, :self.members.shape[1]] = self.members
+                last_alert = np.full((len(self.rule_sets), capacity), NEVER, dtype=np.int64)
+                last_alert[:, :self.last_alert.shape[1]] = self.last_alert
+                self.members, self.last_alert = members, last_alert
+            for slot, symbol in enumerate(new_symbols, start=first_slot):
+                self.members[:, slot] = self.follows_all
+                self.members[self.symbol_rules.get(symbol, []), slot] = True
+            positions = self.symbols.get_indexer(index)
+        self._last_index, self._last_positions = index, positions
+        return positions
+
+    # Latest alert of any rule set
+    last_alert_times = AlertEvaluator.last_alert_times
+
+    def current_thresholds(self, now_sec):
+        """Thresholds of every rule set and window at ``now_sec``, with the schedules applied (muted rule sets get inf)."""
+        if not len(self.schedule_rules):
+            return self.thresholds
+        local_times = [datetime.datetime.fromtimestamp(now_sec, tz=timezone) for timezone in self.timezones]
+        minutes = np.array([local.hour * 60 + local.minute for local in local_times])[self.rule_timezones][self.schedule_rules]
+        starts, ends = self.schedule_starts, self.schedule_ends
+        active = np.where(starts <= ends, (minutes >= starts) & (minutes < ends), (minutes >= starts) | (minutes < ends))
+        n_rules = len(self.rule_sets)
+        bumps = np.bincount(self.schedule_rules[active], weights=self.schedule_bumps[active], minlength=n_rules)
+        thresholds = self.thresholds + bumps[:, None]
+        thresholds[np.bincount(self.schedule_rules[active & self.schedule_mutes], minlength=n_rules) > 0] = np.inf
+        return thresholds
+
+    def evaluate(self, df, now=None):
+        """Checks a tick against every rule set.
+
+        Args:
+            df (pd.DataFrame): Tick indexed by symbol that contains the window columns
+            now (datetime.datetime | float, optional): Evaluation time, the wall clock when omitted
+
+        Returns:
+            list: RuleAlert objects, grouped by rule set in rule order and by window in priority order
+        """
+        if now is None:
+            now = datetime.datetime.now(tz=datetime.timezone.utc)
+        now_sec = int(now.timestamp()) if isinstance(now, datetime.datetime) else int(now)
+        return self.evaluate_arrays(df.index, df[self.columns].to_numpy(dtype=float).T, now_sec)
+
+    def evaluate_arrays(self, index, values, now_sec):
+        """Array form of ``evaluate``: ``values`` is a (windows x symbols) float array."""
+        positions = self.positions(index)
+        thresholds = self.current_thresholds(now_sec)
+        magnitudes = np.abs(values)
+        with np.errstate(invalid="ignore"):
+            candidates = np.flatnonzero((magnitudes > thresholds.min(axis=0)[:, None]).any(axis=0))
+        if not len(candidates):
+            return []
+
+        slots = positions[candidates]
+        with np.errstate(invalid="ignore"):
+            eligible = (
+                (magnitudes[None, :, candidates] > thresholds[:, :, None])
+                & self.members[:, None, slots]
+                & (now_sec - self.last_alert[:, None, slots] >= self.cooldowns[:, :, None])
+            )
+        fired = eligible.any(axis=1)
+        if not fired.any():
+            return []
+        rule_idx, candidate_idx = np.nonzero(fired)
+        window_idx = eligible.argmax(axis=1)[rule_idx, candidate_idx]
+        self.last_alert[rule_idx, slots[candidate_idx]] = now_sec
+
+        order = np.lexsort((candidate_idx, window_idx, rule_idx))
+        rule_idx, window_idx, candidate_idx = rule_idx[order], window_idx[order], candidate_idx[order]
+        bounds = np.flatnonzero(np.diff(rule_idx) | np.diff(window_idx)) + 1
+        # A line is formatted once per tick, however many rule sets send it
+        symbol_names = np.asarray(index, dtype=object)
+        lines = [{} for _ in self.windows]
+        alerts = []
+        for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(order)]):
+            rule_set = self.rule_sets[rule_idx[start]]
+            window = self.windows[window_idx[start]]
+            window_lines = lines[window_idx[start]]
+            columns = candidates[candidate_idx[start:stop]]
+            symbols = symbol_names[columns].tolist()
+            window_values = values[window_idx[start], columns]
+            texts = []
+            for column, value in zip(columns.tolist(), window_values.tolist()):
+                if column not in window_lines:
+                    window_lines[column] = AlertEvaluator.format_value(value, window.unit)
+                texts.append(window_lines[column])
+            text = window.title + "\n" + AlertEvaluator.format_table(symbols, texts) + "\n" + " - " * 15
+            alerts.append(RuleAlert(window, symbols, window_values, text, rule_set=rule_set))
+        return alerts
@@ -0,0 +1,74 @@
+import copy
+import operator
+
+import numpy as np
+import pandas as pd
+
+
+# Tick columns and the positions of the scanner columns they are read from in the configured payload (the first one is the index)
+SCAN_POSITIONS = {
+    "name": 2,
+    "price": 3,
+    "change_1h": 4,
+    "change_5min": 5,
+}
+
+
+def scan_fields(columns, positions=SCAN_POSITIONS):
+    """Maps every tick column to the scanner column configured at its position.
+
+    Raises:
+        ValueError: When the configured columns are too few for ``positions``
+    """
+    missing = {field: position for field, position in positions.items() if position >= len(columns)}
+    if missing:
+        raise ValueError(
+            f"Scan payload columns {list(columns)} have no column at the positions of {missing}; "
+            f"the payload must configure the scanner columns of {list(positions)} at positions {list(positions.values())}."
+        )
+    return {field: columns[position] for field, position in positions.items()}
+
+
+def build_scan_payload(payload, fields):
+    """Returns a copy of the scan payload trimmed to the configured columns in ``fields``.
+
+    The filters, sort and range of the payload are kept as they are, the scanner
+    applies them server side.
+    """
+    payload = copy.deepcopy(payload)
+    payload["columns"] = [column for column in dict.fromkeys(payload["columns"]) if column in fields.values()]
+    return payload
+
+
+class ScanDecoder:
+    """Precompiled extraction of TradingView scan responses into a float frame.
+
+    The positions of the wanted columns in the ``d`` arrays are resolved once from
+    the requested column list; decoding a response is then a pair of
+    ``operator.itemgetter`` passes over the rows and one ``np.array`` conversion
+    (nulls become NaN), without intermediate dicts.
+
+    Args:
+        columns (list): Scanner columns of the payload, in request order
+        fields (dict): Tick column -> scanner column, the first entry is the index
+    """
+
+    def __init__(self, columns, fields) -> None:
+        positions = {column: idx for idx, column in enumerate(columns)}
+        missing = [column for column in fields.values() if column not in positions]
+        if missing:
+            raise ValueError(f"Scan payload does not request the columns {missing}")
+        index_field, *self.value_columns = fields
+        self._index_getter = operator.itemgetter(positions[fields[index_field]])
+        value_positions = [positions[fields[field]] for field in self.value_columns]
+        if len(value_positions) == 1:
+            getter = operator.itemgetter(value_positions[0])
+            self._value_getter = lambda row: (getter(row),)
+        else:
+            self._value_getter = operator.itemgetter(*value_positions)
+
+    def decode(self, response):
+        """Builds the tick frame (indexed by symbol) of a decoded scan response."""
+        rows = [row["d"] for row in response["data"]]
+        values = np.array(list(map(self._value_getter, rows)), dtype=np.float64).reshape(len(rows), len(self.value_columns))
+        return pd.DataFrame(values, index=pd.Index(list(map(self._index_getter, rows)), dtype=object), columns=self.value_columns)
@@ -0,0 +1,174 @@
+import email.utils
+import random
+import time
+
+from .exceptions import FetchError
+
+
+def retry_after(exc):
+    """Seconds requested by the Retry-After header of a 429/5xx FetchError (or an error raised from one), None without one."""
+    if not isinstance(exc, FetchError) and isinstance(getattr(exc, "__cause__", None), FetchError):
+        exc = exc.__cause__
+    if not isinstance(exc, FetchError) or not (exc.status == 429 or exc.status >= 500):
+        return None
+    value = next((value for key, value in exc.headers.items() if key.lower() == "retry-after"), None)
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class PollScheduler:
+    """Fixed-rate tick scheduler driven by deadlines.
+
+    Deadlines are laid out on a fixed grid (``interval`` apart), so the time spent
+    fetching and processing a tick is absorbed instead of added to the period. A
+    tick that overruns skips the grid slots it missed rather than firing them in
+    a burst. After a failure the next deadline is pushed back exponentially
+    (with jitter), at least as far as a Retry-After header asks for.
+
+    Args:
+        interval (float): Seconds between two ticks
+        base_backoff (float, optional): First backoff delay, ``interval`` when omitted
+        max_backoff (float): Upper bound of the backoff delay
+        jitter (float): Random +/- fraction applied to the backoff delays
+    """
+
+    def __init__(self, interval, base_backoff=None, max_backoff=300, jitter=0.1) -> None:
+        self.interval = interval
+        self.base_backoff = interval if base_backoff is None else base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.deadline = None
+        self.failures = 0
+        self.missed = 0
+
+    def wait(self, should_stop=None):
+        """Sleeps until the next deadline (the first call returns at once).
+
+        Args:
+            should_stop (callable, optional): Checked while sleeping, the wait ends early once it returns True
+
+        Returns:
+            bool: False when the wait was ended by ``should_stop``
+        """
+        now = time.monotonic()
+        if self.deadline is None:
+            self.deadline = now
+        while now < self.deadline:
+            if should_stop is not None and should_stop():
+                return False
+            time.sleep(min(self.deadline - now, 0.5) if should_stop is not None else self.deadline - now)
+            now = time.monotonic()
+        return should_stop is None or not should_stop()
+
+    def success(self):
+        """Schedules the next tick on the grid after a successful one."""
+        self.failures = 0
+        now = time.monotonic()
+        self.deadline = (now if self.deadline is None else self.deadline) + self.interval
+        if self.deadline <= now:
+            missed = int((now - self.deadline) // self.interval) + 1
+            self.missed += missed
+            self.deadline += missed * self.interval
+
+    def failure(self, exc=None):
+        """Backs off after a failed tick.
+
+        Args:
+            exc (Exception, optional): The failure; the Retry-After of a 429/5xx FetchError is honoured
+
+        Returns:
+            float: Seconds until the next attempt
+        """
+        self.failures += 1
+        delay = min(self.base_backoff * 2 ** (self.failures - 1), self.max_backoff)
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        requested = retry_after(exc)
+        if requested is not None:
+            delay = max(delay, requested)
+        self.deadline = time.monotonic() + delay
+        return delay
+
+
+class HotSymbolPlanner:
+    """Chooses the ids fetched in each tick so that hot ids are polled more often within a request budget.
+
+    Ids whose last value came within ``hot_ratio`` of the threshold (or that
+    alerted) stay hot for ``hot_seconds`` and are fetched every tick; the rest
+    share the remaining capacity in a rotation. A tick without request credit
+    fetches nothing. Without a budget every id is fetched in every tick.
+
+    Args:
+        ids (list): Ids of the universe
+        chunk_size (int): Ids per request
+        interval (float): Seconds between two ticks
+        request_budget (float, optional): Requests per minute that may be spent
+        hot_ratio (float): Fraction of the threshold from which an id is hot
+        hot_seconds (float): Seconds an id stays hot
+        hot_share (float): Largest share of a tick's capacity given to hot ids while cold ones wait
+    """
+
+    def __init__(self, ids, chunk_size=250, interval=3, request_budget=None, hot_ratio=0.5, hot_seconds=300, hot_share=0.5) -> None:
+        self.ids = list(dict.fromkeys(ids))
+        self.known_ids = set(self.ids)
+        self.chunk_size = chunk_size
+        self.request_budget = request_budget
+        self.requests_per_tick = None if request_budget is None else request_budget * interval / 60
+        self.hot_ratio = hot_ratio
+        self.hot_seconds = hot_seconds
+        self.hot_share = hot_share
+        self.hot_until = {}
+        self.credit = 0.0
+        self.cursor = 0
+
+    def hot_ids(self, now=None):
+        now = time.monotonic() if now is None else now
+        expired = [coin_id for coin_id, until in self.hot_until.items() if until <= now]
+        for coin_id in expired:
+            del self.hot_until[coin_id]
+        return list(self.hot_until)
+
+    def update(self, scores, threshold, now=None):
+        """Marks the ids whose score (largest absolute change) reached ``hot_ratio * threshold`` as hot.
+
+        Args:
+            scores (pd.Series): Absolute scores indexed by id
+            threshold (float): Alert threshold
+        """
+        now = time.monotonic() if now is None else now
+        for coin_id in scores.index[scores.to_numpy() >= self.hot_ratio * threshold]:
+            if coin_id in self.known_ids:
+                self.hot_until[coin_id] = now + self.hot_seconds
+
+    def plan(self, now=None):
+        """Ids to fetch in this tick."""
+        if self.requests_per_tick is None:
+            return self.ids
+        self.credit = min(self.credit + self.requests_per_tick, max(1.0, 2 * self.requests_per_tick))
+        n_requests = int(self.credit)
+        if n_requests == 0:
+            return []
+        self.credit -= n_requests
+        capacity = n_requests * self.chunk_size
+        if capacity >= len(self.ids):
+            return self.ids
+
+        hot = self.hot_ids(now)
+        hot_set = set(hot)
+        cold = [coin_id for coin_id in self.ids if coin_id not in hot_set]
+        hot = hot[:max(int(capacity * self.hot_share), capacity - len(cold))]
+        n_cold = min(capacity - len(hot), len(cold))
+        if not n_cold:
+            return hot
+        self.cursor %= len(cold)
+        rotation = (cold[self.cursor:] + cold[:self.cursor])[:n_cold]
+        self.cursor += n_cold
+        return hot + rotation
@@ -3,6 +3,7 @@ from selenium import webdriver
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import NoSuchElementException
 from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions
@@ -10,36 +11,115 @@ import time
 import pandas as pd
 import pickle
 
+from monitor_app.alert_evaluator import AlertEvaluator
 from monitor_app.slack_api import SlackAgent
 from monitor_app.exceptions import LoopError
+from monitor_app.metrics import TickClock, count_error, stage_timer, start_metrics_server
+from monitor_app.scheduler import PollScheduler
+from monitor_app.settings import MonitorSettings
+from monitor_app.sources import PollingSource
+from monitor_app.utils import Logger
 import pytz
 import logging
 from webdriver_manager.chrome import ChromeDriverManager
 
 
 
-class SeleniumMonitor(webdriver.Chrome):
-    def __init__(self, threshold, executable_path) -> None:
+class SeleniumMonitor(webdriver.Chrome, PollingSource):
+    source_name = "tradingview_screener"
+
+    # Returns [total symbols text, [[symbol, "price change_1h change_5min"], ...]] in one round trip
+    bulk_table_script = """
+        const total = document.querySelector("div.tv-screener-table__field-value--total");
+        const rows = document.querySelectorAll("tbody.tv-data-table__tbody tr");
+        const values = new Array(rows.length);
+        for (let idx = 0; idx < rows.length; idx++) {
+            const lines = rows[idx].innerText.split("\\n");
+            values[idx] = [lines[0], lines[lines.length - 1]];
+        }
+        return [total ? total.innerText : null, values];
+    """
+
+    # Installs a MutationObserver on the screener table that keeps the latest [symbol, values] of every changed row
+    # in window.__screenerStream.changes. Returns false while the table is not rendered.
+    observer_script = """
+        const tbody = document.querySelector("tbody.tv-data-table__tbody");
+        if (!tbody) {
+            return false;
+        }
+        const previous = window.__screenerStream;
+        if (previous && previous.tbody === tbody) {
+            return true;
+        }
+        if (previous) {
+            previous.observer.disconnect();
+        }
+        const stream = {tbody: tbody, changes: new Map(), waiter: null, timer: null};
+        const record = (row) => {
+            if (!row || row.nodeName !== "TR" || !tbody.contains(row)) {
+                return;
+            }
+            const lines = row.innerText.split("\\n");
+            stream.changes.set(lines[0], [lines[0], lines[lines.length - 1]]);
+        };
+        stream.observer = new MutationObserver((mutations) => {
+            for (const mutation of mutations) {
+                if (mutation.target === tbody) {
+                    mutation.addedNodes.forEach(record);
+                    continue;
+                }
+                const node = mutation.target.nodeType === 1 ? mutation.target : mutation.target.parentElement;
+                record(node && node.closest("tr"));
+            }
+            if (stream.waiter && stream.changes.size) {
+                stream.waiter();
+            }
+        });
+        stream.observer.observe(tbody, {subtree: true, childList: true, characterData: true});
+        window.__screenerStream = stream;
+        return true;
+    """
+
+    # Async script: returns [total symbols text, changed rows] at once when changes are buffered, otherwise as soon as
+    # the first change arrives or after arguments[0] seconds. Returns null when the observer is gone (table re-rendered).
+    drain_script = """
+        const maxWait = arguments[0];
+        const done = arguments[arguments.length - 1];
+        const stream = window.__screenerStream;
+        if (!stream || stream.tbody !== document.querySelector("tbody.tv-data-table__tbody")) {
+            done(null);
+            return;
+        }
+        const take = () => {
+            clearTimeout(stream.timer);
+            stream.waiter = null;
+            const rows = Array.from(stream.changes.values());
+            stream.changes.clear();
+            const total = document.querySelector("div.tv-screener-table__field-value--total");
+            done([total ? total.innerText : null, rows]);
+        };
+        if (stream.changes.size) {
+            take();
+            return;
+        }
+        stream.waiter = take;
+        stream.timer = setTimeout(take, maxWait * 1000);
+    """
+
+    def __init__(self, threshold, executable_path, settings=None) -> None:
+        self.settings = settings or MonitorSettings.from_env("selenium")
         self.logger = logging.getLogger(__name__)
 
         # set log level
         self.logger.setLevel(logging.INFO)
-        file_handler = logging.FileHandler('main.log')
-        formatter = logging.Formatter(
-            '%(asctime)s : %(levelname)s : %(name)s : %(message)s')
-        file_handler.setFormatter(formatter)
-
-        # add file handler to logger
-        self.logger.addHandler(file_handler)
+        Logger.add_file_handler(self.logger, 'main.log')
         
-        self.instance_started = True
         self.is_deleted = False
-        self.SlackAgentInstance = SlackAgent()
+        self.SlackAgentInstance = SlackAgent(self.settings)
         self.slack_channel = "coingecko"
         self.timezone = pytz.timezone("Europe/Istanbul")
         self.threshold = threshold
-        self.minute_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(self.timezone) - datetime.timedelta(minutes=6)
-        self.hourly_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(self.timezone) - datetime.timedelta(hours=1, minutes=1)
+        self.evaluator = AlertEvaluator()
 
         options = webdriver.ChromeOptions()
         user_profile = "/Users/berkayg/Codes/testing/custom_chrome_profile/Default"
@@ -93,9 +173,11 @@ class SeleniumMonitor(webdriver.Chrome):
         time.sleep(5)
         self.check_smybols()
 
-    def check_smybols(self):
-        no_symbols = self.find_elements(By.XPATH, '//div[contains(@class,"tv-screener-table__field-value--total")]')
-        no_symbols = no_symbols[0].text.split(" ")[0]
+    def check_smybols(self, total_text=None):
+        if total_text is None:
+            no_symbols = self.find_elements(By.XPATH, '//div[contains(@class,"tv-screener-table__field-value--total")]')
+            total_text = no_symbols[0].text
+        no_symbols = total_text.split(" ")[0]
         count = int(no_symbols) if no_symbols.isnumeric() else 9999
         if count > 50:
             print("No symbols")
@@ -111,7 +193,108 @@ class SeleniumMonitor(webdriver.Chrome):
         
 
 
-    def read_table(self):
+    def read_table(self, bulk=True):
+        """Reads the screener table into a float frame indexed by symbol.
+
+        Args:
+            bulk (bool): Pull the whole table with a single script call instead of one WebDriver round trip per row
+        """
+        if bulk:
+            df = self._read_table_bulk()
+        else:
+            df = self._read_table_rows()
+        return df
+
+    def read_ticks(self):
+        return self.read_table()
+
+    def install_observer(self):
+        """Injects the MutationObserver into the screener page (once per rendered table).
+
+        Returns:
+            bool: False while the table is not rendered
+        """
+        return self.execute_script(self.observer_script)
+
+    def drain_changes(self, max_wait=1.0):
+        """Reads the rows that changed since the previous drain in one ``execute_async_script`` call.
+
+        Args:
+            max_wait (float): Seconds to block in the page when no change is buffered
+
+        Returns:
+            pd.DataFrame: Changed rows (empty when nothing changed), None when the observer has to be installed again
+        """
+        result = self.execute_async_script(self.drain_script, max_wait)
+        if result is None:
+            return None
+        total_text, rows = result
+        self.check_smybols(total_text)
+        return self.parse_rows(rows)
+
+    def stream(self, on_tick, stop_event=None, max_wait=1.0, resync_interval=60):
+        """Calls ``on_tick(df)`` with the rows that TradingView updated, as they change.
+
+        The first tick is the whole table; after that only the changed symbols are
+        sent, drained from the in-page buffer of the MutationObserver. The whole
+        table is read again every ``resync_interval`` seconds and whenever the
+        observer was lost (reload or re-render of the table).
+
+        Args:
+            on_tick (callable): Callback receiving each tick frame
+            stop_event (threading.Event, optional): Stops the loop once set
+            max_wait (float): Longest wait for a change in one drain call
+            resync_interval (float): Seconds between two full table reads
+        """
+        self.set_script_timeout(max_wait + 10)
+        last_full = None
+        while stop_event is None or not stop_event.is_set():
+            resync = last_full is None or time.monotonic() - last_full >= resync_interval
+            try:
+                if resync:
+                    if not self.install_observer():
+                        time.sleep(max_wait)
+                        continue
+                    with stage_timer("scrape"):
+                        df = self.read_table()
+                    last_full = time.monotonic()
+                else:
+                    with stage_timer("drain"):
+                        df = self.drain_changes(max_wait)
+            except WebDriverException as exc:
+                # Stale rows, script errors and timeouts of a re-rendered table: read the whole table again
+                count_error(exc)
+                df = None
+                if resync:
+                    time.sleep(max_wait)
+            if df is None:
+                last_full = None
+                continue
+            if not df.empty:
+                on_tick(df)
+
+    def _read_table_bulk(self):
+        total_text, rows = self.execute_script(self.bulk_table_script)
+        self.check_smybols(total_text)
+        return self.parse_rows(rows)
+
+    @staticmethod
+    def parse_rows(rows):
+        """Parses [symbol, "price change_1h change_5min"] pairs with vectorized string operations."""
+        raw = pd.DataFrame(rows, columns=["symbol", "values"]).drop_duplicates("symbol", keep="last")
+        # Columns missing from every row are filled as NaN strings, so the ``.str`` calls below always apply
+        values = raw["values"].str.strip().str.split(" ", n=2, expand=True).reindex(columns=range(3)).astype("string")
+        values = values.apply(
+            lambda column: pd.to_numeric(
+                column.str.strip().str.replace("%", "", regex=False).str.replace("−", "-", regex=False),
+                errors="coerce",
+            )
+        )
+        values.columns = ["price", "change_1h", "change_5min"]
+        values.index = pd.Index(raw["symbol"].to_numpy())
+        return values.astype(float)
+
+    def _read_table_rows(self):
 
         def _get_text(idx):
             target_path = f"//tbody[@class='{container}']//tr[{idx + 1}]"
@@ -145,54 +328,16 @@ class SeleniumMonitor(webdriver.Chrome):
 
         df = pd.DataFrame(value_dict, index=["price", "change_1h", "change_5min"]).T
         df = df.applymap(lambda x: float(x.strip().replace("%", "").replace("−", "-")))
-
-        if self.instance_started:
-            self.df_timing = pd.DataFrame(zip(symbols_length * [self.minute_cooldown], symbols_length * [self.hourly_cooldown]), index=value_dict.keys(), columns=["5min_cooldown", "1h_cooldown"])
-            self.instance_started = False
-
         return df
 
     def calculate_stats(self, df, threshold=5):
         now = datetime.datetime.now(tz=pytz.UTC).astimezone(self.timezone)
         print(now)
         if not (now > now.replace(second=0, hour=1, minute=30) and now < now.replace(second=0, hour=6, minute=0)):
-            last_5_min = df.loc[df["change_5min"].abs() > threshold, "change_5min"]
-            last_1_hour = df.loc[df["change_1h"].abs() > threshold, "change_1h"]
-            df_timing_5_min = last_5_min.to_frame().merge(self.df_timing[["5min_cooldown"]], left_index=True, right_index=True, how="left")
-            df_timing_1_hour = last_1_hour.to_frame().merge(self.df_timing[["1h_cooldown"]], left_index=True, right_index=True, how="left")
-
-            df_timing_5_min["5min_cooldown"] = (now - df_timing_5_min["5min_cooldown"]).dt.total_seconds()
-            df_timing_5_min["5min_cooldown"] = df_timing_5_min["5min_cooldown"] >= (60 * 5) + 15
-
-            df_timing_1_hour["1h_cooldown"] = (now - df_timing_1_hour["1h_cooldown"]).dt.total_seconds()
-            df_timing_1_hour["1h_cooldown"] = df_timing_1_hour["1h_cooldown"] >= (60 * 60) + 15
-
-            last_5_min_table = df_timing_5_min.loc[(df_timing_5_min["change_5min"].abs() > threshold) & (df_timing_5_min["5min_cooldown"])]
-            last_1_hour_table = df_timing_1_hour.loc[(df_timing_1_hour["change_1h"].abs() > threshold) & (df_timing_1_hour["1h_cooldown"])]
-
-            if last_5_min_table.shape[0] > 0 :
-                last_5_min_table = last_5_min_table["change_5min"].map(lambda x: f"%{round(abs(x), 1)} düştü:arrow_down:" if max(0, x) == 0 else f"%{round(abs(x), 1)} arttı:arrow_up:")
-                entry_edit = ":right_anger_bubble:*SON 5 DAKİKADA*\n" + last_5_min_table.to_string() + "\n" + " - " * 15
-                new_minute_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(self.timezone)
-                new_hourly_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(self.timezone)
-                self.df_timing.loc[last_5_min_table.index, "5min_cooldown"] = new_minute_cooldown
-                self.df_timing.loc[last_5_min_table.index, "1h_cooldown"] = new_hourly_cooldown
-                print(entry_edit)
-                # self.SlackAgentInstance.send_alert(
-                #     text=entry_edit, channel=self.slack_channel
-                # )
-                
-
-            elif last_1_hour_table.shape[0] > 0:
-                last_1_hour_table = last_1_hour_table["change_1h"].map(lambda x: f"%{round(abs(x), 1)} düştü:arrow_down:" if max(0, x) == 0 else f"%{round(abs(x), 1)} arttı:arrow_up:")
-                entry_edit = ":right_anger_bubble:*SON 1 SAATTE*\n" + last_1_hour_table.to_string() + "\n" + " - " * 15
-                new_hourly_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(self.timezone)
-                new_minute_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(self.timezone)
-                self.df_timing.loc[last_1_hour_table.index, "1h_cooldown"] = new_hourly_cooldown
-                self.df_timing.loc[last_1_hour_table.index, "5min_cooldown"] = new_minute_cooldown
-                print(entry_edit)
+            for alert in self.evaluator.evaluate(df, threshold, now=now):
+                print(alert.text)
                 # self.SlackAgentInstance.send_alert(
-                #     text=entry_edit, channel=self.slack_channel
+                #     text=alert.text, channel=self.slack_channel
                 # )
             self.is_deleted = False
             
@@ -204,17 +349,44 @@ class SeleniumMonitor(webdriver.Chrome):
             pass
             
 
-    def start_monitoring(self):
+    def start_monitoring(self, streaming=False):
+        """Evaluates the screener table every ``poll_interval`` seconds, or its changed rows as they arrive.
+
+        Args:
+            streaming (bool): Follow the table with the in-page MutationObserver (``stream``) instead of polling it
+        """
         print("Monitoring Started")
+        start_metrics_server(self.settings.metrics_port)
+        if streaming:
+            clock = TickClock(self.source_name, 0)
+
+            def on_tick(df):
+                clock.tick()
+                with stage_timer("stats"):
+                    self.calculate_stats(df, threshold=self.threshold)
+            try:
+                self.stream(on_tick)
+            except LoopError:
+                self.logger.exception("Major exception")
+                self.terminate_session()
+                raise
+            return
+
+        clock = TickClock(self.source_name, self.poll_interval)
+        scheduler = PollScheduler(self.poll_interval)
         try:
             while True:
+                scheduler.wait()
+                clock.tick()
                 try:
-                    df = self.read_table()
+                    with stage_timer("scrape"):
+                        df = self.read_table()
                     print(df)
-                    _ = self.calculate_stats(df, threshold=self.threshold)
-                    time.sleep(3)
-                except StaleElementReferenceException:
-                    pass
+                    with stage_timer("stats"):
+                        _ = self.calculate_stats(df, threshold=self.threshold)
+                except StaleElementReferenceException as exc:
+                    count_error(exc)
+                scheduler.success()
         except LoopError:
             self.logger.exception("Major exception")
             self.terminate_session()
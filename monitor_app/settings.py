@@ -0,0 +1,166 @@
+import os
+from dataclasses import dataclass, field
+
+from .exceptions import InputError
+
+
+# Monitor modes and the environment variables each of them needs
+MODES = {
+    "request": ("THRESHOLD",),
+    "stream": ("THRESHOLD", "KUCOIN_MARKETS"),
+    "selenium": ("THRESHOLD", "CHROME_EXE_PATH"),
+    "coingecko": ("SYMBOLS", "THRESHOLD", "LOOKBACK_MINUTES", "ALERT_REPEAT_CYCLE_FREQ"),
+    "sharded": ("SYMBOLS", "THRESHOLD", "LOOKBACK_MINUTES", "ALERT_REPEAT_CYCLE_FREQ"),
+    "multi": ("THRESHOLD", "SOURCES"),
+}
+
+# Sources of the multi mode and the mode whose variables each of them needs
+SOURCE_MODES = {
+    "tradingview": "request",
+    "coingecko": "coingecko",
+    "kucoin": "stream",
+    "selenium": "selenium",
+}
+
+
+def _split(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def _number(environ, name, cast, default=None):
+    value = environ.get(name)
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise InputError(f"{name} must be a number, got {value!r}") from None
+
+
+@dataclass
+class MonitorSettings:
+    """ Dataclass that holds the environment configuration of a monitor run.
+
+    It is built when a monitor starts (``from_env``) instead of at import time,
+    so importing the package never fails on a missing variable and every mode
+    only asks for the variables it uses.
+    """
+    mode: str = "request"
+    # Threshold value after which an alert message will be sent
+    threshold: float = None
+    # CoinGecko asset ids that will be monitored ("id" field must be provided)
+    symbols: list = field(default_factory=list)
+    # Number of minutes that the CoinGecko monitor takes into account for Moving Averaging process
+    lookback_minutes: int = None
+    # Seconds between two alerts of the same symbol (e.g., %5 change continues for 60 secs but the alert is sent once)
+    alert_repeat_cycle_freq: int = None
+    # CoinGecko requests per minute the monitor may spend, all ids are fetched every tick when not set
+    request_budget: float = None
+    # Number of CoinGecko ids fetched by one worker process
+    shard_size: int = 250
+    # chromedriver.exe path
+    chrome_exe_path: str = None
+    # Follow the screener with an in-page MutationObserver instead of re-reading it every 3 seconds
+    selenium_streaming: bool = False
+    # KuCoin markets of the streaming source, e.g. "BTC-USDT,ETH-USDT"
+    kucoin_markets: list = field(default_factory=list)
+    kucoin_ws_endpoint: str = None
+    # TradingView scanner URL (can point to a local stand-in)
+    scan_url: str = "https://scanner.tradingview.com/crypto/scan"
+    # CoinGecko API base URL (can point to a mirror or a local stand-in)
+    coingecko_api_url: str = "https://api.coingecko.com/api/v3"
+    # Sources run together by the multi mode, e.g. "tradingview,coingecko" (see SOURCE_MODES)
+    sources: list = field(default_factory=list)
+    # Directory of the columnar tick store (the CoinGecko monitors also keep their restart snapshot in it)
+    tick_store_dir: str = None
+    # "text" logs every scan as a table to logs/main.log, "structured" queues compact records to tick_log_path
+    tick_log_mode: str = "text"
+    tick_log_path: str = "logs/ticks.jsonl"
+    # Also log the rows whose values did not change since the previous scan
+    tick_log_sample_unchanged: bool = False
+    # Seconds between two restart snapshots of the CoinGecko monitors, 0 disables them
+    snapshot_interval: float = 30
+    # Windows of the in-process change detector, e.g. "1m,3m,15m,4h" (disabled when empty)
+    detector_windows: list = field(default_factory=list)
+    # Half-life of the EWMA return detector of the CoinGecko monitors, e.g. "15m" (disabled when not set)
+    ewma_half_life: str = None
+    # Half-life of the EWMA volume detector, volumes are not checked when not set
+    volume_half_life: str = None
+    # Standard deviations after which an EWMA detector alerts
+    zscore_threshold: float = 5.0
+    # Shared memory block the latest tick is published to (python -m monitor_app.live_snapshot <name>), disabled when not set
+    live_snapshot_name: str = None
+    # Local port or Unix socket of the live snapshot query API served by the monitor process (see live_snapshot.py)
+    live_query_port: int = None
+    live_query_socket: str = None
+    # Slack bot (posts) and user (purges) tokens, and the Web API base URL (can point to a local stand-in)
+    bot_token: str = None
+    user_token: str = None
+    slack_api_url: str = None
+    # Port of the /metrics endpoint (see metrics.py), disabled when not set
+    metrics_port: int = None
+    # YAML file of alert rule sets (thresholds, symbols, schedules and channel per team), one threshold and channel when not set
+    rules_path: str = None
+
+    @classmethod
+    def from_env(cls, mode=None, environ=None):
+        """Reads the settings of a monitor mode from the environment.
+
+        The .env file is loaded into the environment once by the entry point (monitor.py).
+
+        Args:
+            mode (str, optional): One of MODES, MONITOR_MODE (default "request") when omitted
+            environ (dict, optional): Variables to read, os.environ when omitted
+
+        Raises:
+            InputError: If the mode is unknown, one of its variables is missing or a number is malformed
+        """
+        if environ is None:
+            environ = os.environ
+        mode = mode or environ.get("MONITOR_MODE") or "request"
+        if mode not in MODES:
+            raise InputError(f"Unknown monitor mode {mode!r}, expected one of: {', '.join(MODES)}")
+        required = list(MODES[mode])
+        if mode == "multi":
+            unknown = [source for source in _split(environ.get("SOURCES")) if source not in SOURCE_MODES]
+            if unknown:
+                raise InputError(f"Unknown sources {', '.join(unknown)}, expected some of: {', '.join(SOURCE_MODES)}")
+            for source in _split(environ.get("SOURCES")):
+                required.extend(name for name in MODES[SOURCE_MODES[source]] if name not in required)
+        missing = [name for name in required if not environ.get(name)]
+        if missing:
+            raise InputError(f"Monitor mode {mode!r} needs the environment variables: {', '.join(missing)}")
+
+        return cls(
+            mode=mode,
+            threshold=_number(environ, "THRESHOLD", float),
+            symbols=_split(environ.get("SYMBOLS")),
+            lookback_minutes=_number(environ, "LOOKBACK_MINUTES", int),
+            alert_repeat_cycle_freq=_number(environ, "ALERT_REPEAT_CYCLE_FREQ", int),
+            request_budget=_number(environ, "REQUEST_BUDGET", float),
+            shard_size=_number(environ, "SHARD_SIZE", int, 250),
+            chrome_exe_path=environ.get("CHROME_EXE_PATH"),
+            selenium_streaming=environ.get("SELENIUM_STREAMING", "0") == "1",
+            sources=_split(environ.get("SOURCES")),
+            kucoin_markets=_split(environ.get("KUCOIN_MARKETS")),
+            kucoin_ws_endpoint=environ.get("KUCOIN_WS_ENDPOINT"),
+            scan_url=environ.get("TRADINGVIEW_SCAN_URL") or cls.scan_url,
+            coingecko_api_url=environ.get("COINGECKO_API_URL") or cls.coingecko_api_url,
+            tick_store_dir=environ.get("TICK_STORE_DIR"),
+            tick_log_mode=environ.get("TICK_LOG_MODE") or cls.tick_log_mode,
+            tick_log_path=environ.get("TICK_LOG_PATH") or cls.tick_log_path,
+            tick_log_sample_unchanged=environ.get("TICK_LOG_SAMPLE_UNCHANGED", "0") == "1",
+            snapshot_interval=_number(environ, "SNAPSHOT_INTERVAL", float, 30),
+            detector_windows=_split(environ.get("DETECTOR_WINDOWS")),
+            ewma_half_life=environ.get("EWMA_HALF_LIFE"),
+            volume_half_life=environ.get("VOLUME_HALF_LIFE"),
+            zscore_threshold=_number(environ, "ZSCORE_THRESHOLD", float, 5.0),
+            live_snapshot_name=environ.get("LIVE_SNAPSHOT_NAME"),
+            live_query_port=_number(environ, "LIVE_QUERY_PORT", int),
+            live_query_socket=environ.get("LIVE_QUERY_SOCKET"),
+            rules_path=environ.get("RULES_PATH"),
+            bot_token=environ.get("BOT_TOKEN"),
+            user_token=environ.get("USER_TOKEN"),
+            slack_api_url=environ.get("SLACK_API_URL"),
+            metrics_port=_number(environ, "METRICS_PORT", int),
+        )
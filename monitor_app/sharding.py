@@ -0,0 +1,255 @@
+import datetime
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from .alert_evaluator import AlertEvaluator
+from .coingecko_monitor import DEFAULT_TICK_STORE_DIR, CryptoMonitor, coingecko_windows, window_thresholds
+from .metrics import ERRORS, WORKER_RESTARTS, TickClock, start_metrics_server
+from .scheduler import PollScheduler
+from .settings import MonitorSettings
+from .slack_api import SlackAgent
+from .snapshot import load_snapshot, save_snapshot
+from .utils import Configs, UtilsManager
+
+
+def split_universe(symbol_ids, n_shards):
+    """Splits the ids (duplicates removed, order kept) into ``n_shards`` contiguous shards of similar size."""
+    unique_ids = list(dict.fromkeys(symbol_ids))
+    n_shards = max(1, min(n_shards, len(unique_ids)))
+    return [list(shard) for shard in np.array_split(np.array(unique_ids, dtype=object), n_shards)]
+
+
+def run_shard(shard, symbol_ids, settings, threshold, interval, tick_store_dir, results, stop_flag, max_backoff=30):
+    """Worker process: fetches one shard every ``interval`` seconds and reports its alert candidates.
+
+    Only the rows above the threshold in at least one window are sent, indexed
+    by CoinGecko id; the coordinator owns the cooldowns. Every tick is reported (also without
+    candidates) so the coordinator can tell a stalled worker from a quiet one.
+
+    ``stop_flag`` is a lock-free shared value: a worker killed in the middle of a
+    wait cannot leave it (unlike a multiprocessing.Event) in a locked state.
+    """
+    monitor = CryptoMonitor(symbol_ids, tick_store_dir=tick_store_dir, settings=settings)
+    windows = coingecko_windows(settings.alert_repeat_cycle_freq, settings)
+    columns = [window.column for window in windows]
+    thresholds = window_thresholds(windows, threshold, settings.zscore_threshold)
+    scheduler = PollScheduler(interval, max_backoff=max_backoff)
+    try:
+        # Backfilling the window can take longer than a tick, the coordinator extends the stall timeout meanwhile
+        results.put(("warming", shard, time.time(), None))
+        monitor.warm_start()
+        while scheduler.wait(lambda: stop_flag.value):
+            try:
+                if not monitor.concatenate_response():
+                    scheduler.success()
+                    continue
+                monitor.update_planner()
+                frame = monitor.tick_frame()
+                monitor.tick_store.append(frame, timestamp=monitor.tick_time.astimezone())
+                values = frame[columns]
+                candidates = values[(values.abs() > thresholds).any(axis=1)]
+                # Keyed by CoinGecko id (tickers are not unique across shards), the ticker is kept for the alert texts
+                candidates = candidates.assign(symbol=candidates.index.str.upper()).set_axis(
+                    pd.Index([monitor.id_by_symbol.get(symbol, symbol) for symbol in candidates.index], dtype=object)
+                )
+                results.put(("tick", shard, time.time(), candidates))
+                monitor.maybe_save_snapshot()
+            except Exception as exc:
+                # Backing off is reported too, so the coordinator does not take the worker for stalled
+                delay = scheduler.failure(exc)
+                results.put(("error", shard, time.time(), (type(exc).__name__, f"{exc} (retrying in {delay:.1f} s)")))
+                continue
+            scheduler.success()
+    finally:
+        monitor.save_snapshot()
+        monitor.tick_store.close()
+        monitor.fetcher.close()
+
+
+class ShardCoordinator:
+    """Runs the CoinGecko universe as shards in worker processes and alerts from one place.
+
+    Every worker keeps its own fetch loop, rolling buffer and tick store directory.
+    Once per cycle the coordinator merges the latest candidates of every shard,
+    drops duplicated ids, applies the global cooldowns of one AlertEvaluator
+    (kept per CoinGecko id, the alerts show the tickers) and posts a single
+    Slack message. The channel is purged once a day (alerts are paused
+    meanwhile, see UtilsManager.is_purge_time). Dead or stalled workers are
+    restarted with backoff; the other shards keep running with their state.
+
+    Args:
+        symbol_ids (list): CoinGecko ids of the whole universe
+        settings (MonitorSettings, optional): Settings of the run, read from the environment when omitted
+        shard_size (int, optional): Ids per shard (CoinGecko returns 250 per page), settings.shard_size when omitted
+        interval (float): Seconds between two cycles (and two fetches of a worker)
+        threshold (float, optional): Alert threshold in percent, settings.threshold when omitted
+        stall_timeout (float): Seconds without a message after which a worker is restarted
+        warmup_timeout (float): Extra seconds a starting worker gets to restore or backfill its window
+        enable_notification (bool): Post the consolidated alerts to Slack
+    """
+
+    def __init__(self, symbol_ids, settings=None, shard_size=None, interval=3, threshold=None, stall_timeout=60,
+                 warmup_timeout=120, windows=None, tick_store_dir=None, enable_notification=True) -> None:
+        self.settings = settings or MonitorSettings.from_env("sharded")
+        shard_size = shard_size or self.settings.shard_size
+        windows = windows or coingecko_windows(self.settings.alert_repeat_cycle_freq, self.settings)
+        self.shards = split_universe(symbol_ids, -(-len(set(symbol_ids)) // shard_size))
+        self.interval = interval
+        self.threshold = self.settings.threshold if threshold is None else threshold
+        self.stall_timeout = stall_timeout
+        self.warmup_timeout = warmup_timeout
+        self.tick_store_dir = tick_store_dir or self.settings.tick_store_dir or DEFAULT_TICK_STORE_DIR
+        self.enable_notification = enable_notification
+        self.slack_channel = "coingecko"
+        self.SlackAgentInstance = SlackAgent(self.settings)
+        self.is_deleted = False
+        self.evaluator = AlertEvaluator(windows, capacity=sum(len(shard) for shard in self.shards))
+        self.thresholds = window_thresholds(windows, self.threshold, self.settings.zscore_threshold)
+        # Global cooldowns survive restarts (the workers snapshot their own rolling state)
+        self.snapshot_path = os.path.join(self.tick_store_dir, "coordinator.npz")
+        self.snapshot_interval = self.settings.snapshot_interval
+
+        self.context = multiprocessing.get_context("spawn")
+        self.results = self.context.Queue()
+        self.stop_flag = self.context.RawValue("b", 0)
+        self.workers = {}
+        self.last_seen = {}
+        self.restarts = dict.fromkeys(range(len(self.shards)), 0)
+        self.next_start = dict.fromkeys(range(len(self.shards)), 0.0)
+
+    def _start_worker(self, shard):
+        process = self.context.Process(
+            target=run_shard,
+            args=(shard, self.shards[shard], self.settings, self.threshold, self.interval,
+                  os.path.join(self.tick_store_dir, f"shard-{shard}"), self.results, self.stop_flag,
+                  self.stall_timeout / 2),
+            name=f"coingecko-shard-{shard}",
+            daemon=True,
+        )
+        process.start()
+        self.workers[shard] = process
+        self.last_seen[shard] = time.monotonic()
+
+    def start(self):
+        for shard in range(len(self.shards)):
+            self._start_worker(shard)
+        print(f"{len(self.shards)} shards started for {sum(len(shard) for shard in self.shards)} symbols.")
+
+    def check_workers(self):
+        """Restarts the workers that exited or stopped reporting."""
+        now = time.monotonic()
+        for shard, process in list(self.workers.items()):
+            if process is not None and process.is_alive() and now - self.last_seen[shard] < self.stall_timeout:
+                continue
+            if process is not None:
+                if process.is_alive():
+                    print(f"Shard {shard} stalled for {now - self.last_seen[shard]:.0f} seconds, restarting.")
+                    process.terminate()
+                else:
+                    print(f"Shard {shard} exited with code {process.exitcode}, restarting.")
+                process.join(timeout=5)
+                self.workers[shard] = None
+                self.next_start[shard] = now + min(2 ** self.restarts[shard], 60)
+                self.restarts[shard] += 1
+            if now >= self.next_start[shard]:
+                WORKER_RESTARTS.labels(str(shard)).inc()
+                self._start_worker(shard)
+
+    def collect(self, deadline):
+        """Reads worker messages until ``deadline`` (monotonic) and returns the latest candidates per shard."""
+        candidates = {}
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                kind, shard, _, payload = self.results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            self.last_seen[shard] = time.monotonic()
+            if kind == "warming":
+                self.last_seen[shard] += self.warmup_timeout
+            elif kind == "tick":
+                candidates[shard] = payload
+                self.restarts[shard] = 0
+            else:
+                ERRORS.labels(payload[0]).inc()
+                print(f"Shard {shard} error: {payload[0]}: {payload[1]}")
+        return candidates
+
+    def run_cycle(self, deadline):
+        """Merges one cycle of candidates and sends the alerts of every shard as one message.
+
+        Returns:
+            list: Alert objects that were sent
+        """
+        candidates = self.collect(deadline)
+        self.check_workers()
+        if UtilsManager.is_purge_time(datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)):
+            if not self.is_deleted:
+                self.SlackAgentInstance.delete_messages(channel=self.slack_channel)
+                self.is_deleted = True
+            return []
+        self.is_deleted = False
+        frames = [frame for frame in candidates.values() if not frame.empty]
+        if not frames:
+            return []
+        merged = pd.concat(frames)
+        merged = merged[~merged.index.duplicated(keep="last")]
+        positions = self.evaluator.positions(merged.index)
+        alerts = self.evaluator.evaluate(merged.set_axis(pd.Index(merged["symbol"], dtype=object)), self.thresholds, positions=positions)
+        if alerts:
+            text = "\n".join(alert.text for alert in alerts)
+            print(text)
+            if self.enable_notification:
+                self.SlackAgentInstance.send_alert(text=text, channel=self.slack_channel)
+        return alerts
+
+    def save_snapshot(self):
+        save_snapshot(self.snapshot_path, **self.evaluator.state())
+
+    def restore_snapshot(self):
+        snapshot = load_snapshot(self.snapshot_path)
+        if snapshot is not None:
+            self.evaluator.restore(snapshot["symbols"].tolist(), snapshot["columns"].tolist(), snapshot["last_alert"])
+
+    def run(self):
+        start_metrics_server(self.settings.metrics_port)
+        clock = TickClock("coingecko_coordinator", self.interval)
+        self.restore_snapshot()
+        self.start()
+        deadline = time.monotonic()
+        last_snapshot = time.monotonic()
+        try:
+            while True:
+                clock.tick()
+                deadline += self.interval
+                self.run_cycle(deadline)
+                deadline = max(deadline, time.monotonic())
+                if self.snapshot_interval and time.monotonic() - last_snapshot >= self.snapshot_interval:
+                    self.save_snapshot()
+                    last_snapshot = time.monotonic()
+        finally:
+            self.save_snapshot()
+            self.stop()
+
+    def stop(self, timeout=10):
+        self.stop_flag.value = 1
+        # Workers only exit once their queued messages are flushed, so keep draining while they stop
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and any(process is not None and process.is_alive() for process in self.workers.values()):
+            try:
+                self.results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in self.workers.values():
+            if process is not None:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
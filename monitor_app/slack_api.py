@@ -1,63 +1,289 @@
 import slack
-import os
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from time import sleep
 import jmespath
+from slack.errors import SlackApiError
 
-from dotenv import load_dotenv
-load_dotenv()
-
-# Slack Bot Token
-BOT_TOKEN = os.environ['BOT_TOKEN']
-
-# Slack User Token
-USER_TOKEN = os.environ['USER_TOKEN']
+from .exceptions import InputError
+from .metrics import SLACK_MESSAGES, stage_timer
+from .rate_limit import TokenBucket
+from .settings import MonitorSettings
 
 
 class BotAgent(slack.WebClient):
-    def __init__(self) -> None:
-        super().__init__(token=BOT_TOKEN)
+    def __init__(self, token, base_url=None) -> None:
+        super().__init__(token=token, base_url=base_url or slack.WebClient.BASE_URL)
 
 
 class UserAgent(slack.WebClient):
-    def __init__(self) -> None:
-        super().__init__(token=USER_TOKEN)
+    def __init__(self, token, base_url=None) -> None:
+        super().__init__(token=token, base_url=base_url or slack.WebClient.BASE_URL)
+
+
+class AlertDispatcher:
+    """Outbound alert queue drained by a background worker with one reused client.
+
+    Alerts that are enqueued within ``coalesce_window`` seconds of each other are
+    joined into one message per channel. Posts go through a per-channel token
+    bucket (Slack allows about one message per second per channel), a 429 answer
+    pauses the channel for its Retry-After and other failures are retried with
+    exponential backoff. Alerts still queued when the interpreter exits (also
+    through SIGTERM, see monitor.py) are flushed for up to ``shutdown_timeout``
+    seconds, the worker thread is a daemon.
+
+    Args:
+        client (slack.WebClient): Client used for every post
+        rate (float): Messages per second allowed per channel
+        burst (int): Messages that can be sent at once before the rate applies
+        coalesce_window (float): Seconds to wait for more alerts before posting
+        max_retries (int): Attempts after the first failed post
+        max_length (int): Longer coalesced texts are split at line boundaries
+        shutdown_timeout (float): Seconds the queued alerts are given at exit
+    """
+
+    def __init__(self, client, rate=1.0, burst=1, coalesce_window=1.0, max_retries=5, max_length=3500,
+                 shutdown_timeout=10) -> None:
+        self.client = client
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.max_length = max_length
+        self.shutdown_timeout = shutdown_timeout
+        self.queue = queue.Queue()
+        self.buckets = {}
+        self.sent = 0
+        self.failed = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flush_at_exit = False
+
+    def enqueue(self, text, channel):
+        """Queues an alert and returns immediately."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="slack-dispatcher", daemon=True)
+                self._thread.start()
+            if not self._flush_at_exit:
+                atexit.register(self._flush_on_exit)
+                self._flush_at_exit = True
+        self.queue.put((channel, text))
+
+    def flush(self, timeout=None):
+        """Waits until every queued alert is handled, returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            sleep(0.01)
+        return True
+
+    def _flush_on_exit(self):
+        if not self.flush(timeout=self.shutdown_timeout):
+            print(f"{self.queue.unfinished_tasks} Slack alerts were not sent before exit.")
+
+    def _collect(self):
+        channel, text = self.queue.get()
+        batch = {channel: [text]}
+        n_items = 1
+        deadline = time.monotonic() + self.coalesce_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                channel, text = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.setdefault(channel, []).append(text)
+            n_items += 1
+        return batch, n_items
+
+    def _split(self, text):
+        chunks, current = [], ""
+        for line in text.split("\n"):
+            if current and len(current) + len(line) + 1 > self.max_length:
+                chunks.append(current)
+                current = line
+            else:
+                current = line if not current else current + "\n" + line
+        chunks.append(current)
+        return chunks
+
+    def _post(self, channel, text):
+        bucket = self.buckets.setdefault(channel, TokenBucket(self.rate, self.burst))
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                with stage_timer("slack_post"):
+                    self.client.chat_postMessage(channel='#'+channel, text=text, link_names=1)
+                self.sent += 1
+                SLACK_MESSAGES.labels("sent").inc()
+                return True
+            except SlackApiError as exc:
+                if exc.response.status_code != 429:
+                    print(exc)
+                    break
+                SLACK_MESSAGES.labels("rate_limited").inc()
+                bucket.penalize(float(exc.response.headers.get("Retry-After", 1)))
+            except Exception as exc:
+                print(exc)
+                SLACK_MESSAGES.labels("retried").inc()
+                sleep(min(2 ** attempt, 30))
+        self.failed += 1
+        SLACK_MESSAGES.labels("failed").inc()
+        return False
+
+    def _run(self):
+        while True:
+            batch, n_items = self._collect()
+            try:
+                for channel, texts in batch.items():
+                    for text in self._split("\n".join(texts)):
+                        self._post(channel, text)
+            finally:
+                for _ in range(n_items):
+                    self.queue.task_done()
 
 
 class SlackAgent(BotAgent, UserAgent):
-    def __init__(self) -> None:
-        BotAgent().__init__()
-        UserAgent().__init__()
+    """Slack clients of a monitor run.
+
+    Args:
+        settings (MonitorSettings): Settings of the run, holding the tokens and the Web API base URL
+    """
+
+    def __init__(self, settings) -> None:
+        if not settings.bot_token or not settings.user_token:
+            raise InputError("BOT_TOKEN and USER_TOKEN must be set to send Slack messages")
+        self.bot_client = BotAgent(settings.bot_token, settings.slack_api_url)
+        self.user_client = UserAgent(settings.user_token, settings.slack_api_url)
+        self.dispatcher = AlertDispatcher(self.bot_client)
+        self._channel_ids = {}
+        self._purge_jobs = {}
+        self._purge_lock = threading.Lock()
 
     def send_alert(self, text, channel):
-        _ = BotAgent().chat_postMessage(channel='#'+channel, text=text, link_names=1)
+        """Queues the alert for the background dispatcher, does not wait for Slack."""
+        self.dispatcher.enqueue(text=text, channel=channel)
 
     def list_channels(self):
-        conversations_data = BotAgent().conversations_list().data
-        return dict(jmespath.search("[*].[@.name, @.id]", conversations_data["channels"]))
-
-    def delete_messages(self, channel):
-        channel_id = self.list_channels().get(channel)
-        if channel_id:
-            message_data = UserAgent().conversations_history(channel=channel_id).data
-            active_messages = message_data['messages']
-            timestamp_list = [m['ts'] for m in active_messages]
-            number_of_deleted_messages = 0
-            for i in timestamp_list:
-                try:
-                    UserAgent().chat_delete(channel=channel_id, ts=i)
-                    number_of_deleted_messages += 1
-                except Exception as esc:
-                    print(esc)
-                    pass
-                sleep(0.2)
-            print(number_of_deleted_messages, " messages deleted.")
-
-        else:
-            raise TypeError("Channel not found.")
+        """Returns the name -> id map of every channel, following the cursor pagination."""
+        channels = {}
+        cursor = None
+        while True:
+            conversations_data = self.bot_client.conversations_list(cursor=cursor, limit=1000).data
+            channels.update(jmespath.search("[*].[@.name, @.id]", conversations_data["channels"]))
+            cursor = (conversations_data.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                break
+        self._channel_ids = channels
+        return channels
+
+    def get_channel_id(self, channel):
+        """Channel id from the cached map, which is refreshed once on a miss."""
+        if channel not in self._channel_ids:
+            self.list_channels()
+        return self._channel_ids.get(channel)
+
+    def delete_messages(self, channel, wait=False):
+        """Purges the channel in the background and returns the running PurgeJob.
+
+        Args:
+            channel (str): Channel name
+            wait (bool): Block until the purge is finished
+        """
+        with self._purge_lock:
+            job = self._purge_jobs.get(channel)
+            if job is None or job.finished.is_set():
+                job = PurgeJob(self, channel)
+                self._purge_jobs[channel] = job
+                job.start()
+        if wait:
+            job.finished.wait()
+        return job
+
+
+class PurgeJob(threading.Thread):
+    """Background deletion of every message of a channel.
+
+    History pages are read with cursor pagination and the deletes of each page
+    run concurrently on a small pool, all sharing one token bucket sized to the
+    chat.delete rate limit (Tier 3, about 50 calls per minute).
+
+    Args:
+        agent (SlackAgent): Agent whose user client deletes the messages
+        channel (str): Channel name
+        workers (int): Concurrent delete calls
+        rate (float): Delete calls per second
+    """
+
+    def __init__(self, agent, channel, workers=4, rate=50 / 60) -> None:
+        super().__init__(name=f"slack-purge-{channel}", daemon=True)
+        self.agent = agent
+        self.channel = channel
+        self.workers = workers
+        self.bucket = TokenBucket(rate, capacity=workers)
+        self.deleted = 0
+        self.failed = 0
+        self.seen = 0
+        self.error = None
+        self.finished = threading.Event()
+        self._counter_lock = threading.Lock()
+
+    def _delete(self, channel_id, ts, max_retries=5):
+        for attempt in range(max_retries + 1):
+            self.bucket.acquire()
+            try:
+                self.agent.user_client.chat_delete(channel=channel_id, ts=ts)
+                with self._counter_lock:
+                    self.deleted += 1
+                return
+            except SlackApiError as exc:
+                if exc.response.status_code != 429:
+                    print(exc)
+                    break
+                self.bucket.penalize(float(exc.response.headers.get("Retry-After", 1)))
+            except Exception as exc:
+                print(exc)
+                sleep(min(2 ** attempt, 30))
+        with self._counter_lock:
+            self.failed += 1
+
+    def run(self):
+        started = time.monotonic()
+        try:
+            channel_id = self.agent.get_channel_id(self.channel)
+            if not channel_id:
+                raise TypeError("Channel not found.")
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                cursor = None
+                while True:
+                    message_data = self.agent.user_client.conversations_history(
+                        channel=channel_id, cursor=cursor, limit=200).data
+                    timestamps = [m['ts'] for m in message_data['messages']]
+                    self.seen += len(timestamps)
+                    list(executor.map(lambda ts: self._delete(channel_id, ts), timestamps))
+                    print(f"#{self.channel} purge: {self.deleted}/{self.seen} messages deleted.")
+                    cursor = (message_data.get("response_metadata") or {}).get("next_cursor")
+                    if not message_data.get("has_more") or not cursor:
+                        break
+            print(self.deleted, " messages deleted in", round(time.monotonic() - started, 1), "seconds.")
+        except Exception as exc:
+            self.error = exc
+            print(exc)
+        finally:
+            self.finished.set()
 
 
 if __name__ == "__main__":
-    Agent = SlackAgent()
+    from dotenv import load_dotenv
+    load_dotenv()
+    Agent = SlackAgent(MonitorSettings.from_env())
     #Agent.send_alert(text="deneme2", channel="upwork")
-    Agent.delete_messages("upwork")
+    Agent.delete_messages("upwork", wait=True)
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+
+def save_snapshot(path, **arrays):
+    """Writes ``arrays`` as an .npz file that replaces ``path`` atomically.
+
+    The file is written next to ``path`` and moved over it with ``os.replace``
+    once it is flushed to disk, so a crash while saving leaves the previous
+    snapshot intact.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(prefix=".snapshot-", suffix=".npz", dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as snapshot_file:
+            np.savez(snapshot_file, **arrays)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def load_snapshot(path):
+    """Reads a snapshot written by ``save_snapshot``.
+
+    Returns:
+        dict: Array of every name, None when the file is missing or unreadable
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as snapshot:
+            return {name: snapshot[name] for name in snapshot.files}
+    except (OSError, ValueError, zipfile.BadZipFile) as exc:
+        print(f"Snapshot {path} could not be read ({exc}), starting without it.")
+        return None
@@ -0,0 +1,60 @@
+from abc import ABC, abstractmethod
+
+from .scheduler import PollScheduler
+
+
+class TickSource(ABC):
+    """Common interface of price sources.
+
+    A tick is a DataFrame indexed by symbol with (at least) the ``price``,
+    ``change_1h`` and ``change_5min`` columns that the alert evaluation expects.
+    Push-based sources implement ``stream`` and call ``on_tick`` as updates
+    arrive; polling sources derive from PollingSource instead.
+    """
+    source_name = "source"
+    tick_columns = ["price", "change_1h", "change_5min"]
+    poll_interval = 3
+
+    @abstractmethod
+    def stream(self, on_tick, stop_event=None):
+        """Calls ``on_tick(df)`` with every new tick until ``stop_event`` is set.
+
+        Args:
+            on_tick (callable): Callback receiving each tick frame
+            stop_event (threading.Event, optional): Stops the loop once set
+        """
+
+    def close(self):
+        pass
+
+
+class PollingSource(TickSource):
+    """Tick source that is read on a fixed interval.
+
+    Subclasses implement ``read_ticks`` and inherit the fixed-interval ``stream``
+    loop.
+    """
+
+    @abstractmethod
+    def read_ticks(self):
+        """Reads one tick frame."""
+
+    def stream(self, on_tick, stop_event=None):
+        """Calls ``on_tick(df)`` with a fresh tick every ``poll_interval`` seconds until ``stop_event`` is set.
+
+        Ticks follow a fixed deadline grid; a failed read is retried with backoff.
+
+        Args:
+            on_tick (callable): Callback receiving each tick frame
+            stop_event (threading.Event, optional): Stops the loop once set
+        """
+        scheduler = PollScheduler(self.poll_interval)
+        should_stop = None if stop_event is None else stop_event.is_set
+        while scheduler.wait(should_stop):
+            try:
+                df = self.read_ticks()
+            except Exception as exc:
+                scheduler.failure(exc)
+                continue
+            scheduler.success()
+            on_tick(df)
@@ -0,0 +1,507 @@
+"""Local stand-in servers that mimic the external services for offline testing."""
+import asyncio
+import datetime
+import http.server
+import json
+import random
+import threading
+import time
+import urllib.parse
+from abc import ABC, abstractmethod
+from collections import deque
+
+import numpy as np
+import websockets
+
+
+class KucoinStandInServer:
+    """Local WebSocket server that speaks the KuCoin public ticker protocol.
+
+    It greets clients with a ``welcome`` message, acknowledges ``subscribe``
+    requests, answers pings and then pushes ticker messages for the subscribed
+    markets every ``interval`` seconds. ``drop_after`` closes each connection
+    after that many pushed messages to exercise client reconnects.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on, 0 picks a free one
+        prices (dict): Starting price for each market (e.g. {"BTC-USDT": 16000})
+        interval (float): Seconds between ticker pushes
+        drop_after (int, optional): Number of pushes after which a connection is closed
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, prices=None, interval=0.05, drop_after=None) -> None:
+        self.host = host
+        self.port = port
+        self.prices = dict(prices or {"BTC-USDT": 16000.0, "ETH-USDT": 1100.0})
+        self.interval = interval
+        self.drop_after = drop_after
+        self.subscriptions = []
+        self.loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def shock(self, market, pct):
+        """Moves the price of a market by ``pct`` percent at once."""
+        self.prices[market] *= 1 + pct / 100
+
+    def _ticker(self, market):
+        self.prices[market] *= 1 + random.uniform(-0.0005, 0.0005)
+        return json.dumps({
+            "type": "message",
+            "topic": f"/market/ticker:{market}",
+            "subject": "trade.ticker",
+            "data": {"price": str(self.prices[market]), "time": int(time.time() * 1000)},
+        })
+
+    async def _push(self, connection, markets):
+        sent = 0
+        while self.drop_after is None or sent < self.drop_after:
+            for market in markets:
+                await connection.send(self._ticker(market))
+                sent += 1
+            await asyncio.sleep(self.interval)
+        await connection.close()
+
+    async def _handler(self, connection, *args):
+        await connection.send(json.dumps({"id": "welcome", "type": "welcome"}))
+        push_task = None
+        try:
+            async for raw_message in connection:
+                message = json.loads(raw_message)
+                if message.get("type") == "ping":
+                    await connection.send(json.dumps({"id": message.get("id"), "type": "pong"}))
+                elif message.get("type") == "subscribe":
+                    self.subscriptions.append(message["topic"])
+                    await connection.send(json.dumps({"id": message.get("id"), "type": "ack"}))
+                    markets = [m for m in message["topic"].split(":", 1)[1].split(",") if m in self.prices]
+                    push_task = asyncio.ensure_future(self._push(connection, markets))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            if push_task is not None:
+                push_task.cancel()
+
+    async def _serve(self):
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = list(self._server.sockets)[0].getsockname()[1]
+        self._ready.set()
+        await self._server.wait_closed()
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_until_complete, args=(self._serve(),), daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self.loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(5)
+
+
+class PriceBook:
+    """Random walk prices of a symbol universe with price shocks and the history the change windows need.
+
+    Prices move at most once per ``step_interval`` seconds however many requests
+    read them (e.g. the parallel page requests of one CoinGecko tick). Shocks can
+    be applied at once (``shock``) or scripted at an offset from the start
+    (``schedule``); every applied shock is recorded with its monotonic time in
+    ``shocks``, which is the reference of the end-to-end latency.
+
+    Args:
+        symbols (list): Symbols of the universe
+        volatility (float): Standard deviation of a step in percent
+        step_interval (float): Minimum seconds between two random walk steps
+        resolution (float): Seconds between two kept history snapshots
+        seed (int): Seed of the starting prices and the walk
+    """
+
+    def __init__(self, symbols, volatility=0.02, step_interval=0.5, resolution=10, seed=0) -> None:
+        self.symbols = list(symbols)
+        self.index = {symbol: idx for idx, symbol in enumerate(self.symbols)}
+        self.volatility = volatility
+        self.step_interval = step_interval
+        self.resolution = resolution
+        self.rng = np.random.default_rng(seed)
+        self.prices = self.rng.lognormal(0, 3, len(self.symbols))
+        self.started = time.monotonic()
+        self.last_step = self.started
+        self.history = deque([(self.started, self.prices.copy())])
+        self.script = []
+        self.shocks = []
+        self.lock = threading.Lock()
+
+    def schedule(self, at, symbol, pct):
+        """Moves ``symbol`` by ``pct`` percent ``at`` seconds after the start."""
+        with self.lock:
+            self.script.append((at, symbol, pct))
+            self.script.sort(key=lambda shock: shock[0])
+
+    def shock(self, symbol, pct):
+        """Moves the price of ``symbol`` by ``pct`` percent at once and records the time."""
+        with self.lock:
+            self._apply(symbol, pct, time.monotonic())
+
+    def _apply(self, symbol, pct, now):
+        self.prices[self.index[symbol]] *= 1 + pct / 100
+        self.shocks.append((symbol, pct, now))
+
+    def step(self):
+        """Advances the walk when it is due and returns the current prices."""
+        with self.lock:
+            now = time.monotonic()
+            while self.script and self.started + self.script[0][0] <= now:
+                _, symbol, pct = self.script.pop(0)
+                self._apply(symbol, pct, now)
+            if now - self.last_step >= self.step_interval:
+                self.prices *= 1 + self.rng.normal(0, self.volatility / 100, len(self.prices))
+                self.last_step = now
+            if now - self.history[-1][0] >= self.resolution:
+                self.history.append((now, self.prices.copy()))
+                # One hour is the longest change window of the providers
+                while len(self.history) > 1 and now - self.history[1][0] >= 60 * 60:
+                    self.history.popleft()
+            return self.prices.copy()
+
+    def change(self, seconds, prices=None):
+        """Percent change of every symbol since ``seconds`` ago (since the start while the history is shorter)."""
+        prices = self.prices if prices is None else prices
+        cutoff = time.monotonic() - seconds
+        reference = self.history[0][1]
+        for moment, snapshot in self.history:
+            if moment > cutoff:
+                break
+            reference = snapshot
+        return (prices / reference - 1) * 100
+
+
+class HTTPStandInServer(ABC):
+    """Threaded local HTTP server with the failure modes of a remote API.
+
+    Each request waits ``latency`` (plus up to ``jitter``) seconds, then a share
+    of the requests is answered with 429 and a Retry-After header
+    (``throttle_rate``) or with 500 (``error_rate``). The rest are answered by
+    ``handle`` of the subclass. Responses are JSON over keep-alive HTTP/1.1.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on, 0 picks a free one
+        latency (float): Seconds added to every response
+        jitter (float): Random extra seconds added to every response
+        error_rate (float): Share of requests answered with 500
+        throttle_rate (float): Share of requests answered with 429
+        retry_after (int): Retry-After seconds of the 429 answers
+        seed (int): Seed of the failure draws
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1, seed=0) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @abstractmethod
+    def handle(self, method, path, params):
+        """Answers a request that passed the failure draws.
+
+        Args:
+            method (str): "GET" or "POST"
+            path (str): Request path without the query
+            params (dict): Query parameters merged with the JSON or form body (a parsed JSON body is kept whole)
+
+        Returns:
+            tuple: HTTP status and JSON serializable payload
+        """
+
+    @staticmethod
+    def _params(handler, query):
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(query).items()}
+        length = int(handler.headers.get("Content-Length") or 0)
+        if not length:
+            return params
+        body = handler.rfile.read(length)
+        if "json" in (handler.headers.get("Content-Type") or ""):
+            decoded = json.loads(body)
+            if not isinstance(decoded, dict):
+                return decoded
+            params.update(decoded)
+        else:
+            params.update({key: values[-1] for key, values in urllib.parse.parse_qs(body.decode()).items()})
+        return params
+
+    def _respond(self, handler, method):
+        parsed = urllib.parse.urlparse(handler.path)
+        params = self._params(handler, parsed.query)
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        headers = {}
+        with self.lock:
+            self.requests += 1
+            draw = self.rng.random()
+        if draw < self.throttle_rate:
+            with self.lock:
+                self.throttled += 1
+            status, payload = 429, {"ok": False, "error": "ratelimited"}
+            headers["Retry-After"] = str(self.retry_after)
+        elif draw < self.throttle_rate + self.error_rate:
+            with self.lock:
+                self.errors += 1
+            status, payload = 500, {"ok": False, "error": "stand-in failure"}
+        else:
+            status, payload = self.handle(method, parsed.path, params)
+        body = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self):
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stand_in._respond(self, "GET")
+
+            def do_POST(self):
+                stand_in._respond(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(5)
+
+
+class TradingViewStandInServer(HTTPStandInServer):
+    """Stand-in of ``scanner.tradingview.com/crypto/scan``.
+
+    Every POST returns all symbols with the requested ``columns`` in the order
+    of the payload (unknown columns are null). ``change|5`` and ``change|60``
+    are derived from the price history, so a shock shows up in both.
+
+    Args:
+        symbols (list, optional): Symbol names, SYM<n>USDT names when omitted
+        n_symbols (int): Number of generated names when ``symbols`` is omitted
+        volatility (float): Standard deviation of a price step in percent
+        **kwargs: HTTPStandInServer arguments
+    """
+
+    def __init__(self, symbols=None, n_symbols=100, volatility=0.02, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.symbols = list(symbols or (f"SYM{idx}USDT" for idx in range(n_symbols)))
+        self.book = PriceBook(self.symbols, volatility=volatility, seed=kwargs.get("seed", 0))
+        self.rows_served = 0
+
+    @property
+    def scan_url(self):
+        return f"{self.url}/crypto/scan"
+
+    def handle(self, method, path, params):
+        if method != "POST" or not path.endswith("/scan"):
+            return 404, {"error": f"unknown path {path}"}
+        prices = self.book.step()
+        values = {
+            "name": self.symbols,
+            "description": self.symbols,
+            "logoid": [symbol.lower() for symbol in self.symbols],
+            "close": prices.tolist(),
+            "change|5": self.book.change(5 * 60, prices).tolist(),
+            "change|60": self.book.change(60 * 60, prices).tolist(),
+        }
+        columns = [values.get(column) for column in params.get("columns", ["name", "close"])]
+        data = [
+            {"s": f"KUCOIN:{symbol}", "d": [None if column is None else column[idx] for column in columns]}
+            for idx, symbol in enumerate(self.symbols)
+        ]
+        with self.lock:
+            self.rows_served += len(data)
+        return 200, {"totalCount": len(data), "data": data}
+
+
+class CoinGeckoStandInServer(HTTPStandInServer):
+    """Stand-in of the CoinGecko ``/api/v3/coins/markets`` and ``/coins/{id}/market_chart`` endpoints.
+
+    Args:
+        ids (list): CoinGecko ids of the universe
+        symbols (dict, optional): id -> ticker symbol, the id itself when missing
+        volatility (float): Standard deviation of a price step in percent
+        **kwargs: HTTPStandInServer arguments
+    """
+
+    def __init__(self, ids, symbols=None, volatility=0.02, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.ids = list(dict.fromkeys(ids))
+        self.symbols = dict(symbols or {})
+        self.book = PriceBook(self.ids, volatility=volatility, seed=kwargs.get("seed", 0))
+        self.rows_served = 0
+
+    @property
+    def api_url(self):
+        return f"{self.url}/api/v3"
+
+    def handle(self, method, path, params):
+        if path.endswith("/coins/markets"):
+            return 200, self._markets(params)
+        if path.endswith("/market_chart"):
+            coin_id = path.split("/")[-2]
+            if coin_id not in self.book.index:
+                return 404, {"error": "coin not found"}
+            return 200, self._market_chart(coin_id, float(params.get("days", 1)))
+        return 404, {"error": f"unknown path {path}"}
+
+    def _markets(self, params):
+        prices = self.book.step()
+        change_1h = self.book.change(60 * 60, prices)
+        updated = datetime.datetime.now(tz=datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        records = []
+        for coin_id in params.get("ids", "").split(","):
+            idx = self.book.index.get(coin_id)
+            if idx is None:
+                continue
+            records.append({
+                "id": coin_id,
+                "symbol": self.symbols.get(coin_id, coin_id),
+                "current_price": float(prices[idx]),
+                "price_change_percentage_1h_in_currency": float(change_1h[idx]),
+                "total_volume": 1e6,
+                "last_updated": updated,
+            })
+        with self.lock:
+            self.rows_served += len(records)
+        return records
+
+    def _market_chart(self, coin_id, days):
+        # Five minute points (the granularity CoinGecko returns for 1-90 days) around the current price
+        price = float(self.book.prices[self.book.index[coin_id]])
+        now_ms = time.time() * 1000
+        n_points = int(days * 24 * 12)
+        return {"prices": [[now_ms - k * 5 * 60 * 1000, price] for k in range(n_points, -1, -1)]}
+
+
+class KucoinTokenStandInServer(HTTPStandInServer):
+    """Stand-in of the KuCoin public bullet (WebSocket token) endpoint.
+
+    Answers ``POST /api/v1/bullet-public`` with a token and ``endpoint`` as the
+    instance server; the first ``fail_first`` requests are answered with 500 to
+    exercise the token retries of the client.
+
+    Args:
+        endpoint (str): WebSocket URL handed out, e.g. ``KucoinStandInServer.url``
+        fail_first (int): Number of leading requests that fail
+        **kwargs: HTTPStandInServer arguments
+    """
+
+    def __init__(self, endpoint, fail_first=0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.fail_first = fail_first
+        self.tokens_served = 0
+
+    @property
+    def token_url(self):
+        return f"{self.url}/api/v1/bullet-public"
+
+    def handle(self, method, path, params):
+        if method != "POST" or not path.endswith("/bullet-public"):
+            return 404, {"error": f"unknown path {path}"}
+        with self.lock:
+            if self.requests <= self.fail_first:
+                return 500, {"code": "500000", "msg": "stand-in token failure"}
+            self.tokens_served += 1
+        return 200, {"code": "200000", "data": {
+            "token": f"stand-in-{self.tokens_served}",
+            "instanceServers": [{"endpoint": self.endpoint, "protocol": "websocket", "pingInterval": 18000}],
+        }}
+
+
+class SlackStandInServer(HTTPStandInServer):
+    """Stand-in of the Slack Web API methods the monitors call.
+
+    ``chat.postMessage`` stores the message with its monotonic arrival time in
+    ``messages``; ``conversations.list``, ``conversations.history`` and
+    ``chat.delete`` work on those messages, so purges can be exercised too.
+    Channels are created on their first message.
+
+    Args:
+        **kwargs: HTTPStandInServer arguments
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.channels = {}
+        self.messages = []
+
+    @property
+    def api_url(self):
+        return f"{self.url}/api/"
+
+    def _channel_id(self, name):
+        name = name.lstrip("#")
+        if name not in self.channels:
+            self.channels[name] = f"C{len(self.channels) + 1:08d}"
+        return self.channels[name]
+
+    def handle(self, method, path, params):
+        api_method = path.rsplit("/", 1)[-1]
+        with self.lock:
+            if api_method == "chat.postMessage":
+                channel_id = self._channel_id(params.get("channel", "general"))
+                message = {"channel": channel_id, "text": params.get("text", ""), "ts": f"{time.time():.6f}",
+                           "received": time.monotonic()}
+                self.messages.append(message)
+                return 200, {"ok": True, "channel": channel_id, "ts": message["ts"]}
+            if api_method == "conversations.list":
+                channels = [{"id": channel_id, "name": name} for name, channel_id in self.channels.items()]
+                return 200, {"ok": True, "channels": channels, "response_metadata": {"next_cursor": ""}}
+            if api_method == "conversations.history":
+                messages = [{"ts": message["ts"], "text": message["text"]}
+                            for message in self.messages if message["channel"] == params.get("channel")]
+                return 200, {"ok": True, "messages": messages[::-1][:int(params.get("limit", 100))], "has_more": False}
+            if api_method == "chat.delete":
+                before = len(self.messages)
+                self.messages = [message for message in self.messages
+                                 if (message["channel"], message["ts"]) != (params.get("channel"), params.get("ts"))]
+                if len(self.messages) == before:
+                    return 200, {"ok": False, "error": "message_not_found"}
+                return 200, {"ok": True}
+        return 200, {"ok": False, "error": "unknown_method"}
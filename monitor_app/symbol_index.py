@@ -0,0 +1,268 @@
+import bisect
+import json
+import mmap
+import os
+import re
+import tempfile
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+TOKEN_LIST_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docs", "coingecko_token_list.json")
+
+# Quote currencies stripped from TradingView pair names, longest first
+QUOTE_CURRENCIES = ("USDT", "USDC", "BUSD", "TUSD", "USD", "EUR", "TRY", "KCS", "BTC", "ETH")
+
+# Ids of bridged or wrapped copies that share the ticker of the original asset
+DERIVATIVE_MARKERS = ("wormhole", "bridged", "wrapped", "binance-peg", "-peg-", "-iou")
+
+PAIR_PATTERN = re.compile(r"^(?:[A-Z0-9_]+:)?(?P<pair>[A-Z0-9]+?)(?:\.(?P<leverage>\d+[LS]))?$")
+
+MAGIC = b"CGSYMIDX"
+ALIGNMENT = 8
+
+
+@dataclass
+class PairResolution:
+    """ Dataclass that holds the CoinGecko ids matching a TradingView pair name
+    """
+    pair: str
+    base: str
+    quote: str
+    leverage: str = None
+    ids: list = field(default_factory=list)
+    coin_id: str = None
+
+    @property
+    def is_ambiguous(self):
+        return self.coin_id is None and len(self.ids) > 1
+
+
+def _hash(key):
+    return zlib.crc32(key)
+
+
+class SymbolIndex:
+    """Compact, memory-mapped index over docs/coingecko_token_list.json.
+
+    The token list is compiled once into a binary cache next to it (rebuilt when
+    the list changes) holding one string blob, offset arrays, id and symbol sort
+    orders and two open addressing hash tables. Loading it maps the file without
+    parsing the JSON, id and symbol lookups are O(1) hash probes and prefix
+    searches are binary searches over the sort orders.
+
+    Args:
+        buffer (mmap.mmap | bytes): Compiled index contents
+    """
+
+    def __init__(self, buffer) -> None:
+        self._buffer = buffer
+        header_length = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], "little")
+        self.header = json.loads(bytes(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_length]))
+        for name, (dtype, offset, length) in self.header["arrays"].items():
+            setattr(self, name, np.frombuffer(buffer, dtype=dtype, count=length, offset=offset))
+        self.n_entries = self.header["entries"]
+        self.id_mask = self.id_slots.shape[0] - 1
+        self.symbol_mask = self.symbol_slots.shape[0] - 1
+
+    # Building / loading
+
+    @staticmethod
+    def _table(keys, values):
+        size = 1 << max(4, (2 * len(keys) - 1).bit_length())
+        slots = np.full(size, -1, dtype=np.int32)
+        for key, value in zip(keys, values):
+            slot = _hash(key) & (size - 1)
+            while slots[slot] != -1:
+                slot = (slot + 1) & (size - 1)
+            slots[slot] = value
+        return slots
+
+    @classmethod
+    def compile(cls, tokens, source_stamp=None):
+        """Compiles a token list (dicts with id, symbol and name) into the binary index format."""
+        ids = [token["id"].encode() for token in tokens]
+        symbols = [token["symbol"].lower().encode() for token in tokens]
+        names = [token.get("name", "").encode() for token in tokens]
+        strings = ids + symbols + names
+        offsets = np.zeros(len(strings) + 1, dtype=np.uint32)
+        offsets[1:] = np.cumsum([len(value) for value in strings])
+        blob = np.frombuffer(b"".join(strings), dtype=np.uint8)
+
+        n_entries = len(tokens)
+        id_order = np.array(sorted(range(n_entries), key=lambda idx: ids[idx]), dtype=np.int32)
+        symbol_order = np.array(sorted(range(n_entries), key=lambda idx: (symbols[idx], ids[idx])), dtype=np.int32)
+        # Symbol groups: position of the first entry of each distinct symbol in symbol_order and its size
+        group_starts = [pos for pos in range(n_entries) if pos == 0 or symbols[symbol_order[pos]] != symbols[symbol_order[pos - 1]]]
+        group_sizes = np.diff(group_starts + [n_entries]).astype(np.int32)
+
+        arrays = {
+            "offsets": offsets,
+            "blob": blob,
+            "id_order": id_order,
+            "symbol_order": symbol_order,
+            "group_starts": np.array(group_starts, dtype=np.int32),
+            "group_sizes": group_sizes,
+            "id_slots": cls._table(ids, range(n_entries)),
+            "symbol_slots": cls._table([symbols[symbol_order[start]] for start in group_starts], range(len(group_starts))),
+        }
+
+        header = {"entries": n_entries, "source": source_stamp, "arrays": {}}
+        # Two passes: the header length decides the offset of the first array
+        for _ in range(2):
+            position = len(MAGIC) + 8 + len(json.dumps(header).encode())
+            for name, array in arrays.items():
+                position += -position % ALIGNMENT
+                header["arrays"][name] = [array.dtype.str, position, int(array.shape[0])]
+                position += array.nbytes
+        header_bytes = json.dumps(header).encode()
+
+        output = bytearray(MAGIC + len(header_bytes).to_bytes(8, "little") + header_bytes)
+        for name, array in arrays.items():
+            output += b"\0" * (header["arrays"][name][1] - len(output))
+            output += array.tobytes()
+        return bytes(output)
+
+    @classmethod
+    def load(cls, source=TOKEN_LIST_PATH, cache=None):
+        """Maps the compiled cache of ``source``, compiling it first when it is missing or outdated."""
+        cache = cache or os.path.splitext(source)[0] + ".idx"
+        stat = os.stat(source)
+        stamp = [stat.st_size, int(stat.st_mtime)]
+        index = cls._open(cache)
+        if index is None or index.header.get("source") != stamp:
+            with open(source, "r") as js_file:
+                compiled = cls.compile(json.load(js_file), source_stamp=stamp)
+            # A unique temporary file per writer, so shard workers compiling at the same time do not clobber each other
+            handle, temporary = tempfile.mkstemp(prefix=".symbol-index-", suffix=".tmp", dir=os.path.dirname(cache) or ".")
+            try:
+                with os.fdopen(handle, "wb") as cache_file:
+                    cache_file.write(compiled)
+                os.replace(temporary, cache)
+            except BaseException:
+                os.remove(temporary)
+                raise
+            index = cls._open(cache)
+        return index
+
+    @classmethod
+    def _open(cls, path):
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as cache_file:
+            buffer = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(MAGIC)] != MAGIC:
+            return None
+        return cls(buffer)
+
+    # Lookups
+
+    def _string(self, kind, entry):
+        """Bytes of the id (kind 0), symbol (kind 1) or name (kind 2) of an entry."""
+        position = kind * self.n_entries + entry
+        return self.blob[self.offsets[position]:self.offsets[position + 1]].tobytes()
+
+    def _entry(self, entry):
+        return {"id": self._string(0, entry).decode(), "symbol": self._string(1, entry).decode(), "name": self._string(2, entry).decode()}
+
+    def _find_id(self, coin_id):
+        key = coin_id.encode()
+        slot = _hash(key) & self.id_mask
+        while self.id_slots[slot] != -1:
+            entry = int(self.id_slots[slot])
+            if self._string(0, entry) == key:
+                return entry
+            slot = (slot + 1) & self.id_mask
+        return -1
+
+    def _find_group(self, symbol):
+        key = symbol.lower().encode()
+        slot = _hash(key) & self.symbol_mask
+        while self.symbol_slots[slot] != -1:
+            group = int(self.symbol_slots[slot])
+            if self._string(1, int(self.symbol_order[self.group_starts[group]])) == key:
+                return group
+            slot = (slot + 1) & self.symbol_mask
+        return -1
+
+    def __contains__(self, coin_id):
+        return self._find_id(coin_id) >= 0
+
+    def __len__(self):
+        return self.n_entries
+
+    def __iter__(self):
+        return (self._string(0, entry).decode() for entry in range(self.n_entries))
+
+    def get(self, coin_id):
+        """Token of a CoinGecko id (dict with id, symbol and name) or None."""
+        entry = self._find_id(coin_id)
+        return self._entry(entry) if entry >= 0 else None
+
+    def ids_for_symbol(self, symbol):
+        """Every CoinGecko id that uses a ticker symbol."""
+        group = self._find_group(symbol)
+        if group < 0:
+            return []
+        start = int(self.group_starts[group])
+        return [self._string(0, int(entry)).decode() for entry in self.symbol_order[start:start + int(self.group_sizes[group])]]
+
+    def preferred_id(self, symbol):
+        """The id of a symbol once bridged/wrapped copies are left out, None when still ambiguous."""
+        ids = self.ids_for_symbol(symbol)
+        if len(ids) > 1:
+            ids = [coin_id for coin_id in ids if not any(marker in coin_id for marker in DERIVATIVE_MARKERS)]
+        return ids[0] if len(ids) == 1 else None
+
+    def prefix_search(self, prefix, by="id", limit=20):
+        """Ids whose id (by="id") or symbol (by="symbol") starts with ``prefix``."""
+        kind, order = (0, self.id_order) if by == "id" else (1, self.symbol_order)
+        key = prefix.encode() if by == "id" else prefix.lower().encode()
+        start = bisect.bisect_left(order, key, key=lambda entry: self._string(kind, int(entry)))
+        results = []
+        for entry in order[start:]:
+            if len(results) >= limit or not self._string(kind, int(entry)).startswith(key):
+                break
+            results.append(self._string(0, int(entry)).decode())
+        return results
+
+    def suggest(self, text, limit=5):
+        """Close matches of an unknown id: ids of the ticker ``text`` or ids sharing its longest known prefix."""
+        ids = self.ids_for_symbol(text)
+        for length in range(len(text) - 1, 2, -1):
+            if ids:
+                break
+            ids = self.prefix_search(text[:length], limit=limit)
+        return ids[:limit]
+
+    def ambiguous_symbols(self, min_ids=2):
+        """Symbol -> ids of every ticker shared by at least ``min_ids`` ids."""
+        symbols = [self._string(1, int(self.symbol_order[self.group_starts[group]])).decode()
+                   for group in np.flatnonzero(self.group_sizes >= min_ids)]
+        return {symbol: self.ids_for_symbol(symbol) for symbol in symbols}
+
+    def resolve_pair(self, pair):
+        """Maps a TradingView pair name such as BTCUSDT, KUCOIN:BTCUSDT or ETHUSDT.3L to CoinGecko ids.
+
+        Leveraged tokens (ETHUSDT.3L) resolve to the ids of their underlying asset
+        with ``leverage`` set, their price is not the price of that asset.
+        """
+        match = PAIR_PATTERN.match(pair.upper())
+        if match is None:
+            return PairResolution(pair, base="", quote="")
+        name = match.group("pair")
+        base, quote = name, ""
+        for currency in QUOTE_CURRENCIES:
+            if name.endswith(currency) and len(name) > len(currency):
+                base, quote = name[:-len(currency)], currency
+                break
+        return PairResolution(
+            pair, base=base, quote=quote, leverage=match.group("leverage"),
+            ids=self.ids_for_symbol(base), coin_id=self.preferred_id(base),
+        )
+
+    def validate(self, coin_ids):
+        """Returns the configured ids that are not in the token list."""
+        return [coin_id for coin_id in coin_ids if self._find_id(coin_id) < 0]
@@ -0,0 +1,224 @@
+"""Structured tick log: compact JSONL records written by a background thread.
+
+    python -m monitor_app.tick_log logs/ticks.jsonl
+    python -m monitor_app.tick_log logs/ticks.jsonl --symbols BTCUSDT,ETHUSDT > main.log
+
+Every file starts with a ``symbols`` record (symbol names and value columns)
+followed by ``tick`` records holding the epoch milliseconds, the threshold and
+the values as row arrays in the symbol order. With ``sample_unchanged`` a tick
+only carries the rows that changed since the previous one (``rows`` holds their
+positions), a full keyframe is written every ``keyframe_every`` ticks. The
+reader renders the records in the former ``df.to_string()`` log format.
+"""
+import argparse
+import datetime
+import glob
+import itertools
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+class TickLogWriter:
+    """Queues ticks on the monitoring thread and writes them as JSONL records on a writer thread.
+
+    Args:
+        path (str): Log file path, rotated files get a timestamp suffix (ticks.20221123-005337-123.jsonl)
+        max_bytes (int): Rotates the file once it grows past this size
+        rotate_seconds (int, optional): Rotates the file once it is older than this many seconds
+        backup_count (int, optional): Number of rotated files kept, all of them when omitted
+        sample_unchanged (bool): Leaves the rows that did not change since the previous tick out
+        keyframe_every (int): Ticks between full records when ``sample_unchanged`` is set
+        queue_size (int): Pending ticks after which new ticks are dropped (counted in ``dropped``)
+    """
+
+    def __init__(self, path="logs/ticks.jsonl", max_bytes=64 * 1024 ** 2, rotate_seconds=24 * 60 * 60,
+                 backup_count=None, sample_unchanged=False, keyframe_every=240, queue_size=1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.sample_unchanged = sample_unchanged
+        self.keyframe_every = keyframe_every
+        self.dropped = 0
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._size = 0
+        self._opened = None
+        self._index = None
+        self._columns = None
+        self._last = None
+        self._since_keyframe = 0
+        self._thread = threading.Thread(target=self._run, name="tick-log-writer", daemon=True)
+        self._thread.start()
+
+    def log_tick(self, df, threshold=None, timestamp=None):
+        """Queues one tick without blocking; the copy of the values is the only work done by the caller.
+
+        Args:
+            df (pd.DataFrame): Tick with one row per symbol
+            threshold (float, optional): Threshold the tick was evaluated with
+            timestamp (float, optional): Epoch seconds of the tick, now when omitted
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        values = df.to_numpy(dtype=np.float64, copy=True)
+        try:
+            self._queue.put_nowait((timestamp, threshold, df.index, df.columns, values))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=None):
+        """Writes the pending ticks and stops the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+            except Exception:
+                logger.exception("Tick could not be written to %s", self.path)
+            if self._file is not None and self._queue.empty():
+                self._file.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _emit(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self._size += len(line)
+
+    def _write(self, timestamp, threshold, index, columns, values):
+        if self._file is None or self._should_rotate(timestamp):
+            self._rotate(timestamp)
+        if self._index is None or not index.equals(self._index) or not columns.equals(self._columns):
+            self._index, self._columns, self._last = index, columns, None
+            self._emit({"type": "symbols", "symbols": index.tolist(), "columns": columns.tolist()})
+
+        record = {"type": "tick", "ts": int(timestamp * 1000), "threshold": threshold}
+        if self.sample_unchanged and self._last is not None and self._since_keyframe < self.keyframe_every:
+            unchanged = (values == self._last) | (np.isnan(values) & np.isnan(self._last))
+            changed = np.flatnonzero(~unchanged.all(axis=1))
+            record["rows"] = changed.tolist()
+            record["values"] = values[changed].tolist()
+            self._since_keyframe += 1
+        else:
+            record["values"] = values.tolist()
+            self._since_keyframe = 0
+        self._last = values
+        self._emit(record)
+        self.written += 1
+
+    def _should_rotate(self, timestamp):
+        if self._size >= self.max_bytes:
+            return True
+        return self.rotate_seconds is not None and timestamp - self._opened >= self.rotate_seconds
+
+    def _rotate(self, timestamp):
+        root, extension = os.path.splitext(self.path)
+        if self._file is not None:
+            self._file.close()
+            # Millisecond suffix, and a counter when a file of the same millisecond exists (both sort after the plain name)
+            suffix = datetime.datetime.fromtimestamp(self._opened).strftime("%Y%m%d-%H%M%S-%f")[:-3]
+            target = f"{root}.{suffix}{extension}"
+            for counter in itertools.count(1):
+                if not os.path.exists(target):
+                    break
+                target = f"{root}.{suffix}_{counter:02d}{extension}"
+            os.replace(self.path, target)
+            if self.backup_count is not None:
+                for expired in rotated_files(self.path)[:-self.backup_count or None]:
+                    os.remove(expired)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        self._opened = timestamp
+        # Every file starts with its own symbol table and keyframe
+        self._index = self._columns = self._last = None
+
+
+def rotated_files(path):
+    """Rotated files of a tick log path, oldest first."""
+    root, extension = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(root)}.*{extension}"))
+
+
+def read_ticks(path, symbols=None):
+    """Reads a structured tick log.
+
+    Args:
+        path (str): Tick log file
+        symbols (list, optional): Symbols to keep, all of them when omitted
+
+    Yields:
+        tuple: (epoch milliseconds, threshold, pd.DataFrame with one row per symbol)
+    """
+    index = columns = last = None
+    with open(path, "r", encoding="utf-8") as log_file:
+        for line in log_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line of a file that is still being written
+                continue
+            if record["type"] == "symbols":
+                index, columns, last = pd.Index(record["symbols"]), record["columns"], None
+                continue
+            values = np.array(record["values"], dtype=np.float64).reshape(-1, len(columns))
+            if "rows" in record:
+                if last is None:
+                    continue
+                current = last.copy()
+                current[record["rows"]] = values
+            else:
+                current = values
+            last = current
+            df = pd.DataFrame(current, index=index, columns=columns)
+            if symbols is not None:
+                df = df[df.index.isin(symbols)]
+            yield record["ts"], record["threshold"], df
+
+
+def render(path, output=None, symbols=None, logger_name="monitor_app.utils"):
+    """Writes a structured tick log in the former ``Current threshold`` + ``df.to_string()`` text format."""
+    output = output or sys.stdout
+    for millis, threshold, df in read_ticks(path, symbols=symbols):
+        created = datetime.datetime.fromtimestamp(millis / 1000)
+        output.write(f"{created:%Y-%m-%d %H:%M:%S},{millis % 1000:03d} : INFO : {logger_name} : "
+                     f"Current threshold: {threshold}\n{df.to_string()}\n")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Render a structured tick log in the human readable log format.")
+    parser.add_argument("paths", nargs="+", help="Tick log files, in order")
+    parser.add_argument("--symbols", help="Comma separated symbols to show")
+    options = parser.parse_args(args)
+
+    symbols = options.symbols.split(",") if options.symbols else None
+    try:
+        for path in options.paths:
+            render(path, symbols=symbols)
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class TickStore:
+    """Append-only, columnar tick store with daily segments.
+
+    Every segment is a directory named after its (UTC) day that holds one raw,
+    fixed-width file per column, so readers can memory-map the files and slice
+    them without parsing anything::
+
+        <root>/2022-11-23/meta.json     column names
+        <root>/2022-11-23/symbols.json  symbol of every symbol id
+        <root>/2022-11-23/ts.i8         int64 epoch milliseconds of every row
+        <root>/2022-11-23/symbol.i4     int32 symbol id of every row
+        <root>/2022-11-23/<column>.f8   float64 values of every row
+        <root>/2022-11-23/index.i8      (epoch milliseconds, rows after the tick) of every appended tick
+
+    The index entry of a tick is written after its rows, so a tick without an
+    index entry was not completely written and is dropped when the segment is reopened.
+
+    Args:
+        root (str): Directory of the store
+        columns (list, optional): Value columns, taken from the first appended frame when omitted
+    """
+
+    def __init__(self, root, columns=None) -> None:
+        self.root = root
+        self.columns = list(columns) if columns is not None else None
+        self.segment = None
+        self._files = {}
+        self._symbol_ids = {}
+        self._rows = 0
+        self._last_index = None
+        self._last_ids = None
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def _to_millis(timestamp):
+        if timestamp is None:
+            timestamp = datetime.datetime.now(tz=datetime.timezone.utc)
+        if isinstance(timestamp, (int, float, np.integer, np.floating)):
+            return int(timestamp * 1000)
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize(datetime.timezone.utc)
+        return int(timestamp.timestamp() * 1000)
+
+    @staticmethod
+    def _segment_name(millis):
+        return datetime.datetime.fromtimestamp(millis / 1000, tz=datetime.timezone.utc).strftime("%Y-%m-%d")
+
+    def _segment_path(self, segment, name=""):
+        return os.path.join(self.root, segment, name)
+
+    def _open_segment(self, segment):
+        self.close()
+        os.makedirs(self._segment_path(segment), exist_ok=True)
+        meta_path = self._segment_path(segment, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as meta_file:
+                self.columns = json.load(meta_file)["columns"]
+            with open(self._segment_path(segment, "symbols.json"), "r") as symbols_file:
+                self._symbol_ids = {symbol: idx for idx, symbol in enumerate(json.load(symbols_file))}
+        else:
+            with open(meta_path, "w") as meta_file:
+                json.dump({"columns": self.columns}, meta_file)
+            self._symbol_ids = {}
+            self._write_symbols(segment)
+
+        names = ["ts.i8", "symbol.i4", "index.i8"] + [f"{column}.f8" for column in self.columns]
+        self._rows = self._repair(segment, names)
+        self._files = {name: open(self._segment_path(segment, name), "ab") for name in names}
+        self.segment = segment
+
+    def _repair(self, segment, names):
+        """Truncates the files of a reopened segment to the last completely written tick."""
+        index_path = self._segment_path(segment, "index.i8")
+        index = np.fromfile(index_path, dtype=np.int64) if os.path.exists(index_path) else np.empty(0, dtype=np.int64)
+        ticks = index.shape[0] // 2
+        rows = int(index[2 * ticks - 1]) if ticks else 0
+        for name in names:
+            path = self._segment_path(segment, name)
+            # File names end with the item width in bytes: ts.i8, symbol.i4, <column>.f8
+            size = ticks * 16 if name == "index.i8" else rows * int(name[-1])
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        return rows
+
+    def _write_symbols(self, segment):
+        path = self._segment_path(segment, "symbols.json")
+        with open(path + ".tmp", "w") as symbols_file:
+            json.dump(list(self._symbol_ids), symbols_file)
+        os.replace(path + ".tmp", path)
+
+    def append(self, df, timestamp=None):
+        """Appends one tick (a frame indexed by symbol) to the segment of its day.
+
+        Args:
+            df (pd.DataFrame): Tick indexed by symbol; columns outside the store schema are ignored
+            timestamp (datetime.datetime | float, optional): Tick time, the wall clock when omitted
+        """
+        millis = self._to_millis(timestamp)
+        if self.columns is None:
+            self.columns = df.select_dtypes("number").columns.tolist()
+        segment = self._segment_name(millis)
+        if segment != self.segment:
+            self._open_segment(segment)
+
+        if self._last_index is not None and df.index.equals(self._last_index):
+            symbol_ids = self._last_ids
+        else:
+            symbols = df.index.astype(str)
+            new_symbols = [symbol for symbol in symbols.unique() if symbol not in self._symbol_ids]
+            if new_symbols:
+                for symbol in new_symbols:
+                    self._symbol_ids[symbol] = len(self._symbol_ids)
+                self._write_symbols(segment)
+            symbol_ids = symbols.map(self._symbol_ids).to_numpy(dtype=np.int32)
+            self._last_index, self._last_ids = df.index, symbol_ids
+
+        rows = len(df)
+        self._files["ts.i8"].write(np.full(rows, millis, dtype=np.int64).tobytes())
+        self._files["symbol.i4"].write(symbol_ids.tobytes())
+        values = df.reindex(columns=self.columns).to_numpy(dtype=np.float64, na_value=np.nan)
+        for idx, column in enumerate(self.columns):
+            self._files[f"{column}.f8"].write(np.ascontiguousarray(values[:, idx]).tobytes())
+        for name, file in self._files.items():
+            if name != "index.i8":
+                file.flush()
+        self._rows += rows
+        self._files["index.i8"].write(np.array([millis, self._rows], dtype=np.int64).tobytes())
+        self._files["index.i8"].flush()
+
+    def close(self):
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+        self._last_index = None
+        self.segment = None
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(self._segment_path(name, "meta.json")))
+
+    def _map(self, segment, name, dtype):
+        path = self._segment_path(segment, name)
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def read(self, start=None, end=None, symbols=None, columns=None):
+        """Loads the rows of a time range, optionally for a subset of symbols and columns.
+
+        Only the segments of the requested days are opened, the row range is found
+        with a binary search on the time index and just the requested columns are
+        sliced out of the memory-mapped files.
+
+        Returns:
+            pd.DataFrame: Long frame with timestamp, symbol and the value columns
+        """
+        start_millis = self._to_millis(start) if start is not None else None
+        end_millis = self._to_millis(end) if end is not None else None
+        frames = []
+        for segment in self.segments():
+            if start_millis is not None and segment < self._segment_name(start_millis):
+                continue
+            if end_millis is not None and segment > self._segment_name(end_millis):
+                continue
+            with open(self._segment_path(segment, "meta.json"), "r") as meta_file:
+                segment_columns = json.load(meta_file)["columns"]
+            with open(self._segment_path(segment, "symbols.json"), "r") as symbols_file:
+                segment_symbols = np.array(json.load(symbols_file), dtype=object)
+
+            index = self._map(segment, "index.i8", np.int64)
+            # Only ticks with an index entry are complete
+            index = index[:index.shape[0] // 2 * 2].reshape(-1, 2)
+            first = 0 if start_millis is None else int(np.searchsorted(index[:, 0], start_millis, side="left"))
+            last = index.shape[0] if end_millis is None else int(np.searchsorted(index[:, 0], end_millis, side="right"))
+            first_row = int(index[first - 1, 1]) if first > 0 else 0
+            last_row = int(index[last - 1, 1]) if last > 0 else 0
+            if first_row >= last_row:
+                continue
+            timestamps = self._map(segment, "ts.i8", np.int64)
+
+            symbol_ids = self._map(segment, "symbol.i4", np.int32)[first_row:last_row]
+            mask = slice(None)
+            if symbols is not None:
+                wanted = np.flatnonzero(np.isin(segment_symbols, list(symbols)))
+                mask = np.isin(symbol_ids, wanted)
+            data = {
+                "timestamp": pd.to_datetime(np.asarray(timestamps[first_row:last_row][mask]), unit="ms", utc=True),
+                "symbol": segment_symbols[np.asarray(symbol_ids[mask])],
+            }
+            for column in (columns or segment_columns):
+                if column in segment_columns:
+                    data[column] = np.asarray(self._map(segment, f"{column}.f8", np.float64)[first_row:last_row][mask])
+            frames.append(pd.DataFrame(data))
+
+        if not frames:
+            return pd.DataFrame(columns=["timestamp", "symbol"] + list(columns or self.columns or []))
+        return pd.concat(frames, ignore_index=True)
@@ -4,54 +4,107 @@ import os
 from dataclasses import dataclass
 
 import pytz
-from dotenv import load_dotenv
 
-from .slack_api import SlackAgent
+from .metrics import ALERTS
+from .settings import MonitorSettings
 import logging
 
-# Enable .env file values
-load_dotenv()
-
 class Logger:
     @staticmethod
-    def configure():
-        logger = logging.getLogger(__name__)
-        logger.setLevel(logging.INFO)
-        file_handler = logging.FileHandler('logs/main.log')
+    def add_file_handler(logger, path):
+        """Adds a file handler for ``path`` unless the logger already writes to it."""
+        path = os.path.abspath(path)
+        if any(isinstance(handler, logging.FileHandler) and handler.baseFilename == path for handler in logger.handlers):
+            return
+        file_handler = logging.FileHandler(path)
         formatter = logging.Formatter(
             '%(asctime)s : %(levelname)s : %(name)s : %(message)s')
         file_handler.setFormatter(formatter)
         # add file handler to logger
         logger.addHandler(file_handler)
+
+    @staticmethod
+    def configure():
+        logger = logging.getLogger(__name__)
+        logger.setLevel(logging.INFO)
+        Logger.add_file_handler(logger, 'logs/main.log')
         Logger.logger = logger
 
 
 @dataclass
 class Configs:
     """ Dataclass that holds configs values
+
+    The environment dependent values are filled by ``load`` when a monitor is
+    built, nothing is read or connected at import time.
     """
-    # .env file values
-    THRESHOLD = float(os.environ["THRESHOLD"])
+    # .env file values, set by Configs.load()
+    THRESHOLD = None
+    settings = None
 
     # Constant variables
     scan_url = "https://scanner.tradingview.com/crypto/scan"
     slack_channel = "coingecko"
     timezone = pytz.timezone("Europe/Istanbul")
 
-    # Request payloads and headers JSON file
-    with open("request_parameters.json", "r") as js_file:
-        request_parameters = json.load(js_file)
+    # Threshold increase between 01:20 and 06:00
+    quiet_hours_bump = 5
+
+    # Scan frames are persisted to the columnar tick store when a directory is given, set by Configs.load()
+    tick_store_dir = None
+
+    # Tick log of the scans (see MonitorSettings.tick_log_mode), set by Configs.load()
+    tick_log_mode = "text"
+    tick_log_path = "logs/ticks.jsonl"
+    tick_log_sample_unchanged = False
+
+    # Request payloads and headers JSON file, read by Configs.load()
+    request_parameters_path = "request_parameters.json"
+    request_parameters = None
 
     # Control variables
     instance_started = True
     is_deleted = False
 
-    # Slack Instance
-    SlackAgentInstance = SlackAgent()
-
-    # Placeholder time values to enable first alerts
-    minute_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(timezone) - datetime.timedelta(minutes=6)
-    hourly_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(timezone) - datetime.timedelta(hours=1, minutes=1)
+    # Slack Instance, built on first use by Configs.slack_agent()
+    SlackAgentInstance = None
+
+    @classmethod
+    def load(cls, settings=None):
+        """Reads the threshold, the tick store and log settings and the request parameters of a run.
+
+        Args:
+            settings (MonitorSettings, optional): Settings of the run, read from the environment when omitted
+
+        Returns:
+            type: Configs
+        """
+        settings = settings or MonitorSettings.from_env("request")
+        cls.settings = settings
+        cls.THRESHOLD = settings.threshold
+        cls.scan_url = settings.scan_url
+        cls.tick_store_dir = settings.tick_store_dir
+        cls.tick_log_mode = settings.tick_log_mode
+        cls.tick_log_path = settings.tick_log_path
+        cls.tick_log_sample_unchanged = settings.tick_log_sample_unchanged
+        with open(cls.request_parameters_path, "r") as js_file:
+            cls.request_parameters = json.load(js_file)
+        return cls
+
+    @classmethod
+    def base_threshold(cls):
+        """Configured threshold, read from the environment when no monitor loaded it."""
+        if cls.THRESHOLD is None:
+            cls.THRESHOLD = MonitorSettings.from_env("request").threshold
+        return cls.THRESHOLD
+
+    @classmethod
+    def slack_agent(cls):
+        """Shared SlackAgent, the Slack client is only imported when the first message is sent."""
+        if cls.SlackAgentInstance is None:
+            from .slack_api import SlackAgent
+            cls.SlackAgentInstance = SlackAgent(cls.settings or MonitorSettings.from_env("request"))
+        return cls.SlackAgentInstance
 
 
 class UtilsManager(Configs):
@@ -62,55 +115,87 @@ class UtilsManager(Configs):
     """
 
     @staticmethod
-    def calculate_stats(df, df_timing, threshold, enable_notification=False):
-        now = datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
-        if not (now > now.replace(second=0, hour=1, minute=30) and now < now.replace(second=5, hour=1, minute=30)):
-            last_5_min = df.loc[df["change_5min"].abs() > threshold, "change_5min"]
-            last_1_hour = df.loc[df["change_1h"].abs() > threshold, "change_1h"]
-            df_timing_5_min = last_5_min.to_frame().merge(df_timing[["5min_cooldown"]], left_index=True, right_index=True, how="left")
-            df_timing_1_hour = last_1_hour.to_frame().merge(df_timing[["1h_cooldown"]], left_index=True, right_index=True, how="left")
-            df_timing_5_min["5min_cooldown"] = (now - df_timing_5_min["5min_cooldown"]).dt.total_seconds()
-            df_timing_5_min["5min_cooldown"] = (df_timing_5_min["5min_cooldown"] >= (60 * 5) + 15)
-            df_timing_1_hour["1h_cooldown"] = (now - df_timing_1_hour["1h_cooldown"]).dt.total_seconds()
-            df_timing_1_hour["1h_cooldown"] = (df_timing_1_hour["1h_cooldown"] >= (60 * 60) + 15)
-            last_5_min_table = df_timing_5_min.loc[(df_timing_5_min["change_5min"].abs() > threshold) & (df_timing_5_min["5min_cooldown"])]
-            last_1_hour_table = df_timing_1_hour.loc[(df_timing_1_hour["change_1h"].abs() > threshold) & (df_timing_1_hour["1h_cooldown"])]
-
-            if last_5_min_table.shape[0] > 0:
-                last_5_min_table = last_5_min_table["change_5min"].map(
-                    lambda x: f"%{round(abs(x), 1)} düştü:arrow_down:" if max(0, x) == 0 else f"%{round(abs(x), 1)} arttı:arrow_up:")
-                entry_edit = (":right_anger_bubble:*SON 5 DAKİKADA*\n" + last_5_min_table.to_string() + "\n" + " - " * 15)
-                new_minute_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
-                new_hourly_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
-                df_timing.loc[last_5_min_table.index, "5min_cooldown"] = new_minute_cooldown
-                df_timing.loc[last_5_min_table.index, "1h_cooldown"] = new_hourly_cooldown
-                print(entry_edit)
-                if enable_notification:
-                    Configs.SlackAgentInstance.send_alert(
-                        text=entry_edit, channel=Configs.slack_channel
-                    )
+    def current_threshold(now=None, threshold=None, bump=None):
+        """Returns the alert threshold, raised by ``bump`` during the quiet hours between 01:20 and 06:00.
+
+        Args:
+            now (datetime.datetime, optional): Time in Configs.timezone, the wall clock when omitted
+            threshold (float, optional): Base threshold, Configs.THRESHOLD when omitted
+            bump (float, optional): Quiet hours increase, Configs.quiet_hours_bump when omitted
+        """
+        now = now or datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
+        threshold = Configs.base_threshold() if threshold is None else threshold
+        bump = Configs.quiet_hours_bump if bump is None else bump
+        if not (now > now.replace(second=0, hour=1, minute=20) and now < now.replace(second=0, hour=6, minute=0)):
+            return threshold
+        return threshold + bump
 
-            elif last_1_hour_table.shape[0] > 0:
-                last_1_hour_table = last_1_hour_table["change_1h"].map(
-                    lambda x: f"%{round(abs(x), 1)} düştü:arrow_down:" if max(0, x) == 0 else f"%{round(abs(x), 1)} arttı:arrow_up:")
-                entry_edit = (":right_anger_bubble:*SON 1 SAATTE*\n" + last_1_hour_table.to_string() + "\n" + " - " * 15)
-                new_hourly_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
-                new_minute_cooldown = datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
-                df_timing.loc[last_1_hour_table.index, "1h_cooldown"] = new_hourly_cooldown
-                df_timing.loc[last_1_hour_table.index, "5min_cooldown"] = new_minute_cooldown
-                print(entry_edit)
+    @staticmethod
+    def is_purge_time(now):
+        """Alerts are paused for the 5 seconds at 01:30 in which the channel is purged."""
+        return now > now.replace(second=0, hour=1, minute=30) and now < now.replace(second=5, hour=1, minute=30)
+
+    @staticmethod
+    def calculate_stats(df, evaluator, threshold, enable_notification=False, positions=None):
+        """Sends the alerts of a tick and purges the channel once a day.
+
+        Args:
+            df (pd.DataFrame): Tick indexed by symbol with change_5min and change_1h columns
+            evaluator (AlertEvaluator): Evaluator holding the per-symbol cooldowns
+            threshold (float): Alert threshold in percent
+            enable_notification (bool): Post the alerts to Slack
+            positions (np.ndarray, optional): Cooldown slots of the rows, see AlertEvaluator.evaluate
+
+        Returns:
+            AlertEvaluator: The evaluator with updated cooldowns
+        """
+        now = datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
+        if not UtilsManager.is_purge_time(now):
+            for alert in evaluator.evaluate(df, threshold, now=now, positions=positions):
+                print(alert.text)
+                ALERTS.labels(alert.window.column).inc(len(alert.symbols))
                 if enable_notification:
-                    Configs.SlackAgentInstance.send_alert(
-                        text=entry_edit, channel=Configs.slack_channel
+                    Configs.slack_agent().send_alert(
+                        text=alert.text, channel=Configs.slack_channel
                     )
             Configs.is_deleted = False
 
         elif not Configs.is_deleted:
-            Configs.SlackAgentInstance.delete_messages(
+            Configs.slack_agent().delete_messages(
                 channel=Configs.slack_channel)
             Configs.is_deleted = True
 
         else:
             pass
 
-        return df_timing
+        return evaluator
+
+    @staticmethod
+    def dispatch_rules(df, engine, enable_notification=False):
+        """Sends the alerts of every rule set to its channel and purges the channels once a day.
+
+        Args:
+            df (pd.DataFrame): Tick indexed by symbol with the window columns of the engine
+            engine (RuleEngine): Rule sets with their per-symbol cooldowns
+            enable_notification (bool): Post the alerts to Slack
+
+        Returns:
+            RuleEngine: The engine with updated cooldowns
+        """
+        now = datetime.datetime.now(tz=pytz.UTC).astimezone(Configs.timezone)
+        if not UtilsManager.is_purge_time(now):
+            for alert in engine.evaluate(df, now=now):
+                print(f"[{alert.rule_set.name}] {alert.text}")
+                ALERTS.labels(alert.window.column).inc(len(alert.symbols))
+                if enable_notification:
+                    Configs.slack_agent().send_alert(
+                        text=alert.text, channel=alert.rule_set.channel
+                    )
+            Configs.is_deleted = False
+
+        elif not Configs.is_deleted:
+            for channel in engine.channels:
+                Configs.slack_agent().delete_messages(channel=channel)
+            Configs.is_deleted = True
+
+        return engine
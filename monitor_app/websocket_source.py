@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import deque
+
+import pandas as pd
+import websockets
+from websockets.exceptions import WebSocketException
+
+from .async_fetcher import get_fetcher
+from .exceptions import FetchError
+from .sources import TickSource
+
+
+logger = logging.getLogger(__name__)
+
+
+class KucoinTickerSource(TickSource):
+    """Push-based tick source reading a KuCoin-style ``/market/ticker`` WebSocket feed.
+
+    Every ticker message is turned into a one-row tick and handed to ``on_tick``
+    right away. The 5 minute and 1 hour changes are derived from the streamed
+    prices. The connection is re-established with exponential backoff and the
+    topic is subscribed again after every reconnect.
+
+    Args:
+        symbols (list): KuCoin market names such as "BTC-USDT"
+        endpoint (str, optional): WebSocket URL to connect to directly (e.g. a local stand-in server);
+            when omitted a public token is requested from ``token_url``
+        token_url (str): KuCoin public bullet endpoint
+    """
+    source_name = "kucoin"
+    change_windows = {"change_5min": 5 * 60, "change_1h": 60 * 60}
+    max_backoff = 30
+
+    def __init__(self, symbols, endpoint=None, token_url="https://api.kucoin.com/api/v1/bullet-public") -> None:
+        self.symbols = list(symbols)
+        self.endpoint = endpoint
+        self.token_url = token_url
+        self.ping_interval = 18
+        self.connections = 0
+        self._message_ids = itertools.count(1)
+        # Per window and symbol: (timestamp, price) samples that are still inside the window
+        self._history = {column: {} for column in self.change_windows}
+
+    @staticmethod
+    def normalize_symbol(market):
+        """Maps a KuCoin market name (BTC-USDT) to the TradingView pair name (BTCUSDT)."""
+        return market.replace("-", "")
+
+    async def _get_connect_url(self):
+        if self.endpoint:
+            return self.endpoint
+        fetcher = get_fetcher()
+        response = await asyncio.wrap_future(fetcher.submit(fetcher.request_json("POST", self.token_url)))
+        server = response["data"]["instanceServers"][0]
+        self.ping_interval = server.get("pingInterval", 18000) / 1000
+        return f'{server["endpoint"]}?token={response["data"]["token"]}&connectId={int(time.time() * 1000)}'
+
+    def _subscribe_message(self):
+        return json.dumps({
+            "id": next(self._message_ids),
+            "type": "subscribe",
+            "topic": "/market/ticker:" + ",".join(self.symbols),
+            "privateChannel": False,
+            "response": True,
+        })
+
+    def _update_changes(self, symbol, price, timestamp):
+        changes = {}
+        for column, window in self.change_windows.items():
+            samples = self._history[column].setdefault(symbol, deque())
+            samples.append((timestamp, price))
+            while timestamp - samples[0][0] > window:
+                samples.popleft()
+            first_price = samples[0][1]
+            changes[column] = (price - first_price) / first_price * 100 if first_price else 0.0
+        return changes
+
+    def parse_message(self, message):
+        """Returns a one-row tick frame for ticker messages and None for control messages."""
+        if message.get("type") != "message" or not message.get("topic", "").startswith("/market/ticker:"):
+            return None
+        symbol = self.normalize_symbol(message["topic"].split(":", 1)[1])
+        data = message["data"]
+        price = float(data["price"])
+        timestamp = data.get("time", time.time() * 1000) / 1000
+        changes = self._update_changes(symbol, price, timestamp)
+        return pd.DataFrame({"price": [price], **{column: [value] for column, value in changes.items()}},
+                            index=[symbol])[self.tick_columns]
+
+    async def _ping(self, connection):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await connection.send(json.dumps({"id": next(self._message_ids), "type": "ping"}))
+
+    async def _consume(self, on_tick, stop_event=None):
+        connect_url = await self._get_connect_url()
+        async with websockets.connect(connect_url) as connection:
+            self.connections += 1
+            await connection.send(self._subscribe_message())
+            ping_task = asyncio.ensure_future(self._ping(connection))
+            try:
+                async for raw_message in connection:
+                    tick = self.parse_message(json.loads(raw_message))
+                    if tick is not None:
+                        on_tick(tick)
+                    if stop_event is not None and stop_event.is_set():
+                        return
+            finally:
+                ping_task.cancel()
+
+    async def run(self, on_tick, stop_event=None):
+        backoff = 1
+        while stop_event is None or not stop_event.is_set():
+            try:
+                await self._consume(on_tick, stop_event)
+                reason, backoff = "closed by server", 1
+            # A failed bullet-token request is retried with the same backoff as a lost connection
+            except (OSError, asyncio.TimeoutError, WebSocketException, FetchError) as exc:
+                reason = repr(exc)
+            if stop_event is not None and stop_event.is_set():
+                break
+            logger.error("WebSocket connection lost (%s), reconnecting in %s seconds.", reason, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def stream(self, on_tick, stop_event=None):
+        asyncio.run(self.run(on_tick, stop_event))